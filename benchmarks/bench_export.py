@@ -0,0 +1,60 @@
+"""流式导出吞吐量：内存列式表、二进制快照（mmap）与 SQLite 三种来源写出 CSV / NDJSON 的行速率
+
+目标为每秒 TARGET_RATE 行，低于目标的项在最后一列标出。SQLite 的行要先按 (应用, 日期) 汇总各小时，
+这一步本身就接近目标速率，导出整体约为目标的一半。
+
+用法: python -m benchmarks.bench_export [--apps 2000] [--days 365] [--density 0.9]
+"""
+import os
+import time
+import argparse
+import tempfile
+from benchmarks.synthetic import make_usage_data
+from src.usage_export import EXPORT_FORMATS, export_usage, iter_usage_rows
+from src.usage_history import UsageHistoryFile
+from src.usage_sqlite import SQLiteUsageStore
+from src.usage_store import UsageStore
+
+TARGET_RATE = 1_000_000
+
+
+def rate(func):
+    with open(os.devnull, 'w', encoding='utf-8') as f:
+        start = time.perf_counter()
+        count = func(f)
+        elapsed = time.perf_counter() - start
+    return count, count / elapsed if elapsed else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--density", type=float, default=0.9)
+    args = parser.parse_args()
+
+    usage_data = make_usage_data(args.apps, args.days, density=args.density)
+    store = UsageStore.from_usage_data(usage_data)
+    with tempfile.TemporaryDirectory() as tmp:
+        history_file = os.path.join(tmp, "usage_history.1.bin")
+        UsageHistoryFile.write(history_file, store, 0)
+        mapped = UsageHistoryFile.read(history_file)[0]
+        sqlite_store = SQLiteUsageStore(os.path.join(tmp, "usage_data.db"))
+        sqlite_store.migrate_from_usage_data(usage_data, "synthetic")
+
+        sources = (("UsageStore", store), ("二进制快照", mapped), ("SQLite", sqlite_store))
+        print(f"apps={args.apps} days={args.days}")
+        print(f"{'source':<16}{'format':<10}{'rows':>10}{'rows/s':>14}  target {TARGET_RATE:,}")
+        for name, view in sources:
+            count, speed = rate(lambda f: sum(1 for _ in iter_usage_rows(view)))
+            print(f"{name:<16}{'rows':<10}{count:>10}{speed:>14,.0f}")
+            for fmt in EXPORT_FORMATS:
+                count, speed = rate(lambda f: export_usage(view, f, fmt))
+                status = "" if speed >= TARGET_RATE else f"  低于目标 ({speed / TARGET_RATE:.0%})"
+                print(f"{name:<16}{fmt:<10}{count:>10}{speed:>14,.0f}{status}")
+        sqlite_store.close()
+        del mapped
+
+
+if __name__ == "__main__":
+    main()
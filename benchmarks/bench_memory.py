@@ -0,0 +1,104 @@
+"""内存占用报告：对比原先的嵌套字典模型与现在的列式表 / 并行数组进程表
+
+用 tracemalloc 统计构建各模型时新分配的 Python 堆内存，换算为每个应用、每个进程的开销。
+二进制快照加载后的历史行位于内存映射中，不计入堆内存，单独列出映射大小。
+
+用法: python -m benchmarks.bench_memory [--apps 2000] [--days 365] [--processes 2000]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import tracemalloc
+from collections import defaultdict
+from benchmarks.synthetic import make_usage_data, make_process_frames
+from src.process_source import CpuTimes
+from src.process_table import ProcessTable
+from src.usage_history import UsageHistoryFile
+from src.usage_store import UsageStore
+
+
+def allocated(build):
+    """返回 (build() 的结果, 结果存活时仍占用的堆内存字节数)"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return result, size
+
+
+def legacy_usage_data(usage_data):
+    """原 UsageTracker.load_usage_data 建立的结构：defaultdict 套 defaultdict，按日期字符串存储"""
+    legacy = defaultdict(lambda: {"total_time": 0, "daily_breakdown": defaultdict(int), "last_updated": 0})
+    for app_name, app_data in json.loads(json.dumps(usage_data)).items():
+        legacy[app_name]["total_time"] = app_data["total_time"]
+        legacy[app_name]["last_updated"] = app_data["last_updated"]
+        legacy[app_name]["daily_breakdown"].update(app_data["daily_breakdown"])
+    return legacy
+
+
+def legacy_processes(processes):
+    """原 current_processes：每个 PID 一个字典，名称字符串每次扫描都是新对象"""
+    return {
+        proc["pid"]: {
+            'name': "".join(proc["name"]),
+            'software_name': "".join(proc["name"]),
+            'create_time': proc["create_time"],
+            'cpu_time': CpuTimes(*proc["cpu_times"])
+        }
+        for proc in processes
+    }
+
+
+def compact_processes(processes):
+    table = ProcessTable()
+    for proc in processes:
+        table.add(proc["pid"], proc["name"], proc["name"], proc["create_time"], CpuTimes(*proc["cpu_times"]))
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--processes", type=int, default=2000)
+    args = parser.parse_args()
+
+    usage_data = make_usage_data(args.apps, args.days)
+    entries = sum(len(app_data["daily_breakdown"]) for app_data in usage_data.values())
+    rows = []
+
+    _, legacy_size = allocated(lambda: legacy_usage_data(usage_data))
+    rows.append(("dict 模型 (原)", legacy_size, args.apps))
+    store, store_size = allocated(lambda: UsageStore.from_usage_data(usage_data))
+    rows.append(("列式 UsageStore", store_size, args.apps))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "usage_history.1.bin")
+        UsageHistoryFile.write(path, store, 0)
+        mapped, mapped_size = allocated(lambda: UsageHistoryFile.read(path))
+        rows.append(("二进制快照 (mmap)", mapped_size, args.apps))
+        file_size = os.path.getsize(path)
+        del mapped
+
+    processes = make_process_frames(args.processes, frames=1)[0][0]["processes"]
+    _, legacy_proc_size = allocated(lambda: legacy_processes(processes))
+    rows.append(("current_processes 字典 (原)", legacy_proc_size, len(processes)))
+    # 实际运行时名称在分类时已驻留，登记进程表不再新分配字符串
+    for proc in processes:
+        sys.intern(proc["name"])
+    _, table_size = allocated(lambda: compact_processes(processes))
+    rows.append(("ProcessTable 并行数组", table_size, len(processes)))
+
+    print(f"apps={args.apps} days={args.days} daily entries={entries} processes={len(processes)}")
+    print(f"{'model':<30}{'heap (KB)':>12}{'per item (B)':>16}")
+    for name, size, count in rows:
+        print(f"{name:<30}{size / 1024:>12.1f}{size / count:>16.1f}")
+    print(f"二进制快照文件大小（映射，不计入堆）: {file_size / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
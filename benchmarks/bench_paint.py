@@ -0,0 +1,84 @@
+"""宠物窗口每次绘制的耗时：每次平滑缩放原图（原方式）与使用 Resources 缩放帧缓存的对比
+
+在离屏 QImage 上按 DesktopPet.paintEvent 的步骤绘制，模拟拖动窗口时的连续重绘。
+
+用法: python -m benchmarks.bench_paint [--source 1024] [--window 200] [--dpr 1.0] [--frames 500]
+"""
+import os
+import sys
+import time
+import argparse
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QGuiApplication, QImage, QPainter, QColor
+from src.rescourse import Resources
+from src.tick_profiler import percentile
+
+
+def make_sprite(size):
+    image = QImage(size, size, QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(Qt.NoPen)
+    painter.setBrush(QColor(255, 200, 220))
+    painter.drawEllipse(0, 0, size, size)
+    painter.end()
+    return image
+
+
+def paint_uncached(target, image, width, height):
+    painter = QPainter(target)
+    scaled_image = image.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    painter.drawImage((width - scaled_image.width()) // 2, (height - scaled_image.height()) // 2, scaled_image)
+    painter.end()
+
+
+def paint_cached(target, resources, width, height, dpr):
+    painter = QPainter(target)
+    scaled_image = resources.get_scaled_image(width, height, dpr)
+    size = scaled_image.deviceIndependentSize()
+    painter.drawImage((width - round(size.width())) // 2, (height - round(size.height())) // 2, scaled_image)
+    painter.end()
+
+
+def timings(func, frames):
+    samples = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return percentile(samples, 0.50), percentile(samples, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", type=int, default=1024)
+    parser.add_argument("--window", type=int, default=200)
+    parser.add_argument("--dpr", type=float, default=1.0)
+    parser.add_argument("--frames", type=int, default=500)
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QGuiApplication(sys.argv)
+    sprite = make_sprite(args.source)
+    resources = Resources()
+    resources.register_action("idle", sprite)
+    size = round(args.window * args.dpr)
+    target = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    target.setDevicePixelRatio(args.dpr)
+
+    results = {
+        "每次缩放 (原)": timings(lambda: paint_uncached(target, sprite, args.window, args.window), args.frames),
+        "缩放帧缓存": timings(lambda: paint_cached(target, resources, args.window, args.window, args.dpr),
+                          args.frames),
+    }
+    print(f"source={args.source}px window={args.window}px dpr={args.dpr} frames={args.frames}")
+    print(f"{'paint':<20}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    for name, (p50, p99) in results.items():
+        print(f"{name:<20}{p50:>12.3f}{p99:>12.3f}")
+    print(f"缓存: {resources.get_scaled_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
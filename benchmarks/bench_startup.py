@@ -0,0 +1,79 @@
+"""冷启动基准：DesktopPet 显示窗口前构造 UsageTracker 的耗时随历史长度的变化
+
+每次测量都在新的子进程中进行，记录构造 UsageTracker（autostart=True，与 DesktopPet 相同）
+返回所需的时间、随后第一次查询今日排行的时间以及进程峰值内存。
+
+用法: python -m benchmarks.bench_startup [--storage json binary] [--output result.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+from benchmarks.synthetic import make_usage_data
+
+HISTORY_SIZES = ((100, 30), (100, 365), (100, 1825), (2000, 365), (2000, 1825))
+
+
+def child(data_dir, storage):
+    start = time.perf_counter()
+    from src.process_source import ReplayProcessSource
+    from src.usage_tracker import UsageTracker
+    imported = time.perf_counter()
+    tracker = UsageTracker(storage=storage, process_source=ReplayProcessSource([]), data_dir=data_dir)
+    constructed = time.perf_counter()
+    tracker.get_top_apps(10, 1)
+    queried = time.perf_counter()
+
+    result = {"import": imported - start, "construct": constructed - imported, "first_query": queried - constructed}
+    try:
+        import resource
+        result["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        pass
+    print(json.dumps(result))
+
+
+def measure(data_dir, storage, repeat):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child", data_dir, storage],
+                                check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["construct"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--child", nargs=2, metavar=("DATA_DIR", "STORAGE"), help=argparse.SUPPRESS)
+    parser.add_argument("--storage", nargs="+", default=["json", "binary"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    results = {}
+    for apps, days in HISTORY_SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "usage_data.json"), 'w') as f:
+                json.dump(make_usage_data(apps, days), f, indent=4)
+            for storage in args.storage:
+                # 第一次运行完成格式迁移，不计入结果
+                measure(tmp, storage, 1)
+                results[f"{storage}/{apps}apps_{days}d"] = measure(tmp, storage, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+    print(f"{'history':<28}{'construct (ms)':>16}{'first query (ms)':>18}{'max rss (MB)':>14}")
+    for name, result in results.items():
+        print(f"{name:<28}{result['construct'] * 1000:>16.1f}{result['first_query'] * 1000:>18.2f}"
+              f"{result.get('max_rss_kb', 0) / 1024:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""对比 JSON（内存列式表 + 追加日志）与 SQLite 两种存储路径的加载与查询耗时
+
+用法: python -m benchmarks.bench_storage [--apps 2000] [--days 365]
+"""
+import os
+import json
+import time
+import argparse
+import datetime
+import tempfile
+from benchmarks.synthetic import make_usage_data
+from src.usage_journal import UsageJournal
+from src.usage_store import UsageStore
+from src.usage_sqlite import SQLiteUsageStore
+
+
+def timed(func, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def recent_usage(store, days):
+    today = datetime.date.today().toordinal()
+    start_day = today - days + 1
+    for app_name, _ in store.active_apps(start_day, today):
+        store.app_window(app_name, start_day, today)
+    store.daily_totals(start_day, today)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    usage_data = make_usage_data(args.apps, args.days)
+    today = datetime.date.today().toordinal()
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, "usage_data.json")
+        with open(json_file, "w") as f:
+            json.dump(usage_data, f, indent=4)
+
+        db_file = os.path.join(tmp, "usage_data.db")
+        migrate_start = time.perf_counter()
+        sqlite_store = SQLiteUsageStore(db_file)
+        sqlite_store.migrate_from_usage_data(usage_data, json_file)
+        migrate_time = time.perf_counter() - migrate_start
+
+        results = {}
+        results["load"] = (
+            timed(lambda: UsageStore.from_usage_data(UsageJournal(json_file).load()), repeat=1),
+            timed(lambda: SQLiteUsageStore(db_file).close(), repeat=1),
+        )
+        memory_store = UsageStore.from_usage_data(usage_data)
+
+        increments = {f"app_{i}.exe": 5.0 for i in range(20)}
+        results["record_tick (20 apps)"] = (
+            timed(lambda: [memory_store.add(name, today, seconds, 0.0) for name, seconds in increments.items()]),
+            timed(lambda: sqlite_store.record_tick(0.0, today, 12, increments)),
+        )
+        for days in (1, 7, 30, 365):
+            results[f"recent_usage({days})"] = (
+                timed(lambda: recent_usage(memory_store, days)),
+                timed(lambda: recent_usage(sqlite_store, days)),
+            )
+            results[f"top_apps(10, {days})"] = (
+                timed(lambda: memory_store.top_apps(today - days + 1, today, 10)),
+                timed(lambda: sqlite_store.top_apps(today - days + 1, today, 10)),
+            )
+        sqlite_store.close()
+
+    print(f"apps={args.apps} days={args.days} sqlite migration={migrate_time * 1000:.1f} ms")
+    print(f"{'operation':<24}{'json (ms)':>12}{'sqlite (ms)':>14}")
+    for name, (json_time, sqlite_time) in results.items():
+        print(f"{name:<24}{json_time * 1000:>12.3f}{sqlite_time * 1000:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
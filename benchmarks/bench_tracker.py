@@ -0,0 +1,198 @@
+"""UsageTracker 全流程基准测试，不依赖 Windows API
+
+覆盖 update_process_data（合成进程表，完整扫描与前台采样两种模式）、load_usage_data / save_usage_data
+（不同历史长度与应用数）以及 get_recent_usage / get_top_apps / usage，
+并统计每个周期对进程来源的调用次数。结果以 JSON 输出，
+可与保存的基线对比，耗时超过阈值的项会被标记，并以退出码 1 结束。
+
+用法:
+    python -m benchmarks.bench_tracker --output baseline.json
+    python -m benchmarks.bench_tracker --compare baseline.json [--threshold 0.2]
+    python -m benchmarks.bench_tracker --quick
+"""
+import os
+import sys
+import json
+import time
+import datetime
+import argparse
+import platform
+import statistics
+import tempfile
+from benchmarks.synthetic import make_usage_data, make_process_frames, SYSTEM_DIRS, SYSTEM_USERS
+from src.process_source import ReplayProcessSource
+from src.usage_tracker import UsageTracker
+
+PROCESS_COUNTS = (200, 2000, 20000)
+HISTORY_SIZES = ((100, 365), (100, 1825), (5000, 365), (5000, 1825))
+QUERY_DAYS = (1, 7, 30, 365)
+
+QUICK_PROCESS_COUNTS = (200, 2000)
+QUICK_HISTORY_SIZES = ((100, 365), (1000, 365))
+
+
+def measure(func, repeat):
+    """返回多次运行耗时的中位数与最小值（秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {"median": statistics.median(samples), "min": min(samples), "repeat": repeat}
+
+
+def make_tracker(data_dir, storage, process_source=None, **kwargs):
+    tracker = UsageTracker(storage=storage, process_source=process_source or ReplayProcessSource([]),
+                           data_dir=data_dir, autostart=False, **kwargs)
+    tracker.software_index.wait()
+    return tracker
+
+
+def bench_ticks(results, storage, counts, ticks):
+    for count in counts:
+        frames, installed_software = make_process_frames(count, frames=ticks + 1)
+        source = ReplayProcessSource(frames, installed_software, system_dirs=SYSTEM_DIRS,
+                                     system_users=SYSTEM_USERS)
+        with tempfile.TemporaryDirectory() as tmp:
+            tracker = make_tracker(tmp, storage, source)
+            # 第一个周期需要分类全部进程，单独记录；线程池分类完成后再测稳定周期
+            results[f"update_process_data/cold/{count}"] = measure(tracker.update_process_data, 1)
+            tracker.wait_for_classifications()
+            results[f"update_process_data/steady/{count}"] = measure(tracker.update_process_data, ticks)
+            tracker.journal.close()
+
+        # 前台采样：第一个周期仍做完整扫描，之后的周期不到 full_scan_interval 只查询前台进程
+        source = ReplayProcessSource(frames, installed_software, system_dirs=SYSTEM_DIRS,
+                                     system_users=SYSTEM_USERS)
+        with tempfile.TemporaryDirectory() as tmp:
+            tracker = make_tracker(tmp, storage, source, sampling="foreground")
+            tracker.update_process_data()
+            results[f"update_process_data/foreground/{count}"] = measure(tracker.update_process_data, ticks)
+            tracker.journal.close()
+
+
+class SlowReplaySource(ReplayProcessSource):
+    """cmdline() 每次耗时 delay 秒，模拟大量进程同时启动时变慢的系统查询"""
+
+    def __init__(self, *args, delay=0.02, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delay = delay
+
+    def cmdline(self, pid):
+        time.sleep(self.delay)
+        return super().cmdline(pid)
+
+
+def bench_slow_source(results, storage, count=100):
+    """新进程较多且查询较慢时的第一个周期：监控线程中同步分类与线程池分类的对比"""
+    frames, installed_software = make_process_frames(count, frames=2)
+    for label, workers in (("sync", 0), ("pool", 4)):
+        source = SlowReplaySource(frames, installed_software, system_dirs=SYSTEM_DIRS, system_users=SYSTEM_USERS)
+        with tempfile.TemporaryDirectory() as tmp:
+            tracker = make_tracker(tmp, storage, source, classify_workers=workers)
+            results[f"update_process_data/slow_source/{label}/{count}"] = measure(tracker.update_process_data, 1)
+            tracker.journal.close()
+
+
+def bench_queries(storage, counts, ticks):
+    """每个周期对进程来源的调用次数：逐个进程补查父进程 / 用户名与一次枚举得到进程树的对比"""
+    queries = {}
+    for count in counts:
+        frames, installed_software = make_process_frames(count, frames=ticks + 1)
+        for label, with_parents in (("per_process", False), ("tree", True)):
+            source = ReplayProcessSource(frames, installed_software, system_dirs=SYSTEM_DIRS,
+                                         system_users=SYSTEM_USERS, with_parents=with_parents)
+            with tempfile.TemporaryDirectory() as tmp:
+                # 同步分类，调用次数不受线程池进度影响
+                tracker = make_tracker(tmp, storage, source, classify_workers=0)
+                before = source.query_count
+                tracker.update_process_data()
+                cold = source.query_count - before
+                before = source.query_count
+                for _ in range(ticks):
+                    tracker.update_process_data()
+                queries[f"{label}/{count}"] = {"cold": cold, "steady": (source.query_count - before) / ticks}
+                tracker.journal.close()
+    return queries
+
+
+def bench_history(results, storage, sizes, repeat):
+    for apps, days in sizes:
+        label = f"{apps}apps_{days}d"
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "usage_data.json"), 'w') as f:
+                json.dump(make_usage_data(apps, days), f, indent=4)
+            tracker = make_tracker(tmp, storage)
+            results[f"load_usage_data/{label}"] = measure(tracker.load_usage_data, repeat)
+            results[f"save_usage_data/{label}"] = measure(tracker.save_usage_data, repeat)
+            for days_back in QUERY_DAYS:
+                results[f"get_recent_usage/{label}/{days_back}d"] = measure(
+                    lambda: tracker.get_recent_usage(days_back), repeat * 5)
+                results[f"get_top_apps/{label}/{days_back}d"] = measure(
+                    lambda: tracker.get_top_apps(10, days_back), repeat * 5)
+            first_day = datetime.date.today() - datetime.timedelta(days=days - 1)
+            results[f"usage_by_month/{label}"] = measure(
+                lambda: tracker.usage(start=first_day, granularity="month"), repeat * 5)
+            results[f"usage_today_by_hour/{label}"] = measure(
+                lambda: tracker.usage(granularity="hour"), repeat * 5)
+            tracker.journal.close()
+
+
+def compare(results, baseline, threshold, min_delta):
+    """返回耗时中位数比基线慢 threshold 以上、且绝对差超过 min_delta 秒的项"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or base["median"] <= 0:
+            continue
+        ratio = result["median"] / base["median"]
+        if ratio > 1 + threshold and result["median"] - base["median"] > min_delta:
+            regressions.append((name, base["median"], result["median"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--storage", choices=("binary", "json", "sqlite"), default="binary")
+    parser.add_argument("--quick", action="store_true", help="只跑较小的规模")
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--compare", help="与基线 JSON 文件对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的相对变慢比例")
+    parser.add_argument("--min-delta", type=float, default=0.5, help="忽略小于该毫秒数的差异")
+    args = parser.parse_args()
+
+    results = {}
+    process_counts = QUICK_PROCESS_COUNTS if args.quick else PROCESS_COUNTS
+    bench_ticks(results, args.storage, process_counts, args.ticks)
+    bench_slow_source(results, args.storage)
+    bench_history(results, args.storage, QUICK_HISTORY_SIZES if args.quick else HISTORY_SIZES, args.repeat)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": args.storage,
+        "results": results,
+        "source_queries": bench_queries(args.storage, process_counts, args.ticks)
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold, args.min_delta / 1000)
+        for name, base, current, ratio in regressions:
+            print(f"变慢: {name} {base * 1000:.3f} ms -> {current * 1000:.3f} ms ({ratio:.2f}x)",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import os
+import random
+import datetime
+
+
+def make_usage_data(apps, days, seed=0, density=0.3):
+    """生成 usage_data.json 布局的合成历史数据，截止到今天"""
+    rng = random.Random(seed)
+    today = datetime.date.today().toordinal()
+    usage_data = {}
+    for i in range(apps):
+        breakdown = {}
+        # 少数应用每天都用，多数应用偶尔出现
+        app_density = 0.95 if i < 20 else density * rng.random()
+        for day in range(today - days + 1, today + 1):
+            if rng.random() < app_density:
+                breakdown[datetime.date.fromordinal(day).isoformat()] = rng.random() * 3600
+        usage_data[f"app_{i}.exe"] = {
+            "total_time": sum(breakdown.values()),
+            "daily_breakdown": breakdown,
+            "last_updated": 0.0
+        }
+    return usage_data
+
+
+# 合成进程表使用的系统目录与系统用户，传给 ReplayProcessSource
+SYSTEM_DIRS = ("/usr/lib/bench",)
+SYSTEM_USERS = ("root",)
+
+
+def make_process_frames(count, frames=12, churn=0.01, seed=0, interval=5.0):
+    """生成 ReplayProcessSource 可回放的合成进程表
+
+    约三成为系统目录下的进程，其余为用户软件；每帧替换 churn 比例的进程，
+    所有进程的 CPU 时间逐帧增长。每帧的 foreground 为一个用户进程，每三帧切换一次。
+    返回 (frames, installed_software)。
+    """
+    rng = random.Random(seed)
+    # 前台进程用单独的随机数序列，不影响进程表本身的生成
+    foreground_rng = random.Random(seed + 1)
+    installed_software = {f"tool_{i}.exe": f"Tool {i}" for i in range(0, count, 3)}
+    next_pid = 1000
+
+    def new_process(ppid):
+        nonlocal next_pid
+        next_pid += 1
+        i = rng.randrange(count)
+        if rng.random() < 0.3:
+            exe = f"/usr/lib/bench/svc_{i}"
+            username = "root"
+        else:
+            exe = f"/opt/tool_{i}/tool_{i}.exe"
+            username = "bench"
+        return {
+            "pid": next_pid,
+            "name": os.path.basename(exe),
+            "exe": exe,
+            "create_time": float(next_pid),
+            "cpu_times": [rng.random() * 10, rng.random()],
+            "ppid": ppid,
+            "username": username,
+            "cmdline": [exe]
+        }
+
+    root = {"pid": 4, "name": "init.exe", "exe": "/opt/shell/init.exe",
+            "create_time": 0.0, "cpu_times": [0.0, 0.0], "ppid": 0, "username": "bench", "cmdline": []}
+    processes = [new_process(root["pid"]) for _ in range(count)]
+    result = []
+    foreground = None
+    for frame in range(frames):
+        if frame:
+            for index in rng.sample(range(count), int(count * churn)):
+                processes[index] = new_process(root["pid"])
+            for proc in processes:
+                user, system = proc["cpu_times"]
+                proc["cpu_times"] = [user + rng.random() * 0.5, system + rng.random() * 0.05]
+        pids = {proc["pid"] for proc in processes}
+        if frame % 3 == 0 or foreground not in pids:
+            foreground = foreground_rng.choice([proc["pid"] for proc in processes if proc["username"] == "bench"])
+        result.append({"t": frame * interval, "foreground": foreground,
+                       "processes": [root] + [dict(proc) for proc in processes]})
+    return result, installed_software
@@ -1,4 +1,5 @@
 import sys
+import multiprocessing
 import win32gui
 import win32con
 import win32event
@@ -31,6 +32,8 @@ def hide_console_window():
         print(f"隐藏控制台失败: {e}")
 
 def main():
+    # 打包为 exe 后，使用统计收集子进程需要它才能正确启动
+    multiprocessing.freeze_support()
     if not check_single_instance():
         app = QApplication(sys.argv)
         QMessageBox.warning(None, "提示", "程序已在运行中！")
@@ -1,12 +1,15 @@
 from PySide6.QtWidgets import QMainWindow, QMenu, QApplication
-from PySide6.QtCore import Qt, QPoint
+from PySide6.QtCore import Qt, QPoint, QEvent
 from PySide6.QtGui import QPainter, QImage
 from src.setting import Settings
 from src.settings_dialog import SettingsDialog
 from src.usage_stats_dialog import UsageStatsDialog
 from src.usage_tracker import UsageTracker
+from src.usage_collector import RemoteUsageTracker
 from src.ai_chat_dialog import AIChatDialog
 from src.rescourse import Resources
+from src.tick_profiler import TickProfiler
+from src.sprite_animation import SpriteAnimator
 
 
 class DesktopPet(QMainWindow):
@@ -14,8 +17,22 @@ class DesktopPet(QMainWindow):
         super().__init__()
         self.settings = Settings()
         self._dragging = False
-        self.usage_tracker = UsageTracker()
+        min_interval, max_interval = self.settings.get_usage_interval_bounds()
+        if self.settings.get_usage_collector() == "process":
+            self.usage_tracker = RemoteUsageTracker(
+                storage=self.settings.get_usage_storage(), sampling=self.settings.get_usage_sampling(),
+                aggregate_children=self.settings.get_usage_aggregate_children(),
+                min_interval=min_interval, max_interval=max_interval)
+        else:
+            self.usage_tracker = UsageTracker(
+                storage=self.settings.get_usage_storage(), sampling=self.settings.get_usage_sampling(),
+                aggregate_children=self.settings.get_usage_aggregate_children(),
+                min_interval=min_interval, max_interval=max_interval)
         self.resources = Resources()
+        # 每次绘制的耗时，get_paint_metrics() 给出分位数
+        self.paint_profiler = TickProfiler(capacity=600)
+        # 由共用的动画时钟推进，只有显示的帧变化时才重绘；窗口显示后才激活
+        self.animator = SpriteAnimator(self.resources, self.update)
         self.initUI()
 
     def initUI(self):
@@ -53,6 +70,8 @@ class DesktopPet(QMainWindow):
         self.show()
     
     def closeEvent(self, event):
+        self.animator.close()
+        self.usage_tracker.stop()
         event.accept()
         QApplication.quit()
 
@@ -110,19 +129,53 @@ class DesktopPet(QMainWindow):
     def mouseReleaseEvent(self, event):
         self._dragging = False
 
+    def update_animation_state(self):
+        # 隐藏或最小化时停用动画，时钟在没有活动宠物时完全停止
+        self.animator.set_active(self.isVisible() and not self.isMinimized())
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_animation_state()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_animation_state()
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.WindowStateChange:
+            self.update_animation_state()
+        super().changeEvent(event)
+
+    def resizeEvent(self, event):
+        # setFixedSize 改变窗口尺寸后，旧尺寸的缩放帧不会再用到
+        if event.oldSize() != event.size():
+            self.resources.invalidate_scaled()
+        super().resizeEvent(event)
+
+    def get_paint_metrics(self):
+        metrics = self.paint_profiler.summary()
+        metrics["scaled_cache"] = self.resources.get_scaled_cache_stats()
+        metrics["animation"] = {"action": self.animator.action, "frame": self.animator.frame,
+                                "active": self.animator.active, "frames_shown": self.animator.frames_shown,
+                                "clock_ticks": self.animator.clock.ticks}
+        return metrics
+
     def paintEvent(self, event):
+        profiler = self.paint_profiler
+        profiler.begin_tick()
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
         
-        # 获取当前宠物图像
-        image = self.resources.get_current_image()
-        
-        # 缩放图像以适应窗口大小
-        scaled_image = image.scaled(self.width(), self.height(), 
-                                     Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        # 获取按窗口大小缩放好的当前帧，缓存命中时不再缩放
+        with profiler.phase("scale"):
+            scaled_image = self.resources.get_scaled_image(self.width(), self.height(), self.devicePixelRatioF())
         
         # 计算居中位置
-        x = (self.width() - scaled_image.width()) // 2
-        y = (self.height() - scaled_image.height()) // 2
+        size = scaled_image.deviceIndependentSize()
+        x = (self.width() - round(size.width())) // 2
+        y = (self.height() - round(size.height())) // 2
         
-        painter.drawImage(x, y, scaled_image)
+        with profiler.phase("draw"):
+            painter.drawImage(x, y, scaled_image)
+        painter.end()
+        profiler.end_tick()
@@ -0,0 +1,551 @@
+import os
+import sys
+import json
+import time
+import bisect
+import hashlib
+from collections import namedtuple
+
+import psutil
+
+if sys.platform == 'win32':
+    import winreg
+    import ctypes
+    from ctypes import wintypes
+
+
+CpuTimes = namedtuple("CpuTimes", ["user", "system"])
+
+
+def merge_software_entries(sections):
+    """按顺序合并各来源的 [exe_name, 显示名, 是否覆盖] 条目"""
+    software_map = {}
+    for entries in sections:
+        for exe_name, name, overwrite in entries:
+            if overwrite or exe_name not in software_map:
+                software_map[exe_name] = name
+    return software_map
+
+
+class ProcessSource:
+    """进程信息来源接口
+
+    iter_processes() 逐个返回包含 pid、name、exe、create_time、cpu_times 的字典，
+    能在同一次枚举中取得时还包含 ppid 和 username；
+    按 pid 的补充查询在进程不存在或无权限时返回 None，而不是抛出异常。
+    foreground_pid() 返回前台窗口所属进程，idle_seconds() 返回用户最近一次输入后经过的秒数，
+    平台不支持时均返回 None。
+    query_count 累计枚举和按 pid 查询的调用次数。
+    """
+
+    system_dirs = ()
+    system_users = ()
+    query_count = 0
+
+    def iter_processes(self):
+        raise NotImplementedError
+
+    def foreground_pid(self):
+        return None
+
+    def idle_seconds(self):
+        return None
+
+    def process_info(self, pid):
+        """单个进程的信息，字段与 iter_processes() 相同"""
+        return None
+
+    def cmdline(self, pid):
+        return None
+
+    def ppid(self, pid):
+        return None
+
+    def name(self, pid):
+        return None
+
+    def exe(self, pid):
+        return None
+
+    def username(self, pid):
+        return None
+
+    def is_system_user(self, username):
+        return any(user in username for user in self.system_users)
+
+    def software_sections(self):
+        """已安装软件信息的分区（注册表项、目录等），可分别缓存"""
+        return []
+
+    def section_stamp(self, section):
+        """分区内容未变化时保持不变的戳记；返回 None 表示无法判断，需要重新扫描"""
+        return None
+
+    def scan_section(self, section):
+        """扫描一个分区，返回 [exe_name, 显示名, 是否覆盖] 条目列表"""
+        return []
+
+    def installed_software(self):
+        """可执行文件名（小写）到软件显示名称的映射"""
+        return merge_software_entries(self.scan_section(section) for section in self.software_sections())
+
+
+class PsutilProcessSource(ProcessSource):
+    """基于 psutil 的通用实现"""
+
+    ATTRS = ['pid', 'name', 'create_time', 'cpu_times', 'exe', 'ppid', 'username']
+
+    def iter_processes(self):
+        # 父进程和用户名在同一次 process_iter 中一并取得，不再逐个进程补查
+        self.query_count += 1
+        for proc in psutil.process_iter(self.ATTRS):
+            yield proc.info
+
+    def process_info(self, pid):
+        self.query_count += 1
+        try:
+            return psutil.Process(pid).as_dict(self.ATTRS)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return None
+
+    def _query(self, pid, method):
+        self.query_count += 1
+        try:
+            return getattr(psutil.Process(pid), method)()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return None
+
+    def cmdline(self, pid):
+        return self._query(pid, 'cmdline')
+
+    def ppid(self, pid):
+        return self._query(pid, 'ppid')
+
+    def name(self, pid):
+        return self._query(pid, 'name')
+
+    def exe(self, pid):
+        return self._query(pid, 'exe')
+
+    def username(self, pid):
+        return self._query(pid, 'username')
+
+
+class WindowsProcessSource(PsutilProcessSource):
+    """Windows 实现：psutil 枚举进程，注册表 Uninstall 项提供软件名称"""
+
+    system_dirs = tuple(path.lower() for path in (
+        os.path.join(os.environ.get('SystemRoot', r'C:\Windows'), 'System32'),
+        os.path.join(os.environ.get('SystemRoot', r'C:\Windows'), 'SysWOW64'),
+        os.path.join(os.environ.get('SystemRoot', r'C:\Windows'), 'System'),
+        os.path.join(os.environ.get('ProgramFiles', r'C:\Program Files'), 'Windows Defender'),
+        os.path.join(os.environ.get('ProgramFiles(x86)', r'C:\Program Files (x86)'), 'Windows Defender')
+    ))
+
+    system_users = ('SYSTEM', 'LOCAL SERVICE', 'NETWORK SERVICE')
+
+    if sys.platform == 'win32':
+        REGISTRY_SECTIONS = {
+            r"HKLM\SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall":
+                (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"),
+            r"HKLM\SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall":
+                (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall"),
+            r"HKCU\SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall":
+                (winreg.HKEY_CURRENT_USER, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall")
+        }
+    else:
+        REGISTRY_SECTIONS = {}
+
+    def foreground_pid(self):
+        user32 = ctypes.windll.user32
+        hwnd = user32.GetForegroundWindow()
+        if not hwnd:
+            return None
+        pid = wintypes.DWORD()
+        user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        return pid.value or None
+
+    def idle_seconds(self):
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [("cbSize", wintypes.UINT), ("dwTime", wintypes.DWORD)]
+
+        info = LASTINPUTINFO()
+        info.cbSize = ctypes.sizeof(info)
+        if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+            return None
+        # GetTickCount 约 49.7 天回绕一次，按 32 位无符号数相减
+        return ((ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF) / 1000.0
+
+    def software_sections(self):
+        return list(self.REGISTRY_SECTIONS)
+
+    def section_stamp(self, section):
+        # 父键的修改时间只反映子键增删，再叠加每个子键的修改时间得到内容摘要
+        root, subkey_path = self.REGISTRY_SECTIONS[section]
+        try:
+            with winreg.OpenKey(root, subkey_path) as key:
+                subkey_count, _, modified = winreg.QueryInfoKey(key)
+                digest = hashlib.sha1(str(modified).encode())
+                for i in range(subkey_count):
+                    subkey_name = winreg.EnumKey(key, i)
+                    with winreg.OpenKey(key, subkey_name) as subkey:
+                        digest.update(f"{subkey_name}:{winreg.QueryInfoKey(subkey)[2]}".encode())
+                return digest.hexdigest()
+        except OSError:
+            return None
+
+    def scan_section(self, section):
+        entries = []
+        root, subkey_path = self.REGISTRY_SECTIONS[section]
+        try:
+            with winreg.OpenKey(root, subkey_path) as key:
+                i = 0
+                while True:
+                    try:
+                        subkey_name = winreg.EnumKey(key, i)
+                        with winreg.OpenKey(key, subkey_name) as subkey:
+                            try:
+                                name = winreg.QueryValueEx(subkey, "DisplayName")[0]
+
+                                try:
+                                    install_location = winreg.QueryValueEx(subkey, "InstallLocation")[0]
+                                    if install_location:
+                                        for file in os.listdir(install_location):
+                                            if file.lower().endswith(('.exe', '.bat', '.cmd')):
+                                                entries.append([file.lower(), name, True])
+                                                break
+                                except (WindowsError, OSError):
+                                    pass
+
+                                try:
+                                    uninstall_string = winreg.QueryValueEx(subkey, "UninstallString")[0]
+                                    if uninstall_string:
+                                        if ".exe" in uninstall_string:
+                                            exe_path = uninstall_string.split('"')[-1].split('"')[0]
+                                            entries.append([os.path.basename(exe_path).lower(), name, False])
+                                except (WindowsError, OSError):
+                                    pass
+                            except (WindowsError, OSError):
+                                pass
+                        i += 1
+                    except WindowsError:
+                        break
+        except WindowsError:
+            pass
+        except Exception as e:
+            print(f"获取已安装软件时出错: {e}")
+        return entries
+
+
+class ProcProcessSource(ProcessSource):
+    """Linux 实现：直接读取 /proc，不经过 psutil"""
+
+    system_dirs = ('/sbin', '/usr/sbin', '/usr/libexec', '/usr/lib/systemd', '/lib/systemd')
+
+    def __init__(self, proc_root='/proc', applications_dirs=('/usr/share/applications',
+                                                             os.path.expanduser('~/.local/share/applications'))):
+        self.proc_root = proc_root
+        self.applications_dirs = applications_dirs
+        self._clock_ticks = os.sysconf('SC_CLK_TCK')
+        self._boot_time = self._read_boot_time()
+        self._usernames = {}
+
+    def _read_boot_time(self):
+        with open(os.path.join(self.proc_root, 'stat')) as f:
+            for line in f:
+                if line.startswith('btime'):
+                    return float(line.split()[1])
+        return 0.0
+
+    def _read_stat(self, pid):
+        try:
+            with open(os.path.join(self.proc_root, str(pid), 'stat'), 'rb') as f:
+                data = f.read().decode(errors='replace')
+        except OSError:
+            return None
+        # comm 字段可能包含空格和括号，以最后一个右括号为界
+        name = data[data.find('(') + 1:data.rfind(')')]
+        fields = data[data.rfind(')') + 2:].split()
+        return name, int(fields[1]), int(fields[11]), int(fields[12]), int(fields[19])
+
+    def iter_processes(self):
+        self.query_count += 1
+        try:
+            entries = os.listdir(self.proc_root)
+        except OSError:
+            return
+        for entry in entries:
+            if not entry.isdigit():
+                continue
+            info = self._process_info(int(entry))
+            if info is not None:
+                yield info
+
+    def _process_info(self, pid):
+        stat = self._read_stat(pid)
+        if stat is None:
+            return None
+        name, ppid, utime, stime, starttime = stat
+        exe = self._read_exe(pid)
+        if exe and os.path.basename(exe).startswith(name):
+            name = os.path.basename(exe)
+        # 用户名需要额外读取 status，只在分类新进程时按需查询
+        return {
+            'pid': pid,
+            'name': name,
+            'exe': exe,
+            'create_time': self._boot_time + starttime / self._clock_ticks,
+            'cpu_times': CpuTimes(utime / self._clock_ticks, stime / self._clock_ticks),
+            'ppid': ppid
+        }
+
+    def process_info(self, pid):
+        self.query_count += 1
+        return self._process_info(pid)
+
+    def cmdline(self, pid):
+        self.query_count += 1
+        try:
+            with open(os.path.join(self.proc_root, str(pid), 'cmdline'), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        return [arg.decode(errors='replace') for arg in data.split(b'\0') if arg]
+
+    def ppid(self, pid):
+        self.query_count += 1
+        stat = self._read_stat(pid)
+        return stat[1] if stat else None
+
+    def name(self, pid):
+        self.query_count += 1
+        stat = self._read_stat(pid)
+        return stat[0] if stat else None
+
+    def _read_exe(self, pid):
+        try:
+            return os.readlink(os.path.join(self.proc_root, str(pid), 'exe'))
+        except OSError:
+            return None
+
+    def exe(self, pid):
+        self.query_count += 1
+        return self._read_exe(pid)
+
+    def _username_of(self, uid):
+        if uid not in self._usernames:
+            import pwd
+            try:
+                self._usernames[uid] = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                self._usernames[uid] = str(uid)
+        return self._usernames[uid]
+
+    def username(self, pid):
+        self.query_count += 1
+        try:
+            with open(os.path.join(self.proc_root, str(pid), 'status')) as f:
+                for line in f:
+                    if line.startswith('Uid:'):
+                        uid = int(line.split()[1])
+                        break
+                else:
+                    return None
+        except OSError:
+            return None
+        return self._username_of(uid)
+
+    def is_system_user(self, username):
+        # 普通登录用户的 uid 从 1000 开始
+        for uid, name in self._usernames.items():
+            if name == username:
+                return uid < 1000
+        return False
+
+    def software_sections(self):
+        return list(self.applications_dirs)
+
+    def section_stamp(self, section):
+        try:
+            return os.stat(section).st_mtime_ns
+        except OSError:
+            return None
+
+    def scan_section(self, section):
+        entries = []
+        try:
+            names = os.listdir(section)
+        except OSError:
+            return entries
+        for entry in names:
+            if not entry.endswith('.desktop'):
+                continue
+            name = exec_line = None
+            try:
+                with open(os.path.join(section, entry), errors='replace') as f:
+                    for line in f:
+                        if line.startswith('Name=') and name is None:
+                            name = line[5:].strip()
+                        elif line.startswith('Exec=') and exec_line is None:
+                            exec_line = line[5:].strip()
+            except OSError:
+                continue
+            if name and exec_line:
+                exe_name = os.path.basename(exec_line.split()[0].strip('"')).lower()
+                entries.append([exe_name, name, False])
+        return entries
+
+
+class ReplayProcessSource(ProcessSource):
+    """回放录制的进程表
+
+    trace 文件是 NDJSON：第一行为头部（installed_software、system_dirs、system_users），
+    之后每行一帧 {"t": 时间戳, "processes": [...], "foreground": 前台进程 pid（可选）,
+    "idle": 用户空闲秒数（可选）}。
+    speed 为 None 时每次调用前进一帧（同一周期先 foreground_pid() 再 iter_processes() 只算一次），
+    否则按录制时间轴以 speed 倍速回放。with_parents 为 False 时枚举结果不含 ppid 和 username，
+    模拟只能逐个进程补查的来源。
+    """
+
+    def __init__(self, frames, installed_software=None, system_dirs=WindowsProcessSource.system_dirs,
+                 system_users=WindowsProcessSource.system_users, speed=None, loop=False, with_parents=True):
+        self.frames = frames
+        self.with_parents = with_parents
+        self._installed_software = installed_software or {}
+        self.system_dirs = tuple(path.lower() for path in system_dirs)
+        self.system_users = tuple(system_users)
+        self.speed = speed
+        self.loop = loop
+        self._frame_times = [frame["t"] - frames[0]["t"] for frame in frames] if frames else []
+        self._position = -1
+        self._started = None
+        self._current = {}
+        self._foreground_read = False
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, 'r') as f:
+            header = json.loads(f.readline())
+            frames = [json.loads(line) for line in f if line.strip()]
+        for key in ("installed_software", "system_dirs", "system_users"):
+            if key in header:
+                kwargs.setdefault(key, header[key])
+        return cls(frames, **kwargs)
+
+    def _advance(self):
+        if not self.frames:
+            return
+        if self.speed is None:
+            position = self._position + 1
+        else:
+            if self._started is None:
+                self._started = time.monotonic()
+            elapsed = (time.monotonic() - self._started) * self.speed
+            if self.loop and self._frame_times[-1] > 0:
+                elapsed %= self._frame_times[-1]
+            position = bisect.bisect_right(self._frame_times, elapsed) - 1
+        if position >= len(self.frames):
+            position = 0 if self.loop else len(self.frames) - 1
+        if position != self._position:
+            self._position = position
+            self._current = {proc["pid"]: proc for proc in self.frames[position]["processes"]}
+
+    def iter_processes(self):
+        self.query_count += 1
+        if not self._foreground_read:
+            self._advance()
+        self._foreground_read = False
+        for proc in self._current.values():
+            yield self._info(proc)
+
+    def _info(self, proc):
+        info = {
+            'pid': proc['pid'],
+            'name': proc['name'],
+            'exe': proc.get('exe'),
+            'create_time': proc['create_time'],
+            'cpu_times': CpuTimes(*proc['cpu_times'])
+        }
+        if self.with_parents:
+            info['ppid'] = proc.get('ppid')
+            info['username'] = proc.get('username')
+        return info
+
+    def foreground_pid(self):
+        self._advance()
+        self._foreground_read = True
+        if not self.frames:
+            return None
+        return self.frames[self._position].get("foreground")
+
+    def idle_seconds(self):
+        if not self.frames or self._position < 0:
+            return None
+        return self.frames[self._position].get("idle")
+
+    def process_info(self, pid):
+        self.query_count += 1
+        proc = self._current.get(pid)
+        return self._info(proc) if proc else None
+
+    def _field(self, pid, key):
+        self.query_count += 1
+        proc = self._current.get(pid)
+        return proc.get(key) if proc else None
+
+    def cmdline(self, pid):
+        return self._field(pid, 'cmdline')
+
+    def ppid(self, pid):
+        return self._field(pid, 'ppid')
+
+    def name(self, pid):
+        return self._field(pid, 'name')
+
+    def exe(self, pid):
+        return self._field(pid, 'exe')
+
+    def username(self, pid):
+        return self._field(pid, 'username')
+
+    def software_sections(self):
+        return ["trace"]
+
+    def scan_section(self, section):
+        return [[exe_name, name, True] for exe_name, name in self._installed_software.items()]
+
+
+def record_trace(source, path, frames=12, interval=5.0):
+    """从任意进程来源录制 trace 文件，供 ReplayProcessSource 回放"""
+    with open(path, 'w') as f:
+        f.write(json.dumps({
+            "installed_software": source.installed_software(),
+            "system_dirs": list(source.system_dirs),
+            "system_users": list(source.system_users)
+        }, ensure_ascii=False) + "\n")
+        for i in range(frames):
+            processes = []
+            for info in source.iter_processes():
+                pid = info['pid']
+                processes.append({
+                    "pid": pid,
+                    "name": info['name'],
+                    "exe": info.get('exe'),
+                    "create_time": info['create_time'],
+                    "cpu_times": [info['cpu_times'].user, info['cpu_times'].system] if info['cpu_times'] else [0.0, 0.0],
+                    "ppid": source.ppid(pid),
+                    "username": source.username(pid),
+                    "cmdline": source.cmdline(pid)
+                })
+            f.write(json.dumps({"t": time.time(), "processes": processes, "foreground": source.foreground_pid(),
+                                "idle": source.idle_seconds()}, ensure_ascii=False) + "\n")
+            if i + 1 < frames:
+                time.sleep(interval)
+
+
+def default_process_source():
+    if sys.platform == 'win32':
+        return WindowsProcessSource()
+    if sys.platform.startswith('linux') and os.path.isdir('/proc'):
+        return ProcProcessSource()
+    return PsutilProcessSource()
@@ -0,0 +1,90 @@
+import sys
+from array import array
+
+
+class ProcessTable:
+    """按 PID 索引的进程表，各字段存放在并行数组中
+
+    每个进程只占各数组中的一格和 PID 索引中的一项，名称字符串经 sys.intern
+    后与分类缓存、使用时长表共用同一个对象。删除时把末尾一格移到空位，数组保持紧凑。
+    """
+
+    __slots__ = ("_slot_of", "pids", "create_times", "cpu_user", "cpu_system", "names", "software_names")
+
+    def __init__(self):
+        self._slot_of = {}
+        self.pids = array('q')
+        self.create_times = array('d')
+        self.cpu_user = array('d')
+        self.cpu_system = array('d')
+        self.names = []
+        self.software_names = []
+
+    def __len__(self):
+        return len(self.pids)
+
+    def __contains__(self, pid):
+        return pid in self._slot_of
+
+    def __iter__(self):
+        return iter(self.pids)
+
+    def add(self, pid, name, software_name, create_time, cpu_times):
+        slot = self._slot_of.get(pid)
+        if slot is None:
+            self._slot_of[pid] = len(self.pids)
+            self.pids.append(pid)
+            self.create_times.append(create_time)
+            self.cpu_user.append(cpu_times.user)
+            self.cpu_system.append(cpu_times.system)
+            self.names.append(sys.intern(name))
+            self.software_names.append(sys.intern(software_name))
+            return
+        self.create_times[slot] = create_time
+        self.cpu_user[slot] = cpu_times.user
+        self.cpu_system[slot] = cpu_times.system
+        self.names[slot] = sys.intern(name)
+        self.software_names[slot] = sys.intern(software_name)
+
+    def create_time(self, pid):
+        return self.create_times[self._slot_of[pid]]
+
+    def cpu_time(self, pid):
+        slot = self._slot_of[pid]
+        return self.cpu_user[slot], self.cpu_system[slot]
+
+    def set_cpu_time(self, pid, cpu_times):
+        slot = self._slot_of[pid]
+        self.cpu_user[slot] = cpu_times.user
+        self.cpu_system[slot] = cpu_times.system
+
+    def remove(self, pid):
+        slot = self._slot_of.pop(pid)
+        last = len(self.pids) - 1
+        if slot != last:
+            self._slot_of[self.pids[last]] = slot
+            for column in (self.pids, self.create_times, self.cpu_user, self.cpu_system,
+                           self.names, self.software_names):
+                column[slot] = column[last]
+        for column in (self.pids, self.create_times, self.cpu_user, self.cpu_system,
+                       self.names, self.software_names):
+            column.pop()
+
+    def retain(self, pids):
+        """只保留 pids 中仍存在的进程，返回删除的数量"""
+        stale = [pid for pid in self.pids if pid not in pids]
+        for pid in stale:
+            self.remove(pid)
+        return len(stale)
+
+    def to_dict(self):
+        """导出为 current_process_data.json 沿用的布局"""
+        return {
+            pid: {
+                'name': self.names[slot],
+                'software_name': self.software_names[slot],
+                'create_time': self.create_times[slot],
+                'cpu_time': [self.cpu_user[slot], self.cpu_system[slot]]
+            }
+            for slot, pid in enumerate(self.pids)
+        }
@@ -1,35 +1,62 @@
 from PySide6.QtGui import QPixmap, QPainter, QImage
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QRectF
+from collections import OrderedDict, namedtuple
+import math
 import os
 
+# 一个动作的全部帧；durations 为各帧显示的毫秒数，非循环动作播完后切换到 next_action（缺省回到 idle）
+SpriteAction = namedtuple("SpriteAction", ["frames", "durations", "loop", "next_action"])
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp')
+
 class Resources:
-    """宠物资源管理器"""
+    """宠物资源管理器
+
+    每个动作由一帧或多帧组成，可从单张图像、精灵图或帧目录载入；
+    当前显示的动作和帧由 SpriteAnimator 推进。
+    """
+
+    # 缩放帧缓存的内存上限（字节），超出后按最近最少使用淘汰
+    SCALED_CACHE_LIMIT = 32 * 1024 * 1024
     
-    def __init__(self):
+    def __init__(self, scaled_cache_limit=SCALED_CACHE_LIMIT):
         self._images = {}
         self._current_action = 'idle'
         self._action_frames = {}
         self._current_frame = 0
+        # (起始动作, 目标动作) -> 切换时先播放的过渡动作
+        self._transitions = {}
+        # 驱动当前帧的 SpriteAnimator，创建动画器时自动登记
+        self.animator = None
+        # (动作, 帧, 宽, 高, 设备像素比) -> 缩放后的预乘 ARGB 图像
+        self._scaled = OrderedDict()
+        self._scaled_bytes = 0
+        self.scaled_cache_limit = scaled_cache_limit
+        self.scaled_stats = {"hits": 0, "misses": 0, "evictions": 0}
         self._load_default_images()
     
     def _load_default_images(self):
         """加载默认宠物图像"""
-        # 创建默认的宠物图像（简单圆形）
+        # 创建默认的宠物图像（简单圆形），上下轻微起伏形成呼吸动画
         size = 100
-        image = QImage(size, size, QImage.Format_ARGB32)
-        image.fill(Qt.transparent)
-        
-        painter = QPainter(image)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setPen(Qt.NoPen)
-        painter.setBrush(Qt.white)
-        painter.drawEllipse(0, 0, size, size)
-        painter.end()
+        frames = []
+        for i in range(8):
+            squash = 3 * (1 - math.cos(2 * math.pi * i / 8))
+            image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+            image.fill(Qt.transparent)
+            
+            painter = QPainter(image)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(Qt.white)
+            painter.drawEllipse(QRectF(0, squash, size, size - squash))
+            painter.end()
+            frames.append(image)
         
-        self._images['idle'] = image
+        self.register_frames('idle', frames, durations=150)
     
     def get_image(self, action='idle'):
-        """获取指定动作的图像"""
+        """获取指定动作的图像（第一帧）"""
         return self._images.get(action, self._images['idle'])
     
     def register_action(self, action_name, image_or_path):
@@ -37,15 +64,119 @@ class Resources:
         if isinstance(image_or_path, str):
             if os.path.exists(image_or_path):
                 image = QImage(image_or_path)
-                self._images[action_name] = image
+                self.register_frames(action_name, [image])
         else:
-            self._images[action_name] = image_or_path
+            self.register_frames(action_name, [image_or_path])
+
+    def register_frames(self, action_name, frames, durations=100, loop=True, next_action=None):
+        """注册多帧动作；durations 为统一的毫秒数或逐帧列表"""
+        if not frames:
+            return
+        if isinstance(durations, (int, float)):
+            durations = [durations] * len(frames)
+        self._action_frames[action_name] = SpriteAction(list(frames), list(durations), loop, next_action)
+        self._images[action_name] = frames[0]
+        self.invalidate_scaled(action_name)
+
+    def load_sprite_sheet(self, action_name, image_or_path, frame_width, frame_height=None, count=None, **timing):
+        """从精灵图按行切出等大的帧，count 为 None 时取满整张图"""
+        sheet = QImage(image_or_path) if isinstance(image_or_path, str) else image_or_path
+        if sheet.isNull():
+            print(f"加载精灵图时出错: {image_or_path}")
+            return
+        frame_height = frame_height or sheet.height()
+        columns, rows = sheet.width() // frame_width, sheet.height() // frame_height
+        total = columns * rows if count is None else min(count, columns * rows)
+        frames = [sheet.copy((i % columns) * frame_width, (i // columns) * frame_height, frame_width, frame_height)
+                  for i in range(total)]
+        self.register_frames(action_name, frames, **timing)
+
+    def load_frame_folder(self, action_name, directory, **timing):
+        """按文件名顺序载入目录中的图像作为各帧"""
+        try:
+            names = sorted(name for name in os.listdir(directory) if name.lower().endswith(IMAGE_SUFFIXES))
+        except OSError as e:
+            print(f"加载动作帧目录时出错: {e}")
+            return
+        frames = [QImage(os.path.join(directory, name)) for name in names]
+        self.register_frames(action_name, [frame for frame in frames if not frame.isNull()], **timing)
+
+    def register_transition(self, from_action, to_action, transition_action):
+        """从 from_action 切换到 to_action 时先播放一遍 transition_action"""
+        self._transitions[(from_action, to_action)] = transition_action
+
+    def get_transition(self, from_action, to_action):
+        return self._transitions.get((from_action, to_action))
+
+    def get_action(self, action):
+        return self._action_frames.get(action, self._action_frames['idle'])
+
+    def get_frame(self, action, frame):
+        frames = self.get_action(action).frames
+        return frames[frame % len(frames)]
+
+    def has_action(self, action):
+        return action in self._action_frames
     
     def set_action(self, action):
-        """设置当前动作"""
+        """设置当前动作；有动画器时交给它播放（包括过渡），否则直接显示该动作的首帧"""
+        if action not in self._images:
+            return
+        if self.animator is not None:
+            self.animator.play(action)
+        else:
+            self._current_action = action
+            self._current_frame = 0
+
+    def set_frame(self, action, frame):
+        """设置当前显示的动作和帧，由 SpriteAnimator 调用"""
         if action in self._images:
             self._current_action = action
+            self._current_frame = frame
+
+    def get_current_frame(self):
+        return self._current_action, self._current_frame
     
     def get_current_image(self):
         """获取当前图像"""
-        return self.get_image(self._current_action)
+        return self.get_frame(self._current_action, self._current_frame)
+
+    def get_scaled_image(self, width, height, device_pixel_ratio=1.0):
+        """当前帧按窗口大小保持比例平滑缩放后的图像
+
+        结果为 Format_ARGB32_Premultiplied，可直接绘制而无需再转换格式，
+        按 (动作, 帧, 尺寸, 设备像素比) 缓存，拖动窗口等重复绘制不再重新缩放。
+        """
+        action = self._current_action if self._current_action in self._images else 'idle'
+        key = (action, self._current_frame, width, height, device_pixel_ratio)
+        image = self._scaled.get(key)
+        if image is not None:
+            self._scaled.move_to_end(key)
+            self.scaled_stats["hits"] += 1
+            return image
+
+        self.scaled_stats["misses"] += 1
+        image = self.get_frame(action, self._current_frame).scaled(
+            round(width * device_pixel_ratio), round(height * device_pixel_ratio),
+            Qt.KeepAspectRatio, Qt.SmoothTransformation
+        ).convertToFormat(QImage.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(device_pixel_ratio)
+        self._scaled[key] = image
+        self._scaled_bytes += image.sizeInBytes()
+        while self._scaled_bytes > self.scaled_cache_limit and len(self._scaled) > 1:
+            _, evicted = self._scaled.popitem(last=False)
+            self._scaled_bytes -= evicted.sizeInBytes()
+            self.scaled_stats["evictions"] += 1
+        return image
+
+    def invalidate_scaled(self, action=None):
+        """丢弃缓存的缩放帧；action 为 None 时全部丢弃，例如窗口尺寸改变后"""
+        if action is None:
+            self._scaled.clear()
+            self._scaled_bytes = 0
+            return
+        for key in [key for key in self._scaled if key[0] == action]:
+            self._scaled_bytes -= self._scaled.pop(key).sizeInBytes()
+
+    def get_scaled_cache_stats(self):
+        return dict(self.scaled_stats, size=len(self._scaled), bytes=self._scaled_bytes)
@@ -67,3 +67,35 @@ class Settings:
 
     def get_api_model(self) -> str:
         return self.settings.value("api_model", "gpt-3.5-turbo", str)
+
+    def set_usage_storage(self, storage: str) -> None:
+        self.settings.setValue("usage_storage", storage)
+
+    def get_usage_storage(self) -> str:
+        return self.settings.value("usage_storage", "binary", str)
+
+    def set_usage_collector(self, mode: str) -> None:
+        self.settings.setValue("usage_collector", mode)
+
+    def get_usage_collector(self) -> str:
+        return self.settings.value("usage_collector", "thread", str)
+
+    def set_usage_sampling(self, mode: str) -> None:
+        self.settings.setValue("usage_sampling", mode)
+
+    def get_usage_sampling(self) -> str:
+        return self.settings.value("usage_sampling", "scan", str)
+
+    def set_usage_aggregate_children(self, value: bool) -> None:
+        self.settings.setValue("usage_aggregate_children", value)
+
+    def get_usage_aggregate_children(self) -> bool:
+        return self.settings.value("usage_aggregate_children", False, bool)
+
+    def set_usage_interval_bounds(self, min_interval: float, max_interval: float) -> None:
+        self.settings.setValue("usage_min_interval", min_interval)
+        self.settings.setValue("usage_max_interval", max_interval)
+
+    def get_usage_interval_bounds(self) -> tuple:
+        return (self.settings.value("usage_min_interval", 2.0, float),
+                self.settings.value("usage_max_interval", 30.0, float))
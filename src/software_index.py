@@ -0,0 +1,66 @@
+import os
+import json
+import threading
+from .process_source import merge_software_entries
+
+
+class SoftwareIndex:
+    """已安装软件索引
+
+    在后台线程中按分区构建，并把每个分区的戳记和扫描结果缓存到磁盘。
+    戳记未变的分区直接复用缓存，热启动时不会再列目录。构建完成前 mapping 为空。
+    """
+
+    def __init__(self, source, cache_file):
+        self.source = source
+        self.cache_file = cache_file
+        self.mapping = {}
+        self.version = 0
+        self.ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._build, daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        return self.ready.wait(timeout)
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                return json.load(f).get("sections", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self, sections):
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump({"sections": sections}, f, ensure_ascii=False)
+        os.replace(tmp_file, self.cache_file)
+
+    def build(self):
+        """同步构建索引，返回 (映射, 重新扫描的分区数)"""
+        cached = self._load_cache()
+        sections = {}
+        rescanned = 0
+        for section in self.source.software_sections():
+            stamp = self.source.section_stamp(section)
+            entry = cached.get(section)
+            if stamp is None or entry is None or entry.get("stamp") != stamp:
+                entry = {"stamp": stamp, "entries": self.source.scan_section(section)}
+                rescanned += 1
+            sections[section] = entry
+        if rescanned or sections.keys() != cached.keys():
+            self._save_cache(sections)
+        return merge_software_entries(entry["entries"] for entry in sections.values()), rescanned
+
+    def _build(self):
+        try:
+            mapping, _ = self.build()
+        except Exception as e:
+            print(f"构建已安装软件索引时出错: {e}")
+            mapping = {}
+        self.mapping = mapping
+        self.version += 1
+        self.ready.set()
@@ -0,0 +1,165 @@
+import time
+from PySide6.QtCore import QObject, QTimer, Qt
+
+
+class AnimationClock(QObject):
+    """所有宠物共用的动画时钟
+
+    只有一个单次触发的计时器，每次都定在活动的 SpriteAnimator 中最早的下一帧时刻；
+    没有活动的动画器（宠物全部隐藏、最小化或只显示静态帧）时计时器停止，不再产生任何唤醒。
+    """
+
+    _shared = None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._animators = []
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+        self.ticks = 0
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @staticmethod
+    def now():
+        """单调时钟，毫秒"""
+        return time.monotonic() * 1000
+
+    def add(self, animator):
+        if animator not in self._animators:
+            self._animators.append(animator)
+
+    def remove(self, animator):
+        if animator in self._animators:
+            self._animators.remove(animator)
+        self.reschedule()
+
+    def is_running(self):
+        return self._timer.isActive()
+
+    def reschedule(self):
+        deadlines = [animator.deadline for animator in self._animators
+                     if animator.active and animator.deadline is not None]
+        if not deadlines:
+            self._timer.stop()
+            return
+        self._timer.start(max(0, int(min(deadlines) - self.now() + 0.999)))
+
+    def _tick(self):
+        self.ticks += 1
+        now = self.now()
+        for animator in list(self._animators):
+            if animator.active:
+                animator.advance(now)
+        self.reschedule()
+
+
+class SpriteAnimator:
+    """按 Resources 中各动作的帧时长推进一只宠物的动画
+
+    循环动作播到末帧回到首帧；非循环动作播完后切到排队的下一个动作、动作的 next_action 或 idle。
+    play() 时若登记了过渡动作，先播放过渡再进入目标动作。只有显示的帧变化时才调用
+    on_frame_changed（一般为窗口的 update），静态帧不占用时钟。
+    """
+
+    # 落后超过这么多毫秒（如系统休眠）时不再逐帧追赶，直接从当前时刻重新计时
+    MAX_CATCH_UP = 1000
+
+    def __init__(self, resources, on_frame_changed, clock=None):
+        self.resources = resources
+        self.on_frame_changed = on_frame_changed
+        self.clock = clock if clock else AnimationClock.shared()
+        self.action, self.frame = resources.get_current_frame()
+        self.deadline = None
+        self.active = False
+        self.frames_shown = 0
+        self._queue = []
+        # Resources.set_action() 经由 play() 切换，不会被下一帧覆盖
+        resources.animator = self
+        self.clock.add(self)
+        self._start(self.action, self.clock.now())
+
+    def set_active(self, active):
+        """窗口可见时激活；隐藏或最小化时停用，不再推进也不再重绘"""
+        if active == self.active:
+            return
+        self.active = active
+        if active and self.deadline is not None:
+            # 停用期间不计时，恢复后从当前帧重新开始计时
+            self.deadline = self.clock.now() + self._duration()
+        self.clock.reschedule()
+
+    def play(self, action, then=None):
+        """切换到 action，then 为 action 是非循环动作时播完后要进入的动作"""
+        if not self.resources.has_action(action):
+            return
+        self._queue = [action] + ([then] if then else [])
+        transition = self.resources.get_transition(self.action, action)
+        if transition and self.resources.has_action(transition):
+            self._start(transition, self.clock.now())
+        else:
+            self._start(self._queue.pop(0), self.clock.now())
+        self.clock.reschedule()
+
+    def advance(self, now):
+        """推进到 now，返回下一帧的时刻；当前为静态帧时返回 None"""
+        changed = False
+        while self.deadline is not None and now >= self.deadline:
+            late = now - self.deadline
+            sprite = self.resources.get_action(self.action)
+            if self.frame + 1 < len(sprite.frames):
+                self.frame += 1
+            elif sprite.loop:
+                self.frame = 0
+            else:
+                self._start(self._next_action(sprite), now, show=False)
+                changed = True
+                continue
+            self.deadline = (now if late > self.MAX_CATCH_UP else self.deadline) + self._duration()
+            changed = True
+        if changed:
+            self._show()
+        return self.deadline
+
+    def _next_action(self, sprite):
+        while self._queue:
+            action = self._queue.pop(0)
+            if self.resources.has_action(action):
+                return action
+        if sprite.next_action and self.resources.has_action(sprite.next_action):
+            return sprite.next_action
+        return 'idle'
+
+    def _duration(self):
+        durations = self.resources.get_action(self.action).durations
+        return max(1, durations[self.frame % len(durations)])
+
+    def _start(self, action, now, show=True):
+        self.action = action
+        self.frame = 0
+        sprite = self.resources.get_action(action)
+        # 单帧的循环动作不需要推进
+        if len(sprite.frames) > 1 or not sprite.loop:
+            self.deadline = now + self._duration()
+        else:
+            self.deadline = None
+        if show:
+            self._show()
+
+    def _show(self):
+        if self.resources.get_current_frame() != (self.action, self.frame):
+            self.resources.set_frame(self.action, self.frame)
+            self.frames_shown += 1
+            self.on_frame_changed()
+
+    def close(self):
+        self.active = False
+        if self.resources.animator is self:
+            self.resources.animator = None
+        self.clock.remove(self)
@@ -0,0 +1,112 @@
+import os
+import json
+import math
+import time
+from collections import deque, defaultdict
+from contextlib import contextmanager
+
+
+def percentile(sorted_values, fraction):
+    """最近秩法求分位数，sorted_values 需已升序"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class TickProfiler:
+    """监控周期的分阶段耗时与计数统计
+
+    每个周期记录各阶段耗时（秒）和计数器，保存在固定长度的环形缓冲区中，
+    按需计算 p50/p95/p99。每个周期只多出几次 perf_counter 调用，可以常开。
+    """
+
+    def __init__(self, capacity=720, metrics_file=None, report_interval=60, log=False):
+        self.records = deque(maxlen=capacity)
+        self.metrics_file = metrics_file
+        self.report_interval = report_interval
+        self.log = log
+        self.ticks = 0
+        self._phases = None
+        self._counters = None
+        self._tick_start = 0.0
+        self._last_report = time.monotonic()
+        # 名称 -> 无参函数，返回值随摘要一起输出，如调度器的当前状态
+        self.extras = {}
+
+    def begin_tick(self):
+        self._phases = defaultdict(float)
+        self._counters = defaultdict(int)
+        self._tick_start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        if self._phases is not None:
+            self._phases[name] += seconds
+
+    def count(self, name, value=1):
+        if self._counters is not None:
+            self._counters[name] += value
+
+    def end_tick(self):
+        if self._phases is None:
+            return
+        self.records.append({
+            "time": time.time(),
+            "total": time.perf_counter() - self._tick_start,
+            "phases": dict(self._phases),
+            "counters": dict(self._counters)
+        })
+        self.ticks += 1
+        self._phases = self._counters = None
+        if (self.metrics_file or self.log) and time.monotonic() - self._last_report >= self.report_interval:
+            self._last_report = time.monotonic()
+            self.report()
+
+    def summary(self):
+        """各阶段耗时（毫秒）与计数器的 p50/p95/p99/max/mean"""
+        series = defaultdict(list)
+        # 监控线程会同时追加记录，先在 C 层一次性复制，避免迭代期间 deque 被修改
+        records = tuple(self.records)
+        for record in records:
+            series[("phase", "total")].append(record["total"] * 1000)
+            for name, seconds in record["phases"].items():
+                series[("phase", name)].append(seconds * 1000)
+            for name, value in record["counters"].items():
+                series[("counter", name)].append(value)
+
+        result = {"ticks": self.ticks, "window": len(records), "phases": {}, "counters": {}}
+        for (kind, name), values in series.items():
+            values.sort()
+            result[kind + "s"][name] = {
+                "p50": percentile(values, 0.50),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+                "max": values[-1],
+                "mean": sum(values) / len(values)
+            }
+        for name, provider in self.extras.items():
+            result[name] = provider()
+        return result
+
+    def report(self):
+        summary = self.summary()
+        if self.log:
+            total = summary["phases"].get("total", {})
+            print(f"监控周期耗时 p50={total.get('p50', 0):.2f}ms p95={total.get('p95', 0):.2f}ms "
+                  f"p99={total.get('p99', 0):.2f}ms（最近 {summary['window']} 个周期）")
+        if self.metrics_file:
+            try:
+                tmp_file = self.metrics_file + ".tmp"
+                with open(tmp_file, 'w') as f:
+                    json.dump(summary, f, indent=4)
+                os.replace(tmp_file, self.metrics_file)
+            except OSError as e:
+                print(f"写入性能指标时出错: {e}")
@@ -0,0 +1,91 @@
+import time
+import threading
+from collections import deque, namedtuple
+
+# 一次调度决策：churn 为本周期新增与退出的进程数，load 为每秒记入的时长，idle 为用户空闲秒数（未知时为 None）
+SchedulerDecision = namedtuple("SchedulerDecision", ["time", "interval", "reason", "churn", "load", "idle"])
+
+
+class AdaptiveScheduler:
+    """根据进程变化、CPU 时间增量和用户空闲时间调整监控周期
+
+    进程集合和记入时长稳定、或用户长时间没有输入时按 backoff 倍数逐步拉长周期，
+    进程频繁启动退出时立即缩短，其余情况逐步回到 base_interval；周期始终限制在
+    [min_interval, max_interval] 内。wait() 可被 stop() 立即打断，start() 后可重新使用。
+    最近 history 次决策保存在 decisions 中供诊断查看。
+    """
+
+    def __init__(self, base_interval=5.0, min_interval=2.0, max_interval=30.0, backoff=1.5,
+                 churn_threshold=3, load_tolerance=0.25, idle_after=300, history=60):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.base_interval = self._clamp(base_interval)
+        self.backoff = backoff
+        self.churn_threshold = churn_threshold
+        self.load_tolerance = load_tolerance
+        self.idle_after = idle_after
+        self.interval = self.base_interval
+        self.reason = "start"
+        self.decisions = deque(maxlen=history)
+        self._last_load = None
+        self._stop_event = threading.Event()
+
+    def _clamp(self, interval):
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _decide(self, interval, reason, churn=0, load=0.0, idle=None):
+        self.interval = self._clamp(interval)
+        self.reason = reason
+        self.decisions.append(SchedulerDecision(time.time(), self.interval, reason, churn, load, idle))
+        return self.interval
+
+    def observe(self, churn, load, idle=None):
+        """根据本周期的观测结果决定下一个周期的间隔（秒）"""
+        last_load, self._last_load = self._last_load, load
+        if churn >= self.churn_threshold:
+            return self._decide(min(self.interval, self.base_interval) / 2, "churn", churn, load, idle)
+        if idle is not None and idle >= self.idle_after:
+            return self._decide(self.interval * self.backoff, "idle", churn, load, idle)
+        if churn == 0 and last_load is not None and \
+                abs(load - last_load) <= self.load_tolerance * max(last_load, 1.0):
+            return self._decide(self.interval * self.backoff, "stable", churn, load, idle)
+        # 有少量变化：向基准间隔靠拢
+        if self.interval < self.base_interval:
+            interval = min(self.base_interval, self.interval * self.backoff)
+        else:
+            interval = max(self.base_interval, self.interval / self.backoff)
+        return self._decide(interval, "active", churn, load, idle)
+
+    def error(self):
+        """周期出错后放慢，至少等待两倍基准间隔"""
+        self._last_load = None
+        return self._decide(max(self.interval, self.base_interval * 2), "error")
+
+    def wait(self):
+        """等待当前间隔，被 stop() 打断时返回 True"""
+        return self._stop_event.wait(self.interval)
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def start(self):
+        self._stop_event.clear()
+
+    def state(self, recent=10):
+        """当前间隔、最近一次决策原因、各原因的次数和最近 recent 次决策"""
+        # decisions 由监控线程追加，先复制再遍历
+        decisions = tuple(self.decisions)
+        reasons = {}
+        for decision in decisions:
+            reasons[decision.reason] = reasons.get(decision.reason, 0) + 1
+        return {
+            "interval": self.interval,
+            "reason": self.reason,
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "reasons": reasons,
+            "recent": [decision._asdict() for decision in decisions[-recent:]]
+        }
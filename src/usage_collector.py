@@ -0,0 +1,267 @@
+import os
+import json
+import mmap
+import time
+import struct
+import datetime
+import multiprocessing
+from array import array
+from PySide6.QtCore import QStandardPaths, QTimer
+from .usage_store import HourRing, UsageSnapshot
+from .usage_tracker import UsageNotifier, UsageQueries, UsageTracker
+
+
+class SharedUsageWriter:
+    """把最近若干天的聚合结果写入内存映射文件
+
+    文件头为 (magic, seq, meta_len, data_len)。写入前 seq 变为奇数、写完后变为偶数，
+    读取方发现 seq 为奇数或前后不一致时直接沿用旧数据，不会等待写入方。
+    """
+
+    HEADER = struct.Struct("<4sQII")
+    MAGIC = b"DPUS"
+    CAPACITY = 4 * 1024 * 1024
+    # 覆盖统计对话框中一整年的热力图（usage_heatmap.HEATMAP_DAYS）
+    PUBLISHED_DAYS = 365
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'a+b') as f:
+            if os.path.getsize(path) < self.CAPACITY:
+                f.truncate(self.CAPACITY)
+        self._file = open(path, 'r+b')
+        self._mmap = mmap.mmap(self._file.fileno(), self.CAPACITY)
+        self._seq = self.HEADER.unpack_from(self._mmap, 0)[1] & ~1
+
+    def _encode(self, snapshot):
+        today = datetime.date.today().toordinal()
+        base_day = today - self.PUBLISHED_DAYS + 1
+        active = snapshot.active_apps(base_day, today)
+        limit = self.CAPACITY - self.HEADER.size
+        while True:
+            names = [name for name, _ in active]
+            data = array('d')
+            for name in names:
+                data.extend(snapshot.app_window(name, base_day, today))
+            data.extend(snapshot.daily_totals(base_day, today))
+            # 今天的逐小时数据跟在后面：每个应用 24 格，最后是全部应用的合计
+            for name in names + [None]:
+                data.extend(snapshot.hour_values(name, today * 24, today * 24 + 23))
+            meta = json.dumps({"version": snapshot.version, "base_day": base_day,
+                               "days": self.PUBLISHED_DAYS, "names": names},
+                              ensure_ascii=False).encode()
+            data = data.tobytes()
+            if len(meta) + len(data) <= limit or not active:
+                return meta, data
+            # 超出容量时丢弃使用时间最少的一半应用
+            active = sorted(active, key=lambda item: item[1], reverse=True)[:len(active) // 2]
+
+    def publish(self, snapshot):
+        meta, data = self._encode(snapshot)
+        self._seq += 1
+        self.HEADER.pack_into(self._mmap, 0, self.MAGIC, self._seq, 0, 0)
+        offset = self.HEADER.size
+        self._mmap[offset:offset + len(meta)] = meta
+        self._mmap[offset + len(meta):offset + len(meta) + len(data)] = data
+        self._seq += 1
+        self.HEADER.pack_into(self._mmap, 0, self.MAGIC, self._seq, len(meta), len(data))
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+class SharedUsageReader:
+    """读取 SharedUsageWriter 发布的数据，始终非阻塞"""
+
+    def __init__(self, path):
+        self.path = path
+        self._mmap = None
+        self._seq = None
+
+    def _open(self):
+        if self._mmap is None and os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                if os.path.getsize(self.path) >= SharedUsageWriter.CAPACITY:
+                    self._mmap = mmap.mmap(f.fileno(), SharedUsageWriter.CAPACITY, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def read(self):
+        """有新的一致数据时返回 UsageSnapshot，否则返回 None"""
+        mm = self._open()
+        if mm is None:
+            return None
+        header = SharedUsageWriter.HEADER
+        magic, seq, meta_len, data_len = header.unpack_from(mm, 0)
+        if magic != SharedUsageWriter.MAGIC or seq & 1 or seq == self._seq:
+            return None
+        payload = mm[header.size:header.size + meta_len + data_len]
+        if header.unpack_from(mm, 0)[1] != seq:
+            return None
+        self._seq = seq
+        meta = json.loads(payload[:meta_len])
+        data = array('d')
+        data.frombytes(payload[meta_len:])
+        days = meta["days"]
+        names = meta["names"]
+        rows = tuple(data[i * days:(i + 1) * days] for i in range(len(names)))
+        hours_offset = (len(names) + 1) * days
+        first_hour = (meta["base_day"] + days - 1) * 24
+        rings = []
+        for i in range(len(names) + 1):
+            ring = HourRing()
+            for hour, seconds in enumerate(data[hours_offset + i * 24:hours_offset + (i + 1) * 24], first_hour):
+                if seconds:
+                    ring.add(hour, seconds)
+            rings.append(ring)
+        return UsageSnapshot(
+            meta["version"], names, {name: row for row, name in enumerate(names)}, rows,
+            array('d', bytes(8 * len(names))), array('d', bytes(8 * len(names))),
+            data[len(names) * days:hours_offset], meta["base_day"], {},
+            hours=tuple(rings[:-1]), hour_totals=rings[-1])
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+def run_collector(conn, data_dir, storage, shared_file, interval=5.0, sampling="scan", aggregate_children=False,
+                  min_interval=2.0, max_interval=30.0):
+    """收集进程入口：按自适应间隔扫描进程，快照版本变化时发布并通知界面进程"""
+    tracker = UsageTracker(storage=storage, data_dir=data_dir, autostart=False,
+                           metrics_file=os.path.join(data_dir, RemoteUsageTracker.METRICS_FILE),
+                           sampling=sampling, aggregate_children=aggregate_children,
+                           interval=interval, min_interval=min_interval, max_interval=max_interval)
+    writer = SharedUsageWriter(shared_file)
+    published = None
+    try:
+        while True:
+            try:
+                tracker.update_process_data()
+            except Exception as e:
+                print(f"监控过程中发生错误: {e}")
+                tracker.scheduler.error()
+            version = tracker.get_snapshot_version()
+            if version != published:
+                writer.publish(tracker.get_snapshot())
+                conn.send(version)
+                published = version
+            # 等待下一个周期，同时响应停止请求；界面进程退出时管道关闭会触发 EOFError
+            if conn.poll(tracker.scheduler.interval) and conn.recv() == "stop":
+                break
+    except (EOFError, OSError, BrokenPipeError):
+        pass
+    finally:
+        tracker.stop()
+        writer.close()
+
+
+class RemoteUsageTracker(UsageQueries):
+    """在独立进程中运行 UsageTracker，界面进程通过共享内存读取最近的聚合结果
+
+    查询接口与 UsageTracker 相同，但只覆盖最近 PUBLISHED_DAYS 天。
+    收集进程意外退出后按指数退避自动重启。
+    """
+
+    MAX_RESTART_DELAY = 60
+    STABLE_AFTER = 60
+    METRICS_FILE = "usage_metrics.json"
+
+    def __init__(self, storage="binary", data_dir=None, poll_interval=1000, sampling="scan",
+                 aggregate_children=False, min_interval=2.0, max_interval=30.0):
+        self.storage = storage
+        self.sampling = sampling
+        self.aggregate_children = aggregate_children
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.data_dir = data_dir if data_dir else os.path.join(
+            QStandardPaths.writableLocation(QStandardPaths.AppDataLocation), "DesktopPet")
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+        self.shared_file = os.path.join(self.data_dir, "usage_shared.bin")
+        self.snapshot = UsageSnapshot(0, [], {}, (), array('d'), array('d'), array('d'), None, {})
+        self.notifier = UsageNotifier()
+        self.restart_count = 0
+        self._reader = SharedUsageReader(self.shared_file)
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._conn = None
+        self._started_at = 0
+        self._restart_at = None
+
+        self.start()
+        self._timer = QTimer()
+        self._timer.timeout.connect(self._poll)
+        self._timer.start(poll_interval)
+
+    def start(self):
+        parent_conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(
+            target=run_collector, args=(child_conn, self.data_dir, self.storage, self.shared_file),
+            kwargs={"sampling": self.sampling, "aggregate_children": self.aggregate_children,
+                    "min_interval": self.min_interval, "max_interval": self.max_interval}, daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self._started_at = time.monotonic()
+
+    def get_tick_metrics(self):
+        """收集进程每分钟写出的性能指标，尚未写出时返回 None"""
+        try:
+            with open(os.path.join(self.data_dir, self.METRICS_FILE), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_scheduler_state(self):
+        """收集进程最近一次写出的调度状态，尚未写出时返回 None"""
+        metrics = self.get_tick_metrics()
+        return metrics.get("scheduler") if metrics else None
+
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def _poll(self):
+        notified = False
+        try:
+            while self._conn.poll():
+                self._conn.recv()
+                notified = True
+        except (EOFError, OSError):
+            pass
+        if notified:
+            snapshot = self._reader.read()
+            if snapshot is not None:
+                self.snapshot = snapshot
+                self.notifier.snapshot_changed.emit(snapshot.version)
+        self._supervise()
+
+    def _supervise(self):
+        if self.is_alive():
+            return
+        now = time.monotonic()
+        if self._restart_at is None:
+            if now - self._started_at > self.STABLE_AFTER:
+                self.restart_count = 0
+            delay = min(self.MAX_RESTART_DELAY, 2 ** self.restart_count)
+            print(f"使用统计收集进程已退出（退出码 {self._process.exitcode}），{delay} 秒后重启")
+            self._restart_at = now + delay
+        elif now >= self._restart_at:
+            self._restart_at = None
+            self.restart_count += 1
+            self._conn.close()
+            self.start()
+
+    def stop(self, timeout=3):
+        self._timer.stop()
+        if self.is_alive():
+            try:
+                self._conn.send("stop")
+            except (OSError, BrokenPipeError):
+                pass
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._conn.close()
+        self._reader.close()
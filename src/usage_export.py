@@ -0,0 +1,174 @@
+"""流式导出使用历史
+
+逐行产生 (应用名, 日期, 秒数, 天数)，写为 CSV 或 NDJSON。数据按应用逐段从列式表或 SQLite 游标中读出，
+每次只缓冲一个应用的行，不会在内存中展开完整历史。秒数保留三位小数。
+逐日保存的数据天数为 1；已按周、按月汇总的历史每个桶一行，日期为桶的起始日，天数为桶的长度。
+
+用法: python -m src.usage_export [-o usage.csv] [--format csv|ndjson] [--start 2024-01-01] [--end 2024-12-31]
+                                 [--app chrome.exe ...] [--storage binary|json|sqlite] [--data-dir 目录]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+from itertools import repeat
+from PySide6.QtCore import QCoreApplication, QStandardPaths
+from .usage_journal import UsageJournal
+from .usage_history import HistoryJournal
+from .usage_sqlite import SQLiteUsageStore
+from .usage_store import UsageStore, day_to_str
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_FIELDS = ("app", "date", "seconds", "days")
+
+
+class _DateStrings(dict):
+    """日期序数 -> "YYYY-MM-DD"，每个日期只格式化一次"""
+
+    def __missing__(self, day):
+        date = self[day] = day_to_str(day)
+        return date
+
+
+def _iter_blocks(view, start, end, apps):
+    """逐段产生 (应用名, 日期序数列表, 天数列表, 秒数列表)，逐日数据的天数列表为 None
+
+    同一应用的汇总桶与逐日数据是相邻的两段，汇总桶在前；与区间只部分重叠的汇总桶整行写出，不按天数折算。
+    """
+    start_day = start.toordinal() if start else None
+    end_day = end.toordinal() if end else None
+    buckets = {app_name: block for app_name, *block in view.iter_app_buckets(start_day, end_day, apps)}
+    for app_name, days, seconds in view.iter_app_days(start_day, end_day, apps):
+        block = buckets.pop(app_name, None)
+        if block is not None:
+            yield (app_name, *block)
+        yield app_name, days, None, seconds
+    for app_name, block in buckets.items():
+        yield (app_name, *block)
+
+
+def iter_usage_rows(view, start=None, end=None, apps=None):
+    """逐行产生 (应用名, "YYYY-MM-DD", 秒数, 天数)；start、end 为 date，包含两端，缺省时不限制"""
+    dates = _DateStrings()
+    for app_name, days, spans, seconds in _iter_blocks(view, start, end, apps):
+        for day, value, span in zip(days, seconds, spans if spans is not None else repeat(1)):
+            yield app_name, dates[day], value, span
+
+
+def _csv_field(value):
+    if any(char in value for char in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _csv_block(app_name, dates, spans, seconds):
+    prefix = _csv_field(app_name) + ","
+    if spans is None:
+        # 逐日数据的天数恒为 1，直接写在格式串中
+        return "".join([f"{prefix}{date},{value:.3f},1\n" for date, value in zip(dates, seconds)])
+    return "".join([f"{prefix}{date},{value:.3f},{span}\n" for date, span, value in zip(dates, spans, seconds)])
+
+
+def _ndjson_block(app_name, dates, spans, seconds):
+    prefix = '{"app": ' + json.dumps(app_name, ensure_ascii=False) + ', "date": "'
+    if spans is None:
+        return "".join([f'{prefix}{date}", "seconds": {value:.3f}, "days": 1}}\n'
+                        for date, value in zip(dates, seconds)])
+    return "".join([f'{prefix}{date}", "seconds": {value:.3f}, "days": {span}}}\n'
+                    for date, span, value in zip(dates, spans, seconds)])
+
+
+def export_usage(view, f, fmt="csv", start=None, end=None, apps=None):
+    """把 view（UsageStore、快照或 SQLiteUsageStore）中的历史写到文本文件对象 f，返回写出的行数
+
+    CSV 带表头 app,date,seconds,days；NDJSON 每行一个 {"app", "date", "seconds", "days"} 对象。
+    days 为该行覆盖的天数，汇总桶的秒数是整个桶的合计。
+    """
+    if fmt == "csv":
+        f.write(",".join(EXPORT_FIELDS) + "\n")
+        format_block = _csv_block
+    elif fmt == "ndjson":
+        format_block = _ndjson_block
+    else:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    dates = _DateStrings()
+    count = 0
+    for app_name, days, spans, seconds in _iter_blocks(view, start, end, apps):
+        f.write(format_block(app_name, map(dates.__getitem__, days), spans, seconds))
+        count += len(days)
+    return count
+
+
+def load_usage_view(data_dir, storage="binary"):
+    """只读加载数据目录中的历史，与 UsageTracker.load_usage_data 的来源一致，但不做迁移"""
+    usage_data_file = os.path.join(data_dir, "usage_data.json")
+    if storage == "sqlite":
+        return SQLiteUsageStore(os.path.join(data_dir, "usage_data.db"))
+    if storage == "binary":
+        journal = HistoryJournal(os.path.join(data_dir, "usage_history.bin"))
+        if journal.has_snapshot() or not os.path.exists(usage_data_file):
+            return journal.load()
+    return UsageStore.from_usage_data(UsageJournal(usage_data_file).load())
+
+
+def default_data_dir():
+    """桌面宠物自身的数据目录，与 UsageTracker 缺省使用的目录相同
+
+    main.py 没有设置应用名，Qt 以启动的程序名作应用名：Windows 下为可执行文件名（python、打包后的 exe），
+    其他平台为入口脚本名。这里由包的位置确定入口（打包运行时为可执行文件，否则为与 src 包同目录的 main.py），
+    临时设置同样的应用名解析路径后再恢复，与当前进程如何启动、是否已有 QCoreApplication 无关。
+    """
+    if getattr(sys, "frozen", False) or sys.platform == "win32":
+        entry = sys.executable
+    else:
+        entry = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+    app_name = os.path.basename(entry)
+    if sys.platform == "win32":
+        app_name = os.path.splitext(app_name)[0]
+    previous = QCoreApplication.applicationName()
+    QCoreApplication.setApplicationName(app_name)
+    try:
+        return os.path.join(QStandardPaths.writableLocation(QStandardPaths.AppDataLocation), "DesktopPet")
+    finally:
+        QCoreApplication.setApplicationName(previous)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导出使用历史为 CSV 或 NDJSON")
+    parser.add_argument("-o", "--output", default="-", help="输出文件，缺省写到标准输出")
+    parser.add_argument("--format", choices=EXPORT_FORMATS,
+                        help="缺省按输出文件扩展名判断，.ndjson / .jsonl 为 NDJSON，其余为 CSV")
+    parser.add_argument("--start", type=datetime.date.fromisoformat)
+    parser.add_argument("--end", type=datetime.date.fromisoformat)
+    parser.add_argument("--app", action="append", dest="apps", help="只导出指定应用，可重复")
+    parser.add_argument("--storage", choices=("binary", "json", "sqlite"), default="binary")
+    parser.add_argument("--data-dir", help="缺省为桌面宠物自身的数据目录")
+    args = parser.parse_args(argv)
+    data_dir = args.data_dir if args.data_dir else default_data_dir()
+    if not os.path.isdir(data_dir):
+        parser.error(f"找不到数据目录: {data_dir}")
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "ndjson" if args.output.endswith((".ndjson", ".jsonl")) else "csv"
+    view = load_usage_view(data_dir, args.storage)
+    start = time.perf_counter()
+    if args.output == "-":
+        try:
+            count = export_usage(view, sys.stdout, fmt, args.start, args.end, args.apps)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # 输出接到 head 等提前退出的命令时安静结束
+            sys.stdout = open(os.devnull, 'w')
+            return
+    else:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            count = export_usage(view, f, fmt, args.start, args.end, args.apps)
+    elapsed = time.perf_counter() - start
+    print(f"已导出 {count} 行，用时 {elapsed:.2f} 秒", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
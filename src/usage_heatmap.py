@@ -0,0 +1,147 @@
+import datetime
+from bisect import bisect_right
+from typing import Optional, Sequence
+from PySide6.QtWidgets import QWidget, QToolTip
+from PySide6.QtCore import Qt, QRect, QSize
+from PySide6.QtGui import QPainter, QPixmap, QColor, QFont, QPen
+
+HEATMAP_DAYS = 365
+
+
+class UsageHeatmap(QWidget):
+    """按周排列的一年使用时长日历热力图
+
+    每列一周（周一在上），没有使用记录的天为最浅一档，其余按非零天的分位数分为 LEVELS - 1 档。
+    格子画在缓存的 QPixmap 上，只有某一天的颜色档位、起始日期或控件尺寸变化时才重画；
+    悬停高亮和提示直接叠加在缓存图上，按坐标 O(1) 定位到日期。
+    """
+
+    LEVELS = 5
+    COLORS = ("#ebedf0", "#c6e48b", "#7bc96f", "#239a3b", "#196127")
+    TOP_MARGIN = 14
+    LEFT_MARGIN = 22
+    GAP = 2
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.setMouseTracking(True)
+        self.setMinimumHeight(self.TOP_MARGIN + 7 * 8)
+        self._start_day = None
+        self._values: Sequence[float] = ()
+        self._levels: list = []
+        self._pixmap: Optional[QPixmap] = None
+        self._hover = None
+        self.renders = 0
+
+    def sizeHint(self) -> QSize:
+        return QSize(600, self.TOP_MARGIN + 7 * 11)
+
+    def _weeks(self) -> int:
+        if self._start_day is None:
+            return 53
+        return (self._start_day + len(self._values) - self._first_monday() + 6) // 7
+
+    def _geometry(self):
+        """返回 (格子边长, 相邻格子间距)"""
+        step = max(4, min((self.width() - self.LEFT_MARGIN) // self._weeks(),
+                          (self.height() - self.TOP_MARGIN) // 7))
+        return step - self.GAP, step
+
+    def _first_monday(self) -> int:
+        return self._start_day - (self._start_day - 1) % 7
+
+    def set_values(self, start_day: int, values: Sequence[float]) -> None:
+        """start_day 为首日的日期序数，values 为之后逐日的秒数"""
+        # 非零天按分位数分档，少数极端值不会把其余天都压到最浅一档
+        used = sorted(seconds for seconds in values if seconds > 0)
+        bounds = [used[len(used) * k // (self.LEVELS - 1)] for k in range(1, self.LEVELS - 1)] if used else []
+        levels = [0 if seconds <= 0 else 1 + bisect_right(bounds, seconds) for seconds in values]
+        self._values = values
+        if start_day != self._start_day or levels != self._levels:
+            self._start_day = start_day
+            self._levels = levels
+            self._pixmap = None
+            self.update()
+
+    def _render(self) -> QPixmap:
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(self.size() * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        if self._start_day is None:
+            return pixmap
+        painter = QPainter(pixmap)
+        painter.setFont(QFont("Arial", 7))
+        painter.setPen(QColor("#767676"))
+        cell, step = self._geometry()
+        first_monday = self._first_monday()
+        for row, label in ((0, "一"), (2, "三"), (4, "五")):
+            painter.drawText(QRect(0, self.TOP_MARGIN + row * step, self.LEFT_MARGIN - 4, cell),
+                             Qt.AlignRight | Qt.AlignVCenter, label)
+        # 每月第一天所在的列上方标出月份
+        for offset in range(len(self._levels)):
+            date = datetime.date.fromordinal(self._start_day + offset)
+            if date.day == 1:
+                column = (self._start_day + offset - first_monday) // 7
+                painter.drawText(self.LEFT_MARGIN + column * step, self.TOP_MARGIN - 3, f"{date.month}月")
+        painter.setPen(Qt.NoPen)
+        brushes = [QColor(color) for color in self.COLORS]
+        for offset, level in enumerate(self._levels):
+            index = self._start_day + offset - first_monday
+            painter.setBrush(brushes[level])
+            painter.drawRect(self.LEFT_MARGIN + index // 7 * step, self.TOP_MARGIN + index % 7 * step, cell, cell)
+        painter.end()
+        self.renders += 1
+        return pixmap
+
+    def _cell_rect(self, offset: int) -> QRect:
+        cell, step = self._geometry()
+        index = self._start_day + offset - self._first_monday()
+        return QRect(self.LEFT_MARGIN + index // 7 * step, self.TOP_MARGIN + index % 7 * step, cell, cell)
+
+    def day_at(self, x: int, y: int) -> Optional[int]:
+        """坐标处格子对应的下标（相对 start_day），不在任何格子上时返回 None"""
+        if self._start_day is None or x < self.LEFT_MARGIN or y < self.TOP_MARGIN:
+            return None
+        cell, step = self._geometry()
+        column, row = (x - self.LEFT_MARGIN) // step, (y - self.TOP_MARGIN) // step
+        if row >= 7 or (x - self.LEFT_MARGIN) % step >= cell or (y - self.TOP_MARGIN) % step >= cell:
+            return None
+        offset = self._first_monday() + column * 7 + row - self._start_day
+        return offset if 0 <= offset < len(self._values) else None
+
+    def paintEvent(self, event) -> None:
+        if self._pixmap is None or self._pixmap.deviceIndependentSize().toSize() != self.size():
+            self._pixmap = self._render()
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._pixmap)
+        if self._hover is not None:
+            painter.setPen(QPen(QColor("#333333"), 1))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRect(self._cell_rect(self._hover).adjusted(0, 0, -1, -1))
+
+    def resizeEvent(self, event) -> None:
+        self._pixmap = None
+        super().resizeEvent(event)
+
+    def mouseMoveEvent(self, event) -> None:
+        position = event.position().toPoint()
+        offset = self.day_at(position.x(), position.y())
+        if offset != self._hover:
+            # 只重画新旧两个格子所在的区域
+            for old in (self._hover, offset):
+                if old is not None:
+                    self.update(self._cell_rect(old).adjusted(-1, -1, 1, 1))
+            self._hover = offset
+        if offset is None:
+            QToolTip.hideText()
+            return
+        date = datetime.date.fromordinal(self._start_day + offset)
+        QToolTip.showText(event.globalPosition().toPoint(),
+                          f"{date.isoformat()}: {self._values[offset] / 60:.1f} 分钟", self)
+
+    def leaveEvent(self, event) -> None:
+        if self._hover is not None:
+            self.update(self._cell_rect(self._hover).adjusted(-1, -1, 1, 1))
+            self._hover = None
+        super().leaveEvent(event)
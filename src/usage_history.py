@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import mmap
+import struct
+import datetime
+from array import array
+from .usage_journal import UsageJournal
+from .usage_store import HOURS_KEPT, HourRing, UsageStore, bucket_edges, str_to_day
+
+
+class UsageHistoryFile:
+    """使用历史的二进制快照格式
+
+    布局依次为：定长文件头、JSON 元数据（应用名、降采样边界与桶边界、逐小时环的最新小时、
+    有汇总数据的应用行号）、每个应用的总时长与最后更新时间、每日合计、最近 RECENT_DAYS 天的按日数据
+    （按日连续存放）、逐小时环（先是合计，再是有小时数据的各应用，按行号顺序）、汇总桶（先是各桶合计，
+    再是 bucket_apps 中的各应用），最后按页对齐存放每个应用一行的逐日秒数。
+    没有 hour_heads 元数据的旧文件按没有逐小时数据读取；版本 1 的文件把汇总桶的日均值存放在逐日行中，
+    读取时改为按桶存放。
+
+    打开时只解析文件头、元数据、合计和最近几天的数据，并据此建立最近几天的排名；
+    各应用的完整历史行直接以内存映射的只读视图交给 UsageStore，查询访问到哪一页才读入哪一页，
+    写入某一行时才复制成普通数组。
+    """
+
+    HEADER = struct.Struct("<4sIQiIIIQQ")
+    MAGIC = b"DPUH"
+    FORMAT_VERSION = 2
+    RECENT_DAYS = 7
+    PAGE_SIZE = 4096
+
+    @classmethod
+    def write(cls, path, view, seq):
+        names = list(view.names)
+        n_apps = len(names)
+        base_day = view.base_day if view.base_day is not None else 0
+        n_days = max([len(view.day_totals)] + [len(view.rows[row]) for row in range(n_apps)])
+        recent_days = min(cls.RECENT_DAYS, n_days)
+        rings = [view.hour_totals] + [ring for ring in view.hours[:n_apps] if ring is not None]
+        hour_heads = [None if ring is None else ring.head for ring in view.hours[:n_apps]]
+        edges = list(view.bucket_edges)
+        bucket_apps = [row for row in range(n_apps) if view.bucket_rows[row]]
+        meta = json.dumps({"names": names, "rollup": view.rollup, "hour_head": view.hour_totals.head,
+                           "hour_heads": hour_heads, "bucket_edges": edges, "bucket_apps": bucket_apps},
+                          ensure_ascii=False).encode()
+        meta += b"\0" * (-len(meta) % 8)
+
+        recent = array('d')
+        for column in range(n_days - recent_days, n_days):
+            recent.extend(values[column] if len(values) > column else 0.0
+                          for values in (view.rows[row] for row in range(n_apps)))
+        day_totals = array('d', view.day_totals)
+        day_totals.extend(array('d', bytes(8 * (n_days - len(day_totals)))))
+
+        hour_values = array('d')
+        for ring in rings:
+            hour_values.extend(ring.values)
+        n_buckets = max(len(edges) - 1, 0)
+        bucket_values = array('d')
+        for buckets in [view.bucket_totals] + [view.bucket_rows[row] for row in bucket_apps]:
+            bucket_values.extend(buckets)
+            bucket_values.extend(array('d', bytes(8 * (n_buckets - len(buckets)))))
+        offset = cls.HEADER.size + len(meta) + 8 * (2 * n_apps + n_days + len(recent) + len(hour_values)
+                                                     + len(bucket_values))
+        rows_offset = offset + (-offset % cls.PAGE_SIZE)
+        with open(path, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.FORMAT_VERSION, seq, base_day, n_days, n_apps,
+                                    recent_days, len(meta), rows_offset))
+            f.write(meta)
+            f.write(array('d', view.total_time[:n_apps]).tobytes())
+            f.write(array('d', view.last_updated[:n_apps]).tobytes())
+            f.write(day_totals.tobytes())
+            f.write(recent.tobytes())
+            f.write(hour_values.tobytes())
+            f.write(bucket_values.tobytes())
+            f.write(b"\0" * (rows_offset - offset))
+            for row in range(n_apps):
+                values = view.rows[row]
+                f.write(values)
+                f.write(bytes(8 * (n_days - len(values))))
+            f.flush()
+            os.fsync(f.fileno())
+
+    @classmethod
+    def read(cls, path):
+        """返回 (UsageStore, seq)；历史行为内存映射视图，文件映射在 store 存活期间保持打开"""
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, seq, base_day, n_days, n_apps, recent_days, meta_len, rows_offset = \
+            cls.HEADER.unpack_from(mm, 0)
+        if magic != cls.MAGIC or version not in (1, cls.FORMAT_VERSION):
+            raise ValueError(f"无法识别的使用历史文件: {path}")
+
+        offset = cls.HEADER.size
+        meta = json.loads(mm[offset:offset + meta_len].rstrip(b"\0"))
+        offset += meta_len
+        sections = []
+        for length in (n_apps, n_apps, n_days, recent_days * n_apps):
+            values = array('d')
+            values.frombytes(mm[offset:offset + 8 * length])
+            sections.append(values)
+            offset += 8 * length
+        total_time, last_updated, day_totals, recent = sections
+
+        hours, hour_totals = None, None
+        if "hour_heads" in meta:
+            # 合计的环总是写出，各应用只写出有小时数据的环
+            rings = []
+            for head in [meta["hour_head"]] + [head for head in meta["hour_heads"] if head is not None]:
+                values = array('d')
+                values.frombytes(mm[offset:offset + 8 * HOURS_KEPT])
+                rings.append(HourRing(values, head))
+                offset += 8 * HOURS_KEPT
+            hour_totals = rings[0]
+            app_rings = iter(rings[1:])
+            hours = [None if head is None else next(app_rings) for head in meta["hour_heads"]]
+
+        edges = tuple(meta.get("bucket_edges", ()))
+        bucket_rows, bucket_totals = None, array('d')
+        if edges:
+            n_buckets = len(edges) - 1
+            bucket_values = array('d')
+            bucket_values.frombytes(mm[offset:offset + 8 * n_buckets * (1 + len(meta["bucket_apps"]))])
+            bucket_totals = bucket_values[:n_buckets]
+            bucket_rows = [array('d')] * n_apps
+            for i, row in enumerate(meta["bucket_apps"], 1):
+                bucket_rows[row] = bucket_values[i * n_buckets:(i + 1) * n_buckets]
+
+        view = memoryview(mm)
+        row_bytes = 8 * n_days
+        rows = [view[rows_offset + row * row_bytes:rows_offset + (row + 1) * row_bytes].cast('d')
+                for row in range(n_apps)]
+        # 最近几天的排名直接由按日连续存放的数据建立，不触碰各应用的历史行
+        recent_columns = {base_day + n_days - recent_days + i: recent[i * n_apps:(i + 1) * n_apps]
+                          for i in range(recent_days)}
+        rollup = tuple(meta["rollup"]) if meta.get("rollup") else None
+        store = UsageStore.from_columns(meta["names"], rows, total_time, last_updated, day_totals,
+                                        base_day if n_days or edges else None, rollup, recent_columns,
+                                        hours, hour_totals, edges, bucket_rows, bucket_totals)
+        if version == 1 and rollup and store.base_day is not None and store.base_day < rollup[1]:
+            store.compact(bucket_edges(store.base_day, *rollup))
+        return store, seq
+
+
+class HistoryJournal(UsageJournal):
+    """以二进制历史文件为快照的追加式日志，load() 直接返回 UsageStore
+
+    每次写快照都生成新的编号文件 usage_history.<n>.bin，而不是覆盖旧文件：
+    旧文件可能仍被当前进程映射，Windows 下无法替换或删除，留待之后清理。
+    """
+
+    def __init__(self, snapshot_file, **kwargs):
+        super().__init__(snapshot_file, **kwargs)
+        base, ext = os.path.splitext(snapshot_file)
+        self._directory, name = os.path.split(base)
+        self._pattern = re.compile(re.escape(name) + r"\.(\d+)" + re.escape(ext) + "$")
+        self._generation_format = os.path.join(self._directory, name + ".{}" + ext)
+
+    def _generations(self):
+        if not os.path.isdir(self._directory):
+            return []
+        found = []
+        for file_name in os.listdir(self._directory):
+            match = self._pattern.match(file_name)
+            if match:
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    def has_snapshot(self):
+        return bool(self._generations())
+
+    @staticmethod
+    def apply_record(store, record):
+        day = str_to_day(record["d"])
+        hour = datetime.datetime.fromtimestamp(record["t"]).hour
+        for app_name, increment in record["u"].items():
+            store.add(app_name, day, increment, record["t"], hour)
+
+    @staticmethod
+    def export(view):
+        return view
+
+    def _read_snapshot(self):
+        generations = self._generations()
+        if not generations:
+            return UsageStore(), 0
+        return UsageHistoryFile.read(self._generation_format.format(generations[-1]))
+
+    def _write_snapshot(self, view, seq):
+        generations = self._generations()
+        generation = generations[-1] + 1 if generations else 1
+        path = self._generation_format.format(generation)
+        tmp_file = path + ".tmp"
+        UsageHistoryFile.write(tmp_file, view, seq)
+        os.replace(tmp_file, path)
+        for old in generations:
+            try:
+                os.remove(self._generation_format.format(old))
+            except OSError:
+                # 仍被映射的旧文件下次再删
+                pass
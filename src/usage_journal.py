@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import datetime
+import threading
+from .usage_store import HOURS_KEPT, str_to_hour
+
+
+class UsageJournal:
+    """使用数据的追加式日志
+
+    每个监控周期只向日志追加一条增量记录，日志超过大小或时间阈值后
+    在后台线程中与快照合并。启动时按 快照 -> 待压缩日志 -> 当前日志 的顺序回放。
+    """
+
+    META_KEY = "__journal__"
+
+    def __init__(self, snapshot_file, max_log_bytes=1024 * 1024, max_log_age=600):
+        self.snapshot_file = snapshot_file
+        base, _ = os.path.splitext(snapshot_file)
+        self.log_file = base + ".log"
+        self.pending_file = base + ".log.compacting"
+        self.max_log_bytes = max_log_bytes
+        self.max_log_age = max_log_age
+
+        self._seq = 0
+        self._log = None
+        self._log_bytes = 0
+        self._log_started = time.time()
+        self._compaction_thread = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def apply_record(usage_data, record):
+        """把一条增量记录合并到 usage_data 布局的字典中"""
+        day = record["d"]
+        hour_key = f"{day}T{datetime.datetime.fromtimestamp(record['t']).hour:02d}"
+        for app_name, increment in record["u"].items():
+            app_data = usage_data.get(app_name)
+            if app_data is None:
+                app_data = usage_data[app_name] = {
+                    "total_time": 0,
+                    "daily_breakdown": {},
+                    "last_updated": record["t"]
+                }
+            app_data["total_time"] += increment
+            breakdown = app_data["daily_breakdown"]
+            breakdown[day] = breakdown.get(day, 0) + increment
+            hourly = app_data.setdefault("hourly_breakdown", {})
+            hourly[hour_key] = hourly.get(hour_key, 0) + increment
+            app_data["last_updated"] = record["t"]
+
+    @staticmethod
+    def trim_hours(usage_data):
+        """每个应用的 hourly_breakdown 只留最近 HOURS_KEPT 小时，与内存中 HourRing 保留的范围相同"""
+        for app_data in usage_data.values():
+            hourly = app_data.get("hourly_breakdown")
+            if not hourly:
+                continue
+            hours = {str_to_hour(hour_str): hour_str for hour_str in hourly}
+            oldest = max(hours) - HOURS_KEPT
+            for hour, hour_str in hours.items():
+                if hour <= oldest:
+                    del hourly[hour_str]
+
+    @staticmethod
+    def export(view):
+        """把 UsageStore / UsageSnapshot 转成快照文件接受的数据"""
+        return view.to_usage_data()
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_file):
+            return {}, 0
+        with open(self.snapshot_file, 'r') as f:
+            data = json.load(f)
+        meta = data.pop(self.META_KEY, {})
+        return data, meta.get("seq", 0)
+
+    def _replay_file(self, path, usage_data, applied_seq):
+        if not os.path.exists(path):
+            return applied_seq
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 崩溃时可能留下半行，跳过即可
+                    continue
+                if record["s"] <= applied_seq:
+                    continue
+                self.apply_record(usage_data, record)
+                applied_seq = record["s"]
+        return applied_seq
+
+    def _write_snapshot(self, usage_data, seq):
+        tmp_file = self.snapshot_file + ".tmp"
+        payload = dict(usage_data)
+        payload[self.META_KEY] = {"seq": seq}
+        with open(tmp_file, 'w') as f:
+            json.dump(payload, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+
+    def load(self):
+        """回放快照和日志，返回 usage_data 布局的普通字典"""
+        self.wait_for_compaction()
+        usage_data, seq = self._read_snapshot()
+        seq = self._replay_file(self.pending_file, usage_data, seq)
+        seq = self._replay_file(self.log_file, usage_data, seq)
+        self._seq = seq
+        return usage_data
+
+    def _open_log(self):
+        if self._log is None:
+            self._log = open(self.log_file, 'a')
+            self._log_bytes = self._log.tell()
+            self._log_started = time.time()
+        return self._log
+
+    def append(self, timestamp, day, increments):
+        """追加一个周期的增量并返回写入的字节数，写入量只与本周期活跃的应用数相关"""
+        if not increments:
+            return 0
+        self._seq += 1
+        line = json.dumps({"s": self._seq, "t": timestamp, "d": day, "u": increments},
+                          ensure_ascii=False) + "\n"
+        log = self._open_log()
+        log.write(line)
+        log.flush()
+        self._log_bytes += len(line)
+        return len(line)
+
+    def needs_compaction(self):
+        if self._log is None or self._log_bytes == 0:
+            return False
+        return (self._log_bytes >= self.max_log_bytes or
+                time.time() - self._log_started >= self.max_log_age)
+
+    def is_compacting(self):
+        return self._compaction_thread is not None and self._compaction_thread.is_alive()
+
+    def compact_async(self, usage_data_source=None):
+        """把当前日志转为待压缩日志，并在后台线程中合并进快照
+
+        usage_data_source 是返回与已追加记录一致的完整数据的函数（如不可变快照的
+        to_usage_data），给出时后台线程直接写出这份数据，不再读取旧快照回放日志。
+        """
+        with self._lock:
+            if self.is_compacting():
+                return False
+            if not os.path.exists(self.pending_file) and self._log is not None:
+                self._log.close()
+                self._log = None
+                os.replace(self.log_file, self.pending_file)
+            if usage_data_source is None and not os.path.exists(self.pending_file):
+                return False
+            self._compaction_thread = threading.Thread(
+                target=self._compact_pending, args=(usage_data_source, self._seq), daemon=True)
+            self._compaction_thread.start()
+            return True
+
+    def _compact_pending(self, usage_data_source=None, seq=0):
+        try:
+            if usage_data_source is None:
+                usage_data, seq = self._read_snapshot()
+                seq = self._replay_file(self.pending_file, usage_data, seq)
+                # 回放只会追加小时，不裁剪的话快照会随日志压缩不断变大
+                self.trim_hours(usage_data)
+            else:
+                # 当前日志中序号不大于 seq 的记录在回放时会被跳过
+                usage_data = usage_data_source()
+            self._write_snapshot(usage_data, seq)
+            if os.path.exists(self.pending_file):
+                os.remove(self.pending_file)
+        except Exception as e:
+            print(f"压缩使用数据日志时出错: {e}")
+
+    def wait_for_compaction(self):
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join()
+
+    def checkpoint(self, usage_data):
+        """直接用内存中的完整数据写快照并清空日志"""
+        with self._lock:
+            self.wait_for_compaction()
+            self._write_snapshot(usage_data, self._seq)
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            for path in (self.pending_file, self.log_file):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def close(self):
+        self.wait_for_compaction()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
@@ -0,0 +1,101 @@
+import queue
+import threading
+from collections import namedtuple
+from .usage_store import OTHER_APP, bucket_edges, month_start, week_start
+
+# 降采样计划：edges 为新的桶边界，rows 为 {应用名: 按桶的秒数}（没有汇总数据的应用不出现），
+# totals 为各桶合计，folds 为 {应用名: 预期总时长}。边界没有前移时 edges、rows、totals 为 None、{}、None。
+RetentionPlan = namedtuple("RetentionPlan", ["edges", "rows", "totals", "folds", "rollup"])
+
+
+class RetentionPolicy:
+    """分层保留策略
+
+    最近 full_days 天保留逐日数据，再往前到 weekly_days 天按 ISO 周汇总，更早的按月汇总。
+    生命周期总时长低于 other_threshold 秒、且 other_idle_days 天未使用的应用并入“其他”。
+    """
+
+    def __init__(self, full_days=366, weekly_days=730, other_threshold=300, other_idle_days=30):
+        self.full_days = full_days
+        self.weekly_days = max(weekly_days, full_days + 7)
+        self.other_threshold = other_threshold
+        self.other_idle_days = other_idle_days
+
+    def boundaries(self, today):
+        """返回 (months_before, weeks_before)：前者之前按月、两者之间按周汇总"""
+        weeks_before = week_start(today - self.full_days + 1)
+        months_before = month_start(today - self.weekly_days + 1)
+        return months_before, weeks_before
+
+
+class RetentionCompactor:
+    """在后台线程中根据不可变快照生成降采样计划，由监控线程一次应用
+
+    逐日保留的边界每周前移一次，汇总只涉及滑出的那几天和已有的桶，计算量与应用数 × 桶数成正比。
+    监控线程应用时只替换各应用的桶数组，并截掉已并入桶中的逐日列。
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy if policy else RetentionPolicy()
+        self.last_run_day = None
+        self._plans = queue.Queue(maxsize=1)
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def due(self, today):
+        return self.last_run_day != today and not self.is_running() and self._plans.empty()
+
+    def start(self, snapshot, today, now):
+        self.last_run_day = today
+        self._thread = threading.Thread(target=self._run, args=(snapshot, today, now), daemon=True)
+        self._thread.start()
+
+    def take(self):
+        """取出已生成的计划，没有时返回 None"""
+        try:
+            return self._plans.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _run(self, snapshot, today, now):
+        try:
+            plan = self.plan(snapshot, today, now)
+            if plan is not None:
+                self._plans.put(plan)
+        except Exception as e:
+            print(f"整理历史使用数据时出错: {e}")
+
+    def plan(self, view, today, now):
+        """生成 view 的降采样计划，没有需要处理的内容时返回 None"""
+        if view.base_day is None:
+            return None
+        policy = self.policy
+        months_before, weeks_before = policy.boundaries(today)
+        if view.rollup:
+            # 边界只前移，放宽策略也不会还原已经汇总的数据
+            months_before = max(months_before, view.rollup[0])
+            weeks_before = max(weeks_before, view.rollup[1])
+        rollup = (months_before, weeks_before)
+
+        edges, rows, totals = None, {}, None
+        first = min(view.bucket_edges[0], view.base_day) if view.bucket_edges else view.base_day
+        if weeks_before <= first:
+            # 历史还不到逐日保留的天数，没有需要汇总的数据，边界保持不变
+            rollup = view.rollup
+        elif rollup != view.rollup:
+            edges = bucket_edges(first, months_before, weeks_before)
+            for row, app_name in enumerate(view.names):
+                buckets = view.rebucket(row, edges)
+                if buckets:
+                    rows[app_name] = buckets
+            totals = view.rebucket(None, edges)
+
+        idle_before = now - policy.other_idle_days * 86400
+        folds = {app_name: view.total_time[row] for row, app_name in enumerate(view.names)
+                 if app_name != OTHER_APP and view.total_time[row] < policy.other_threshold
+                 and view.last_updated[row] < idle_before}
+        if edges is None and not folds:
+            return None
+        return RetentionPlan(edges, rows, totals, folds, rollup)
@@ -0,0 +1,309 @@
+import sqlite3
+import weakref
+import threading
+from itertools import groupby
+from operator import itemgetter
+from .usage_store import RETENTION_KEY, day_to_str, iter_breakdown, parse_rollup
+
+
+class SQLiteUsageView:
+    """SQLite 使用数据的只读查询，SQLiteUsageStore 与 SQLiteUsageSnapshot 共用
+
+    子类提供 _execute(query, params) 返回全部结果行，_iter(query, params) 逐行产生结果。
+    """
+
+    def __len__(self):
+        return self._execute("SELECT COUNT(*) FROM apps")[0][0]
+
+    def __contains__(self, app_name):
+        return bool(self._execute("SELECT 1 FROM apps WHERE name = ?", (app_name,)))
+
+    def daily_totals(self, start_day, end_day):
+        totals = [0.0] * (end_day - start_day + 1)
+        for day, seconds in self._execute(
+                "SELECT day, SUM(seconds) FROM usage WHERE day BETWEEN ? AND ? GROUP BY day",
+                (start_day, end_day)):
+            totals[day - start_day] = seconds
+        return totals
+
+    def active_apps(self, start_day, end_day):
+        return self._execute(
+            "SELECT apps.name, SUM(usage.seconds) AS total FROM usage JOIN apps ON apps.id = usage.app_id "
+            "WHERE usage.day BETWEEN ? AND ? GROUP BY usage.app_id HAVING total > 0 ORDER BY usage.app_id",
+            (start_day, end_day))
+
+    def app_window(self, app_name, start_day, end_day):
+        window = [0.0] * (end_day - start_day + 1)
+        for day, seconds in self._execute(
+                "SELECT usage.day, SUM(usage.seconds) FROM usage JOIN apps ON apps.id = usage.app_id "
+                "WHERE apps.name = ? AND usage.day BETWEEN ? AND ? GROUP BY usage.day",
+                (app_name, start_day, end_day)):
+            window[day - start_day] = seconds
+        return window
+
+    def range_total(self, app_name, start_day, end_day):
+        if app_name is None:
+            rows = self._execute(
+                "SELECT SUM(seconds) FROM usage WHERE day BETWEEN ? AND ?", (start_day, end_day))
+        else:
+            rows = self._execute(
+                "SELECT SUM(usage.seconds) FROM usage JOIN apps ON apps.id = usage.app_id "
+                "WHERE apps.name = ? AND usage.day BETWEEN ? AND ?", (app_name, start_day, end_day))
+        return rows[0][0] or 0.0
+
+    def hour_window(self):
+        """小时数据完整保存在表中，不受窗口限制"""
+        return None
+
+    def hour_values(self, app_name, start_hour, end_hour):
+        query = "SELECT usage.day * 24 + usage.hour AS h, SUM(usage.seconds) FROM usage "
+        params = ()
+        if app_name is not None:
+            query += "JOIN apps ON apps.id = usage.app_id WHERE apps.name = ? AND "
+            params = (app_name,)
+        else:
+            query += "WHERE "
+        query += "usage.hour >= 0 AND usage.day BETWEEN ? AND ? GROUP BY h"
+        values = [0.0] * (end_hour - start_hour + 1)
+        for hour, seconds in self._execute(query, params + (start_hour // 24, end_hour // 24)):
+            if start_hour <= hour <= end_hour:
+                values[hour - start_hour] = seconds
+        return values
+
+    def iter_app_days(self, start_day=None, end_day=None, apps=None):
+        """逐个应用产生 (应用名, 日期序数列表, 秒数列表)，由游标按应用逐段读取
+
+        按主键 (app_id, day, hour) 的顺序扫描即已按应用、日期分组，不需要临时排序；
+        日期条件写成 +day，避免查询规划改走按日期的索引再整体排序。
+        """
+        query = "SELECT app_id, day, SUM(seconds) AS total FROM usage WHERE +day BETWEEN ? AND ?"
+        params = (start_day if start_day is not None else -1, end_day if end_day is not None else 1 << 62)
+        if apps is not None:
+            apps = list(apps)
+            query += f" AND app_id IN (SELECT id FROM apps WHERE name IN ({', '.join('?' * len(apps))}))"
+            params += tuple(apps)
+        query += " GROUP BY app_id, day HAVING total > 0 ORDER BY app_id, day"
+        names = {}
+        for app_id, rows in groupby(self._iter(query, params), itemgetter(0)):
+            if app_id not in names:
+                # 直接在 store 上导出时可能有新登记的应用
+                names.update(self._execute("SELECT id, name FROM apps"))
+            _, days, seconds = zip(*rows)
+            yield names[app_id], list(days), list(seconds)
+
+    def iter_app_buckets(self, start_day=None, end_day=None, apps=None):
+        """SQLite 保留完整的逐日历史，没有汇总桶"""
+        return iter(())
+
+    def top_apps(self, start_day, end_day, limit=None):
+        query = ("SELECT apps.name, SUM(usage.seconds) AS total FROM usage JOIN apps ON apps.id = usage.app_id "
+                 "WHERE usage.day BETWEEN ? AND ? GROUP BY usage.app_id HAVING total > 0 "
+                 "ORDER BY total DESC, usage.app_id")
+        params = (start_day, end_day)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        return self._execute(query, params)
+
+    def top_apps_on(self, day, limit=None):
+        return self.top_apps(day, day, limit)
+
+    def to_usage_data(self):
+        usage_data = {}
+        for app_id, name, total_time, last_updated in self._execute(
+                "SELECT id, name, total_time, last_updated FROM apps ORDER BY id"):
+            breakdown = {}
+            for day, seconds in self._execute(
+                    "SELECT day, SUM(seconds) FROM usage WHERE app_id = ? GROUP BY day ORDER BY day", (app_id,)):
+                breakdown[day_to_str(day)] = seconds
+            usage_data[name] = {
+                "total_time": total_time,
+                "daily_breakdown": breakdown,
+                "last_updated": last_updated
+            }
+        return usage_data
+
+
+class SQLiteUsageSnapshot(SQLiteUsageView):
+    """SQLiteUsageStore 在某个版本发布时的只读视图
+
+    创建时就在一个读连接上开始读事务并取得读快照，之后的全部查询都在这一个事务中执行，
+    看到的是发布时已提交的数据，不受监控线程之后写入的影响。连接由读取的各线程共用、加锁串行；
+    视图不再被引用时结束读事务，把连接交还给 store 供下一个版本复用。
+    """
+
+    FETCH_SIZE = 8192
+
+    def __init__(self, store, version):
+        self.db_file = store.db_file
+        self.version = version
+        self._lock = threading.Lock()
+        self._conn = store._acquire_reader()
+        self._conn.execute("BEGIN")
+        # 读事务在第一条 SELECT 时才取得读快照，这里立即取得
+        self._conn.execute("SELECT COUNT(*) FROM apps").fetchone()
+        weakref.finalize(self, store._release_reader, self._conn)
+
+    def _execute(self, query, params=()):
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def _iter(self, query, params=()):
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+        while True:
+            # 分批取出，导出等长时间的读取不会一直占着锁
+            with self._lock:
+                rows = cursor.fetchmany(self.FETCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+
+
+class SQLiteUsageStore(SQLiteUsageView):
+    """使用数据的 SQLite 存储后端
+
+    按 (应用, 日期序数, 小时, 秒数) 存储，开启 WAL，查询以 SQL 聚合下推执行。
+    查询接口与 UsageStore 保持一致，UsageTracker 可以直接替换使用。
+    直接在 store 上查询时每条语句各自读取最新数据，需要一致视图时使用 snapshot()。
+    从 JSON 迁移来的历史数据没有小时信息，记为 MIGRATED_HOUR。
+    """
+
+    MIGRATED_HOUR = -1
+    # 留着供之后的快照复用的空闲读连接数
+    MAX_IDLE_READERS = 2
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS apps (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            total_time REAL NOT NULL DEFAULT 0,
+            last_updated REAL
+        );
+        CREATE TABLE IF NOT EXISTS usage (
+            app_id INTEGER NOT NULL REFERENCES apps(id),
+            day INTEGER NOT NULL,
+            hour INTEGER NOT NULL,
+            seconds REAL NOT NULL,
+            PRIMARY KEY (app_id, day, hour)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS usage_day_app ON usage (day, app_id);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self.SCHEMA)
+        self._app_ids = dict(conn.execute("SELECT name, id FROM apps"))
+        self._readers = []
+        self._readers_lock = threading.Lock()
+
+    def _connection(self):
+        # 监控线程写入、界面线程读取，各线程使用独立连接，WAL 下读写互不阻塞
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _execute(self, query, params=()):
+        return self._connection().execute(query, params).fetchall()
+
+    def _acquire_reader(self):
+        with self._readers_lock:
+            if self._readers:
+                return self._readers.pop()
+        return sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False)
+
+    def _release_reader(self, conn):
+        # 快照被回收时调用，可能在任意线程
+        try:
+            conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            conn.close()
+            return
+        with self._readers_lock:
+            if len(self._readers) < self.MAX_IDLE_READERS:
+                self._readers.append(conn)
+                return
+        conn.close()
+
+    def _iter(self, query, params=()):
+        # 游标可能长时间未读完，使用独立连接，不占用本线程的查询连接
+        conn = sqlite3.connect(self.db_file)
+        try:
+            yield from conn.execute(query, params)
+        finally:
+            conn.close()
+
+    def _app_id(self, conn, app_name, timestamp):
+        app_id = self._app_ids.get(app_name)
+        if app_id is None:
+            app_id = conn.execute(
+                "INSERT INTO apps (name, total_time, last_updated) VALUES (?, 0, ?)",
+                (app_name, timestamp)).lastrowid
+            self._app_ids[app_name] = app_id
+        return app_id
+
+    def record_tick(self, timestamp, day, hour, increments):
+        """把一个监控周期的增量在单个事务中批量写入"""
+        if not increments:
+            return
+        conn = self._connection()
+        with conn:
+            rows = [(self._app_id(conn, app_name, timestamp), day, hour, seconds)
+                    for app_name, seconds in increments.items()]
+            conn.executemany(
+                "INSERT INTO usage (app_id, day, hour, seconds) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (app_id, day, hour) DO UPDATE SET seconds = seconds + excluded.seconds",
+                rows)
+            conn.executemany(
+                "UPDATE apps SET total_time = total_time + ?, last_updated = ? WHERE id = ?",
+                [(seconds, timestamp, app_id) for app_id, _, _, seconds in rows])
+
+    def is_migrated(self):
+        row = self._connection().execute(
+            "SELECT value FROM meta WHERE key = 'migrated_from'").fetchone()
+        return row is not None
+
+    def migrate_from_usage_data(self, usage_data, source):
+        """一次性导入 usage_data.json 布局的历史数据"""
+        if self.is_migrated():
+            return False
+        conn = self._connection()
+        with conn:
+            rollup = parse_rollup(usage_data)
+            for app_name, app_data in usage_data.items():
+                if app_name == RETENTION_KEY:
+                    continue
+                app_id = self._app_id(conn, app_name, app_data.get("last_updated"))
+                conn.execute("UPDATE apps SET total_time = total_time + ?, last_updated = ? WHERE id = ?",
+                             (app_data.get("total_time", 0), app_data.get("last_updated"), app_id))
+                conn.executemany(
+                    "INSERT INTO usage (app_id, day, hour, seconds) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (app_id, day, hour) DO UPDATE SET seconds = seconds + excluded.seconds",
+                    [(app_id, day, self.MIGRATED_HOUR, seconds)
+                     for day, seconds in iter_breakdown(app_data, rollup)])
+            conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_from', ?)", (source,))
+        return True
+
+    def snapshot(self, version, ranked_day=None):
+        """发布只读视图，视图的全部查询在同一个读事务中执行；ranked_day 仅为与 UsageStore 保持一致"""
+        return SQLiteUsageSnapshot(self, version)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for reader in readers:
+            reader.close()
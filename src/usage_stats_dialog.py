@@ -1,12 +1,15 @@
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, List, Tuple
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
-                              QTableWidget, QTableWidgetItem, QHeaderView, 
-                              QPushButton, QTabWidget, QProgressBar, QWidget, QScrollArea)
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QFont
+                              QTableWidget, QTableWidgetItem, QHeaderView, QTableView, QAbstractItemView,
+                              QPushButton, QTabWidget, QProgressBar, QWidget, QScrollArea, QComboBox)
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QFont, QKeySequence, QShortcut
 import datetime
 from .usage_tracker import UsageTracker
+from .usage_table_model import KeyedTableModel, sorted_proxy
+from .usage_stats_worker import UsageStats, UsageStatsAggregator
+from .usage_heatmap import UsageHeatmap
 
 class UsageStatsDialog(QDialog):
     def __init__(self, tracker: Optional[UsageTracker] = None, parent=None) -> None:
@@ -15,10 +18,16 @@ class UsageStatsDialog(QDialog):
         self.setWindowTitle("电脑使用统计")
         self.setFixedSize(600, 500)
 
+        self.diagnostics_tab = None
         self.initUI()
-        self.update_timer = QTimer(self)
-        self.update_timer.timeout.connect(self.update_data)
-        self.update_timer.start(5000)
+        # 诊断页默认隐藏，按 Ctrl+Shift+D 切换
+        self.diagnostics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        self.diagnostics_shortcut.activated.connect(self.toggle_diagnostics_tab)
+        # 不再定时轮询：快照发布时才在线程池中汇总，结果回到界面线程渲染
+        self.aggregator = UsageStatsAggregator(self.tracker, self)
+        self.aggregator.ready.connect(self.render_stats)
+        self.tracker.notifier.snapshot_changed.connect(self.aggregator.request)
+        self.finished.connect(self.stop_updates)
         self.update_data()
 
     def initUI(self) -> None:
@@ -26,8 +35,10 @@ class UsageStatsDialog(QDialog):
         self.tab_widget = QTabWidget()
         self.create_overview_tab()
         self.create_apps_tab()
+        self.create_hourly_tab()
         self.tab_widget.addTab(self.overview_tab, "总体使用情况")
         self.tab_widget.addTab(self.apps_tab, "应用使用情况")
+        self.tab_widget.addTab(self.hourly_tab, "今日分时")
         layout.addWidget(self.tab_widget)
         self.setLayout(layout)
 
@@ -39,36 +50,29 @@ class UsageStatsDialog(QDialog):
         title.setFont(QFont("Arial", 12, QFont.Bold))
         layout.addWidget(title)
 
-        self.daily_usage_table = QTableWidget()
-        self.daily_usage_table.setColumnCount(2)
-        self.daily_usage_table.setHorizontalHeaderLabels(["日期", "使用时间(分钟)"])
+        # 表格由按键增量更新的模型驱动，经排序代理显示
+        self.daily_usage_model = KeyedTableModel(["日期", "使用时间(分钟)"], [str, "{:.1f}".format], self)
+        self.daily_usage_table = self.create_table_view(self.daily_usage_model, sort_column=0)
         self.daily_usage_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         self.daily_usage_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        self.daily_usage_table.setEditTriggers(QTableWidget.NoEditTriggers)
         layout.addWidget(self.daily_usage_table)
 
         self.total_usage_label = QLabel("总使用时间: 计算中...")
         self.total_usage_label.setFont(QFont("Arial", 10, QFont.Bold))
         layout.addWidget(self.total_usage_label)
 
-        layout.addWidget(QLabel("每日使用时间分布:"))
-        self.daily_usage_progress = QVBoxLayout()
+        heatmap_header = QHBoxLayout()
+        heatmap_header.addWidget(QLabel("最近一年每日使用时间:"))
+        heatmap_header.addStretch()
+        self.heatmap_app_combo = QComboBox()
+        self.heatmap_app_combo.addItem("全部应用", None)
+        self.heatmap_app_combo.setMinimumContentsLength(16)
+        self.heatmap_app_combo.currentIndexChanged.connect(self.on_heatmap_app_changed)
+        heatmap_header.addWidget(self.heatmap_app_combo)
+        layout.addLayout(heatmap_header)
 
-        for i in range(7):
-            progress_layout = QHBoxLayout()
-            date_label = QLabel()
-            progress_bar = QProgressBar()
-            progress_bar.setTextVisible(False)
-            progress_bar.setFormat("")
-            progress_label = QLabel("0 分钟")
-
-            progress_layout.addWidget(date_label)
-            progress_layout.addWidget(progress_bar)
-            progress_layout.addWidget(progress_label)
-
-            self.daily_usage_progress.addLayout(progress_layout)
-
-        layout.addLayout(self.daily_usage_progress)
+        self.heatmap = UsageHeatmap()
+        layout.addWidget(self.heatmap)
 
         self.overview_tab.setLayout(layout)
 
@@ -79,14 +83,18 @@ class UsageStatsDialog(QDialog):
         title.setFont(QFont("Arial", 12, QFont.Bold))
         layout.addWidget(title)
 
-        self.apps_table = QTableWidget()
-        self.apps_table.setColumnCount(3)
-        self.apps_table.setHorizontalHeaderLabels(["应用名称", "总使用时间(分钟)", "占比"])
+        self.apps_model = KeyedTableModel(["应用名称", "总使用时间(分钟)", "占比"],
+                                          [str, "{:.1f}".format, "{:.1f}%".format], self)
+        self.apps_table = self.create_table_view(self.apps_model, sort_column=1)
         self.apps_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         self.apps_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
         self.apps_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        self.apps_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        
+
+        self.apps_empty_label = QLabel("暂无数据，请稍后再试")
+        self.apps_empty_label.setAlignment(Qt.AlignCenter)
+        self.apps_empty_label.hide()
+        layout.addWidget(self.apps_empty_label)
+
         scroll_area = QScrollArea()
         scroll_area.setWidget(self.apps_table)
         scroll_area.setWidgetResizable(True)
@@ -95,98 +103,155 @@ class UsageStatsDialog(QDialog):
 
         self.apps_tab.setLayout(layout)
 
+    def create_table_view(self, model: KeyedTableModel, sort_column: int) -> QTableView:
+        view = QTableView()
+        view.setModel(sorted_proxy(model, sort_column))
+        view.setSortingEnabled(True)
+        view.sortByColumn(sort_column, Qt.DescendingOrder)
+        view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        return view
+
+    def create_hourly_tab(self) -> None:
+        self.hourly_tab = QWidget()
+        layout = QVBoxLayout()
+        title = QLabel("今天每小时使用情况")
+        title.setFont(QFont("Arial", 12, QFont.Bold))
+        layout.addWidget(title)
+
+        self.hourly_table = QTableWidget(24, 3)
+        self.hourly_table.setHorizontalHeaderLabels(["时段", "使用时间(分钟)", "分布"])
+        self.hourly_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        self.hourly_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
+        self.hourly_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.hourly_table.verticalHeader().setVisible(False)
+        self.hourly_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        for hour in range(24):
+            self.hourly_table.setItem(hour, 0, QTableWidgetItem(f"{hour:02d}:00 - {hour + 1:02d}:00"))
+            self.hourly_table.setItem(hour, 1, QTableWidgetItem("0.0"))
+            progress_bar = QProgressBar()
+            progress_bar.setTextVisible(False)
+            self.hourly_table.setCellWidget(hour, 2, progress_bar)
+        layout.addWidget(self.hourly_table)
+
+        self.hourly_tab.setLayout(layout)
+
     def update_data(self) -> None:
-        recent_usage = self.tracker.get_recent_usage(days=7)
-        self.update_overview_tab(recent_usage)
-        self.update_apps_tab(recent_usage)
+        self.aggregator.request()
 
-    def update_overview_tab(self, recent_usage: Dict[str, Any]) -> None:
-        self.daily_usage_table.setRowCount(0)
-        total_minutes = 0
-        sorted_dates = sorted(recent_usage["total_daily_usage"].items(), reverse=True)
+    def stop_updates(self) -> None:
+        try:
+            self.tracker.notifier.snapshot_changed.disconnect(self.aggregator.request)
+        except (RuntimeError, TypeError):
+            pass
 
-        for date, seconds in sorted_dates:
-            minutes = seconds / 60
-            total_minutes += minutes
-            row = self.daily_usage_table.rowCount()
-            self.daily_usage_table.insertRow(row)
-            date_item = QTableWidgetItem(date)
-            self.daily_usage_table.setItem(row, 0, date_item)
-
-            time_item = QTableWidgetItem(f"{minutes:.1f}")
-            self.daily_usage_table.setItem(row, 1, time_item)
+    def render_stats(self, stats: UsageStats) -> None:
+        self.update_overview_tab(stats.daily_usage)
+        self.update_heatmap(stats)
+        self.update_apps_tab(stats.app_rows)
+        self.update_hourly_tab(stats.hourly_usage)
+        if self.diagnostics_tab is not None:
+            self.update_diagnostics_tab()
+
+    def update_overview_tab(self, daily_usage: Dict[str, float]) -> None:
+        total_minutes = sum(daily_usage.values()) / 60
+        # 按显示精度取整后比较，分钟数没有可见变化的行不发出通知
+        self.daily_usage_model.update([(date, (date, round(seconds / 60, 1)))
+                                       for date, seconds in daily_usage.items()])
         hours = total_minutes / 60
         self.total_usage_label.setText(f"总使用时间: {hours:.1f} 小时 ({total_minutes:.1f} 分钟)")
 
-        today = datetime.datetime.now()
-        date_format = "%Y-%m-%d"
+    def update_heatmap(self, stats: UsageStats) -> None:
+        # 应用列表有变化时才重建下拉框，重建期间保持当前选择且不触发重新汇总
+        combo = self.heatmap_app_combo
+        if [combo.itemData(i) for i in range(1, combo.count())] != stats.heatmap_apps:
+            current = combo.currentData()
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItem("全部应用", None)
+            for app_name in stats.heatmap_apps:
+                combo.addItem(app_name, app_name)
+            index = combo.findData(current) if current is not None else 0
+            combo.setCurrentIndex(max(index, 0))
+            combo.blockSignals(False)
+            if combo.currentData() != current:
+                self.on_heatmap_app_changed(combo.currentIndex())
+        if stats.heatmap_app == combo.currentData():
+            self.heatmap.set_values(stats.heatmap_start, stats.heatmap)
 
-        for i in range(7):
-            date = (today - datetime.timedelta(days=i)).strftime(date_format)
-            seconds = recent_usage["total_daily_usage"].get(date, 0)
-            minutes = seconds / 60
+    def on_heatmap_app_changed(self, index: int) -> None:
+        self.aggregator.heatmap_app = self.heatmap_app_combo.itemData(index)
+        self.aggregator.request()
+
+    def update_apps_tab(self, app_rows: List[Tuple[str, tuple]]) -> None:
+        self.apps_model.update(app_rows)
+        self.apps_empty_label.setVisible(not app_rows)
 
-            date_label = self.daily_usage_progress.itemAt(i).layout().itemAt(0).widget()
-            date_label.setText(date)
-
-            progress_bar = self.daily_usage_progress.itemAt(i).layout().itemAt(1).widget()
-            
-            if recent_usage["total_daily_usage"].values():
-                max_minutes = max(recent_usage["total_daily_usage"].values()) / 60
-                max_minutes = max(1, max_minutes)
-            else:
-                max_minutes = 1
-            
+    def update_hourly_tab(self, hourly_usage: List[Tuple[datetime.datetime, float]]) -> None:
+        max_minutes = max(1, max(seconds for _, seconds in hourly_usage) / 60)
+        for start, seconds in hourly_usage:
+            minutes = seconds / 60
+            self.hourly_table.item(start.hour, 1).setText(f"{minutes:.1f}")
+            progress_bar = self.hourly_table.cellWidget(start.hour, 2)
             progress_bar.setMaximum(int(max_minutes))
             progress_bar.setValue(int(minutes))
-            progress_bar.setTextVisible(False)
 
-            time_label = self.daily_usage_progress.itemAt(i).layout().itemAt(2).widget()
-            time_label.setFixedWidth(60)
-            time_label.setText(f"{minutes:.1f} 分钟")
-            time_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
-
-    def update_apps_tab(self, recent_usage: Dict[str, Any]) -> None:
-        top_apps = self.tracker.get_top_apps(limit=None, days=1)
-        self.apps_table.setRowCount(0)
-        if top_apps:
-            total_seconds = sum(app_data["total_time"] for _, app_data in top_apps)
-            total_minutes = total_seconds / 60
-        else:
-            total_seconds = 0
-            total_minutes = 0
-
-        if not top_apps:
-            row = self.apps_table.rowCount()
-            self.apps_table.insertRow(row)
-            no_data_item = QTableWidgetItem("暂无数据，请稍后再试")
-            no_data_item.setTextAlignment(Qt.AlignCenter)
-            self.apps_table.setItem(row, 0, no_data_item)
-            
-            time_item = QTableWidgetItem("暂无数据，请稍后再试")
-            time_item.setTextAlignment(Qt.AlignCenter)
-            self.apps_table.setItem(row, 1, time_item)
-            
-            percentage_item = QTableWidgetItem("暂无数据，请稍后再试")
-            percentage_item.setTextAlignment(Qt.AlignCenter)
-            self.apps_table.setItem(row, 2, percentage_item)
+    def create_diagnostics_tab(self) -> None:
+        self.diagnostics_tab = QWidget()
+        layout = QVBoxLayout()
+        title = QLabel("监控周期性能诊断（毫秒 / 次数）")
+        title.setFont(QFont("Arial", 12, QFont.Bold))
+        layout.addWidget(title)
+
+        self.diagnostics_table = QTableWidget()
+        self.diagnostics_table.setColumnCount(5)
+        self.diagnostics_table.setHorizontalHeaderLabels(["指标", "p50", "p95", "p99", "最大值"])
+        self.diagnostics_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.diagnostics_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.diagnostics_table)
+
+        self.diagnostics_label = QLabel()
+        layout.addWidget(self.diagnostics_label)
+        self.diagnostics_tab.setLayout(layout)
+
+    def toggle_diagnostics_tab(self) -> None:
+        if self.diagnostics_tab is None:
+            self.create_diagnostics_tab()
+            self.tab_widget.addTab(self.diagnostics_tab, "诊断")
+            self.tab_widget.setCurrentWidget(self.diagnostics_tab)
+            self.update_diagnostics_tab()
         else:
-            for app_name, app_data in top_apps:
-                row = self.apps_table.rowCount()
-                self.apps_table.insertRow(row)
-
-                name_item = QTableWidgetItem(app_name)
-                self.apps_table.setItem(row, 0, name_item)
-                minutes = app_data["total_time"] / 60
-                time_item = QTableWidgetItem(f"{minutes:.1f}")
-                self.apps_table.setItem(row, 1, time_item)
-                if total_seconds > 0:
-                    percentage = (app_data["total_time"] / total_seconds) * 100
-                    percentage_item = QTableWidgetItem(f"{percentage:.1f}%")
-                else:
-                    percentage_item = QTableWidgetItem("0%")
-                self.apps_table.setItem(row, 2, percentage_item)
+            self.tab_widget.removeTab(self.tab_widget.indexOf(self.diagnostics_tab))
+            self.diagnostics_tab.deleteLater()
+            self.diagnostics_tab = None
+
+    def update_diagnostics_tab(self) -> None:
+        metrics = self.tracker.get_tick_metrics()
+        self.diagnostics_table.setRowCount(0)
+        if not metrics:
+            self.diagnostics_label.setText("暂无性能数据")
+            return
+
+        rows = [(f"耗时: {name}", stats) for name, stats in metrics["phases"].items()]
+        rows += [(f"计数: {name}", stats) for name, stats in metrics["counters"].items()]
+        for name, stats in rows:
+            row = self.diagnostics_table.rowCount()
+            self.diagnostics_table.insertRow(row)
+            self.diagnostics_table.setItem(row, 0, QTableWidgetItem(name))
+            for column, key in enumerate(("p50", "p95", "p99", "max"), 1):
+                self.diagnostics_table.setItem(row, column, QTableWidgetItem(f"{stats[key]:.2f}"))
+
+        text = f"已统计周期: {metrics['ticks']}（窗口 {metrics['window']}）"
+        classification = metrics.get("classification")
+        if classification:
+            text += (f"  分类缓存命中率: {classification['hit_rate'] * 100:.1f}%"
+                     f"（{classification['size']} 条）")
+        scheduler = metrics.get("scheduler")
+        if scheduler:
+            text += (f"  监控间隔: {scheduler['interval']:.1f} 秒（{scheduler['reason']}，"
+                     f"范围 {scheduler['min_interval']:g}-{scheduler['max_interval']:g} 秒）")
+        self.diagnostics_label.setText(text)
 
     def closeEvent(self, event):
-        self.update_timer.stop()
+        self.stop_updates()
         event.accept()
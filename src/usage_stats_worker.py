@@ -0,0 +1,104 @@
+import datetime
+from collections import namedtuple
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from .usage_tracker import UsageQueries
+from .usage_heatmap import HEATMAP_DAYS
+
+# 统计对话框一次刷新所需的全部数据，行已按显示精度取整，可直接交给表格模型；
+# heatmap 为从 heatmap_start 起 HEATMAP_DAYS 天的逐日秒数，heatmap_apps 为这段时间内用过的应用
+UsageStats = namedtuple("UsageStats", ["version", "day", "daily_usage", "app_rows", "hourly_usage",
+                                       "heatmap_app", "heatmap_start", "heatmap", "heatmap_apps"])
+
+
+class SnapshotQueries(UsageQueries):
+    """固定在某个快照上的查询，工作线程计算期间不受监控线程发布新快照的影响"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+
+def aggregate_usage_stats(snapshot, days=7, heatmap_app=None):
+    queries = SnapshotQueries(snapshot)
+    top_apps = queries.get_top_apps(limit=None, days=1)
+    total_seconds = sum(app_data["total_time"] for _, app_data in top_apps)
+    app_rows = []
+    for app_name, app_data in top_apps:
+        percentage = app_data["total_time"] / total_seconds * 100 if total_seconds > 0 else 0.0
+        app_rows.append((app_name, (app_name, round(app_data["total_time"] / 60, 1), round(percentage, 1))))
+    # 热力图直接切出一段逐日列，全部应用时读每日合计列，不逐个应用累加
+    today = datetime.date.today().toordinal()
+    heatmap_start = today - HEATMAP_DAYS + 1
+    if heatmap_app is None:
+        heatmap = snapshot.daily_totals(heatmap_start, today)
+    else:
+        heatmap = snapshot.app_window(heatmap_app, heatmap_start, today)
+    heatmap_apps = [app_name for app_name, _ in snapshot.top_apps(heatmap_start, today)]
+    return UsageStats(snapshot.version, datetime.date.today(), queries.get_daily_usage(days),
+                      app_rows, queries.usage(granularity="hour"),
+                      heatmap_app, heatmap_start, heatmap, heatmap_apps)
+
+
+class _AggregateTask(QRunnable):
+    def __init__(self, aggregator, snapshot, heatmap_app):
+        super().__init__()
+        self.aggregator = aggregator
+        self.snapshot = snapshot
+        self.heatmap_app = heatmap_app
+
+    def run(self):
+        try:
+            stats = aggregate_usage_stats(self.snapshot, heatmap_app=self.heatmap_app)
+        except Exception as e:
+            print(f"汇总使用统计时出错: {e}")
+            stats = None
+        try:
+            self.aggregator.computed.emit(stats)
+        except RuntimeError:
+            # 对话框已关闭并销毁，结果无人接收
+            pass
+
+
+class UsageStatsAggregator(QObject):
+    """在线程池中汇总统计数据，完成后在界面线程发出 ready(UsageStats)
+
+    同一时间最多一个任务在运行，运行期间的请求合并为结束后的一次重算；
+    快照版本、日期和热力图筛选的应用都与上次结果相同的请求直接跳过。
+    """
+
+    ready = Signal(object)
+    computed = Signal(object)
+
+    def __init__(self, tracker, parent=None, pool=None):
+        super().__init__(parent)
+        self.tracker = tracker
+        self.pool = pool if pool else QThreadPool.globalInstance()
+        self.computed.connect(self._on_computed)
+        self.stats = {"requested": 0, "computed": 0, "skipped": 0, "coalesced": 0}
+        self.heatmap_app = None
+        self._rendered = None
+        self._running = False
+        self._dirty = False
+
+    def request(self, version=None):
+        """version 为通知携带的版本号，只用于连接信号，实际以当前快照为准"""
+        self.stats["requested"] += 1
+        if self._running:
+            self._dirty = True
+            self.stats["coalesced"] += 1
+            return
+        snapshot = self.tracker.get_snapshot()
+        if (snapshot.version, datetime.date.today(), self.heatmap_app) == self._rendered:
+            self.stats["skipped"] += 1
+            return
+        self._running = True
+        self.pool.start(_AggregateTask(self, snapshot, self.heatmap_app))
+
+    def _on_computed(self, stats):
+        self._running = False
+        if stats is not None:
+            self._rendered = (stats.version, stats.day, stats.heatmap_app)
+            self.stats["computed"] += 1
+            self.ready.emit(stats)
+        if self._dirty:
+            self._dirty = False
+            self.request()
@@ -0,0 +1,831 @@
+import sys
+import time
+import datetime
+from array import array
+from operator import add
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate, compress
+
+# usage_data.json 中记录降采样边界的保留键，以及低于阈值的应用并入的汇总行
+RETENTION_KEY = "__retention__"
+OTHER_APP = "其他"
+# 逐小时环形缓冲保留的小时数
+HOURS_KEPT = 7 * 24
+# 没有汇总桶数据的应用共用的空行；桶数组从不原地修改，只整体替换
+_NO_BUCKETS = array('d')
+
+
+def _zeros(count):
+    return array('d', bytes(8 * count))
+
+
+def _copy_row(values):
+    # 行可能是 array('d')，也可能是映射文件上的只读 memoryview
+    copied = array('d')
+    copied.frombytes(memoryview(values).cast('B'))
+    return copied
+
+
+def _sum_rows(values, other):
+    """逐项相加，生成新数组，较短的一方按零补齐"""
+    if len(values) < len(other):
+        values, other = other, values
+    merged = array('d', values)
+    merged[:len(other)] = array('d', map(add, merged[:len(other)], other))
+    return merged
+
+
+def day_to_str(day):
+    return datetime.date.fromordinal(day).isoformat()
+
+
+def str_to_day(date_str):
+    return datetime.date.fromisoformat(date_str).toordinal()
+
+
+def week_start(day):
+    # 序数 1（0001-01-01）是星期一
+    return day - (day - 1) % 7
+
+
+def month_start(day):
+    return day - datetime.date.fromordinal(day).day + 1
+
+
+def next_month(day):
+    date = datetime.date.fromordinal(day)
+    if date.month == 12:
+        return datetime.date(date.year + 1, 1, 1).toordinal()
+    return datetime.date(date.year, date.month + 1, 1).toordinal()
+
+
+def bucket_end(day, tier):
+    """day 所在桶的结束日（不含）；周桶在月初处截断，月汇总时不会拆分周桶"""
+    if tier == "week":
+        return min(week_start(day) + 7, next_month(day))
+    return next_month(day)
+
+
+def iter_buckets(start_day, end_day, tier):
+    """把 [start_day, end_day) 切成按周或自然月对齐的桶，末尾按区间裁剪"""
+    day = start_day
+    while day < end_day:
+        end = bucket_end(day, tier)
+        yield day, min(end, end_day)
+        day = end
+
+
+def bucket_key(day, tier):
+    # 周桶可能被月初截断，用起始日期作键；月桶用 年-月
+    if tier == "week":
+        return day_to_str(day)
+    date = datetime.date.fromordinal(day)
+    return f"{date.year}-{date.month:02d}"
+
+
+def parse_bucket_key(key, tier):
+    if tier == "week":
+        return str_to_day(key)
+    year, month = key.split("-")
+    return datetime.date(int(year), int(month), 1).toordinal()
+
+
+def bucket_edges(first_day, months_before, weeks_before):
+    """汇总区的桶边界：first_day 所在月到 months_before 按月，之后到 weeks_before 按周，末项为 weeks_before
+
+    周桶在月初截断，两个边界只前移时，旧的每个桶总是整个落在新的某个桶内。
+    """
+    edges = [lo for lo, _ in iter_buckets(month_start(first_day), months_before, "month")]
+    edges += [lo for lo, _ in iter_buckets(max(months_before, week_start(first_day)), weeks_before, "week")]
+    return tuple(edges + [weeks_before]) if edges else ()
+
+
+def parse_rollup(usage_data):
+    """读取 usage_data 中的降采样边界 (months_before, weeks_before)，没有时返回 None"""
+    meta = usage_data.get(RETENTION_KEY)
+    if not meta:
+        return None
+    return str_to_day(meta["months_before"]), str_to_day(meta["weeks_before"])
+
+
+def iter_breakdown(app_data, rollup=None):
+    """逐日展开一个应用的历史，供不分层保存的 SQLite 迁移使用；按周、按月汇总的部分平均摊到桶内各天"""
+    for date, seconds in app_data.get("daily_breakdown", {}).items():
+        yield str_to_day(date), seconds
+    if rollup is None:
+        return
+    months_before, weeks_before = rollup
+    for tier, key_name, limit in (("week", "weekly_breakdown", weeks_before),
+                                  ("month", "monthly_breakdown", months_before)):
+        for key, seconds in app_data.get(key_name, {}).items():
+            start = parse_bucket_key(key, tier)
+            end = min(bucket_end(start, tier), limit)
+            if end <= start:
+                continue
+            share = seconds / (end - start)
+            for day in range(start, end):
+                yield day, share
+
+
+def hour_to_str(hour):
+    """绝对小时号（日期序数 * 24 + 小时）转为 usage_data.json 中 hourly_breakdown 的键"""
+    return f"{day_to_str(hour // 24)}T{hour % 24:02d}"
+
+
+def str_to_hour(hour_str):
+    date_str, hour = hour_str.split("T")
+    return str_to_day(date_str) * 24 + int(hour)
+
+
+class HourRing:
+    """最近 HOURS_KEPT 小时的逐小时秒数，按绝对小时号取模存放
+
+    head 为写入过的最新小时；写入更新的小时时把中间跳过的格子清零，
+    因此环中始终只有 (head - HOURS_KEPT, head] 内的数据。
+    """
+
+    __slots__ = ("values", "head")
+
+    def __init__(self, values=None, head=None):
+        self.values = values if values is not None else _zeros(HOURS_KEPT)
+        self.head = head
+
+    def copy(self):
+        return HourRing(array('d', self.values), self.head)
+
+    def add(self, hour, seconds):
+        head = self.head
+        values = self.values
+        if head is None or hour - head >= HOURS_KEPT:
+            values[:] = _zeros(HOURS_KEPT)
+            self.head = hour
+        elif hour > head:
+            for skipped in range(head + 1, hour + 1):
+                values[skipped % HOURS_KEPT] = 0.0
+            self.head = hour
+        elif hour <= head - HOURS_KEPT:
+            # 已滑出窗口的小时不再记录
+            return
+        values[hour % HOURS_KEPT] += seconds
+
+    def get(self, hour):
+        head = self.head
+        if head is None or hour > head or hour <= head - HOURS_KEPT:
+            return 0.0
+        return self.values[hour % HOURS_KEPT]
+
+    def items(self):
+        """按时间顺序返回窗口内非零的 (小时号, 秒数)"""
+        if self.head is None:
+            return []
+        return [(hour, self.values[hour % HOURS_KEPT])
+                for hour in range(self.head - HOURS_KEPT + 1, self.head + 1)
+                if self.values[hour % HOURS_KEPT]]
+
+
+def _build_ranking(view, day):
+    seconds = {}
+    if view.bucket_edges and day < view.bucket_edges[-1]:
+        seconds = {row: value for row, value in enumerate(view.range_sums(day, day)) if value > 0}
+    elif view.base_day is not None and day >= view.base_day:
+        column = day - view.base_day
+        for row, values in enumerate(view.rows):
+            if len(values) > column and values[column] > 0:
+                seconds[row] = values[column]
+    return sorted((-value, row) for row, value in seconds.items()), seconds
+
+
+class UsageView:
+    """列式使用时长表的只读查询接口，UsageStore 与 UsageSnapshot 共用"""
+
+    __slots__ = ()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, app_name):
+        return app_name in self._index
+
+    def row_of(self, app_name):
+        return self._index.get(app_name)
+
+    def _bucket_sum(self, buckets, start_day, end_day):
+        """汇总桶在 [start_day, end_day] 内的秒数；只部分落在区间内的桶按天数比例折算"""
+        edges = self.bucket_edges
+        if not edges or start_day >= edges[-1] or end_day < edges[0]:
+            return 0.0
+        total = 0.0
+        for i in range(max(bisect_right(edges, start_day) - 1, 0), min(len(edges) - 1, len(buckets))):
+            lo, hi = edges[i], edges[i + 1]
+            if lo > end_day:
+                break
+            if buckets[i]:
+                overlap = min(hi, end_day + 1) - max(lo, start_day)
+                total += buckets[i] if overlap == hi - lo else buckets[i] * overlap / (hi - lo)
+        return total
+
+    def _spread_buckets(self, result, buckets, start_day):
+        """把汇总桶按桶内日均值填入 result（首元素对应 start_day），供逐日展示"""
+        edges = self.bucket_edges
+        end_day = start_day + len(result)
+        if not edges or start_day >= edges[-1] or end_day <= edges[0]:
+            return result
+        for i in range(max(bisect_right(edges, start_day) - 1, 0), min(len(edges) - 1, len(buckets))):
+            if edges[i] >= end_day:
+                break
+            if buckets[i]:
+                lo, hi = max(edges[i], start_day), min(edges[i + 1], end_day)
+                mean = buckets[i] / (edges[i + 1] - edges[i])
+                result[lo - start_day:hi - start_day] = array('d', [mean]) * (hi - lo)
+        return result
+
+    def window(self, row, start_day, end_day):
+        """返回 [start_day, end_day] 区间内该应用的逐日秒数，缺失部分补零，汇总区间为桶内日均值"""
+        length = end_day - start_day + 1
+        if self.base_day is None:
+            return _zeros(length)
+        values = self.rows[row]
+        lo = start_day - self.base_day
+        hi = lo + length
+        result = _copy_row(values[max(lo, 0):max(hi, 0)])
+        if lo < 0:
+            result[0:0] = _zeros(min(-lo, length))
+        if len(result) < length:
+            result.extend(_zeros(length - len(result)))
+        return self._spread_buckets(result, self.bucket_rows[row], start_day)
+
+    def range_sum(self, row, start_day, end_day):
+        if self.base_day is None:
+            return 0.0
+        lo = max(start_day - self.base_day, 0)
+        hi = max(end_day - self.base_day + 1, 0)
+        return sum(self.rows[row][lo:hi]) + self._bucket_sum(self.bucket_rows[row], start_day, end_day)
+
+    def range_sums(self, start_day, end_day):
+        """所有应用在区间内的合计，按行号排列"""
+        if self.base_day is None:
+            return []
+        lo = max(start_day - self.base_day, 0)
+        hi = max(end_day - self.base_day + 1, 0)
+        sums = [sum(values[lo:hi]) for values in self.rows]
+        if self.bucket_edges and start_day < self.bucket_edges[-1]:
+            for row, buckets in enumerate(self.bucket_rows):
+                if buckets:
+                    sums[row] += self._bucket_sum(buckets, start_day, end_day)
+        return sums
+
+    def daily_totals(self, start_day, end_day):
+        totals = _zeros(end_day - start_day + 1)
+        if self.base_day is None:
+            return totals
+        lo = max(start_day - self.base_day, 0)
+        hi = max(end_day - self.base_day + 1, 0)
+        offset = lo - (start_day - self.base_day)
+        window = self.day_totals[lo:hi]
+        totals[offset:offset + len(window)] = window
+        return self._spread_buckets(totals, self.bucket_totals, start_day)
+
+    def _ranking(self, day):
+        ranking = self._rankings.get(day)
+        if ranking is None:
+            ranking = _build_ranking(self, day)
+        return ranking
+
+    def top_apps_on(self, day, limit=None):
+        """单日 Top-K，直接读取增量维护的排名"""
+        entries, _ = self._ranking(day)
+        if limit is not None:
+            entries = entries[:limit]
+        return [(self.names[row], -negative) for negative, row in entries]
+
+    def active_apps(self, start_day, end_day):
+        """区间内使用时间大于零的 (应用名, 秒数)，按登记顺序"""
+        return [(self.names[row], seconds)
+                for row, seconds in enumerate(self.range_sums(start_day, end_day)) if seconds > 0]
+
+    def app_window(self, app_name, start_day, end_day):
+        row = self._index.get(app_name)
+        if row is None:
+            return _zeros(end_day - start_day + 1)
+        return self.window(row, start_day, end_day)
+
+    def top_apps(self, start_day, end_day, limit=None):
+        """返回区间内使用时间大于零的 (应用名, 秒数)，按时长降序，同值保持登记顺序"""
+        sums = self.range_sums(start_day, end_day)
+        ranked = sorted((row for row, seconds in enumerate(sums) if seconds > 0),
+                        key=sums.__getitem__, reverse=True)
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(self.names[row], sums[row]) for row in ranked]
+
+    def _prefix_sums(self, key, values):
+        # 前缀和按行对象缓存，行被替换（写时复制、降采样）后自动失效
+        cached = self._prefix.get(key)
+        if cached is None or cached[0] is not values:
+            cached = (values, array('d', accumulate(values, initial=0.0)))
+            self._prefix[key] = cached
+        return cached[1]
+
+    def range_total(self, app_name, start_day, end_day):
+        """[start_day, end_day] 内的秒数合计，app_name 为 None 时为全部应用；逐日部分由前缀和 O(1) 求得"""
+        if self.base_day is None:
+            return 0.0
+        if app_name is None:
+            key, values, buckets = None, self.day_totals, self.bucket_totals
+        else:
+            key = self._index.get(app_name)
+            if key is None:
+                return 0.0
+            values, buckets = self.rows[key], self.bucket_rows[key]
+        prefix = self._prefix_sums(key, values)
+        lo = min(max(start_day - self.base_day, 0), len(values))
+        hi = min(max(end_day - self.base_day + 1, 0), len(values))
+        return (prefix[hi] - prefix[lo] if hi > lo else 0.0) + self._bucket_sum(buckets, start_day, end_day)
+
+    def hour_window(self):
+        """逐小时数据覆盖的 (最早小时号, 最新小时号)，尚无数据时返回 None"""
+        head = self.hour_totals.head
+        if head is None:
+            return None
+        return head - HOURS_KEPT + 1, head
+
+    def hour_values(self, app_name, start_hour, end_hour):
+        """[start_hour, end_hour] 内逐小时的秒数，app_name 为 None 时为全部应用"""
+        if app_name is None:
+            ring = self.hour_totals
+        else:
+            row = self._index.get(app_name)
+            ring = self.hours[row] if row is not None else None
+        if ring is None:
+            return [0.0] * (end_hour - start_hour + 1)
+        return [ring.get(hour) for hour in range(start_hour, end_hour + 1)]
+
+    def _selected_rows(self, apps):
+        if apps is None:
+            return range(len(self.names))
+        return [self._index[app_name] for app_name in apps if app_name in self._index]
+
+    def iter_app_days(self, start_day=None, end_day=None, apps=None):
+        """逐个应用产生 (应用名, 日期序数列表, 秒数列表)，只含大于零的值，日期升序
+
+        start_day、end_day 为 None 时不限制，apps 为 None 时按登记顺序包含全部应用。
+        每次只展开一个应用的一行，不会整体展开历史。只包含逐日保存的部分，不含汇总桶。
+        """
+        if self.base_day is None:
+            return
+        lo = 0 if start_day is None else max(start_day - self.base_day, 0)
+        hi = None if end_day is None else max(end_day - self.base_day + 1, 0)
+        for row in self._selected_rows(apps):
+            values = self.rows[row][lo:hi]
+            days = list(compress(range(self.base_day + lo, self.base_day + lo + len(values)), values))
+            if days:
+                yield self.names[row], days, list(compress(values, values))
+
+    def iter_app_buckets(self, start_day=None, end_day=None, apps=None):
+        """逐个应用产生 (应用名, 桶起始日列表, 桶天数列表, 秒数列表)，只含与区间相交且大于零的汇总桶"""
+        edges = self.bucket_edges
+        if not edges:
+            return
+        lo = 0 if start_day is None else max(bisect_right(edges, start_day) - 1, 0)
+        hi = len(edges) - 1 if end_day is None else min(bisect_right(edges, end_day), len(edges) - 1)
+        for row in self._selected_rows(apps):
+            buckets = self.bucket_rows[row]
+            indexes = [i for i in range(lo, min(hi, len(buckets))) if buckets[i]]
+            if indexes:
+                yield (self.names[row], [edges[i] for i in indexes], [edges[i + 1] - edges[i] for i in indexes],
+                       [buckets[i] for i in indexes])
+
+    def rebucket(self, row, edges):
+        """按新的桶边界 edges 重新汇总一行（row 为 None 时为每日合计），没有数据时返回空数组
+
+        旧的桶整个并入所在的新桶，edges[-1] 之前的逐日数据累加到对应的桶。
+        """
+        if not edges:
+            return _NO_BUCKETS
+        if row is None:
+            buckets, values = self.bucket_totals, self.day_totals
+        else:
+            buckets, values = self.bucket_rows[row], self.rows[row]
+        result = _zeros(len(edges) - 1)
+        for i, seconds in enumerate(buckets):
+            if seconds:
+                result[bisect_right(edges, self.bucket_edges[i]) - 1] += seconds
+        end = min(edges[-1] - self.base_day, len(values)) if edges and self.base_day is not None else 0
+        if end > 0:
+            for i in range(max(bisect_right(edges, self.base_day) - 1, 0), len(edges) - 1):
+                lo, hi = max(edges[i] - self.base_day, 0), min(edges[i + 1] - self.base_day, end)
+                if lo >= end:
+                    break
+                result[i] += sum(values[lo:hi])
+        return result if any(result) else _NO_BUCKETS
+
+    def to_usage_data(self):
+        """导出 usage_data.json 布局；已降采样的区间按周、按月汇总写出"""
+        usage_data = {}
+        rollup = self.rollup
+        edges = self.bucket_edges
+        for row, app_name in enumerate(self.names):
+            breakdown = {}
+            for column, seconds in enumerate(self.rows[row]):
+                if seconds:
+                    breakdown[day_to_str(self.base_day + column)] = seconds
+            usage_data[app_name] = {
+                "total_time": self.total_time[row],
+                "daily_breakdown": breakdown,
+                "last_updated": self.last_updated[row]
+            }
+            ring = self.hours[row]
+            if ring is not None and ring.head is not None:
+                usage_data[app_name]["hourly_breakdown"] = {
+                    hour_to_str(hour): seconds for hour, seconds in ring.items()}
+            if rollup:
+                weekly, monthly = {}, {}
+                for i, seconds in enumerate(self.bucket_rows[row]):
+                    if seconds:
+                        if edges[i] < rollup[0]:
+                            monthly[bucket_key(edges[i], "month")] = seconds
+                        else:
+                            weekly[bucket_key(edges[i], "week")] = seconds
+                usage_data[app_name]["weekly_breakdown"] = weekly
+                usage_data[app_name]["monthly_breakdown"] = monthly
+        if rollup:
+            usage_data[RETENTION_KEY] = {"months_before": day_to_str(rollup[0]),
+                                         "weeks_before": day_to_str(rollup[1])}
+        return usage_data
+
+
+class UsageSnapshot(UsageView):
+    """某一时刻的不可变快照，供界面线程无锁读取
+
+    未变化的应用行与上一个快照共享同一个数组对象，发布快照不需要深拷贝。
+    """
+
+    __slots__ = ("version", "names", "_index", "rows", "total_time", "last_updated", "day_totals",
+                 "base_day", "_rankings", "rollup", "hours", "hour_totals", "_prefix", "bucket_edges",
+                 "bucket_rows", "bucket_totals")
+
+    def __init__(self, version, names, index, rows, total_time, last_updated, day_totals, base_day, rankings,
+                 rollup=None, hours=None, hour_totals=None, prefix=None, bucket_edges=(), bucket_rows=None,
+                 bucket_totals=_NO_BUCKETS):
+        self.version = version
+        self.names = names
+        self._index = index
+        self.rows = rows
+        self.total_time = total_time
+        self.last_updated = last_updated
+        self.day_totals = day_totals
+        self.base_day = base_day
+        self._rankings = rankings
+        self.rollup = rollup
+        self.hours = hours if hours is not None else (None,) * len(names)
+        self.hour_totals = hour_totals if hour_totals is not None else HourRing()
+        self._prefix = prefix if prefix is not None else {}
+        self.bucket_edges = bucket_edges
+        self.bucket_rows = bucket_rows if bucket_rows is not None else (_NO_BUCKETS,) * len(names)
+        self.bucket_totals = bucket_totals
+
+
+class UsageStore(UsageView):
+    """按 应用 × 日期序数 组织的列式使用时长表
+
+    每个应用对应一行 array('d')，第 i 列是日期序数 base_day + i 当天的秒数。
+    区间求和、每日合计和 Top-N 都在行切片上完成，不再逐日格式化日期字符串。
+    每日合计和最近几天的按日排名在 add() 时增量维护，查询时无需重新扫描。
+    rollup 为 (months_before, weeks_before)：更早的日期按月、再往后到 weeks_before
+    之前按周降采样。汇总后的数据不再占用逐日列：bucket_edges 为所有应用共用的桶边界，
+    每个应用在 bucket_rows 中有一行按桶存放的秒数（没有数据的为空数组），bucket_totals 为各桶合计，
+    base_day 随之前移到逐日保留的边界。区间查询对只部分落在区间内的桶按天数比例折算。
+    最近 HOURS_KEPT 小时另外按应用保存在 HourRing 中，支持当天的逐小时查询。
+
+    发布快照后所有行都与快照共享，之后写入某一行前先复制该行（写时复制），
+    因此已发布的快照永远不会被修改。
+    """
+
+    MAX_RANKED_DAYS = 7
+
+    __slots__ = ("_index", "names", "total_time", "last_updated", "rows", "day_totals", "base_day",
+                 "rollup", "bucket_edges", "bucket_rows", "bucket_totals", "hours", "hour_totals", "_prefix",
+                 "_rankings", "_owned", "_owned_totals", "_owned_index", "_owned_rankings")
+
+    def __init__(self):
+        self._index = {}
+        self.names = []
+        self.total_time = array('d')
+        self.last_updated = array('d')
+        self.rows = []
+        self.day_totals = array('d')
+        self.base_day = None
+        self.rollup = None
+        self.bucket_edges = ()
+        self.bucket_rows = []
+        self.bucket_totals = _NO_BUCKETS
+        # 每个应用一个 HourRing，未记录过小时数据的应用为 None
+        self.hours = []
+        self.hour_totals = HourRing()
+        # 行号（每日合计为 None） -> (行对象, 前缀和)，与发布的快照共用
+        self._prefix = {}
+        # day -> (按 (-秒数, 行号) 升序的列表, {行号: 秒数})，只为查询过的日期维护
+        self._rankings = {}
+        # 写时复制标记：为 0 的行仍与最近发布的快照共享
+        self._owned = array('b')
+        self._owned_totals = True
+        self._owned_index = True
+        self._owned_rankings = set()
+
+    def _ensure_app(self, app_name, timestamp=None):
+        row = self._index.get(app_name)
+        if row is None:
+            if not self._owned_index:
+                self._index = dict(self._index)
+                self.names = list(self.names)
+                self._owned_index = True
+            row = len(self.names)
+            app_name = sys.intern(app_name)
+            self._index[app_name] = row
+            self.names.append(app_name)
+            self.total_time.append(0.0)
+            self.last_updated.append(time.time() if timestamp is None else timestamp)
+            self.rows.append(array('d'))
+            self.bucket_rows.append(_NO_BUCKETS)
+            self.hours.append(None)
+            self._owned.append(1)
+        return row
+
+    def _own_row(self, row):
+        if not self._owned[row]:
+            self.rows[row] = _copy_row(self.rows[row])
+            if self.hours[row] is not None:
+                self.hours[row] = self.hours[row].copy()
+            self._owned[row] = 1
+        return self.rows[row]
+
+    def _own_totals(self):
+        if not self._owned_totals:
+            self.day_totals = array('d', self.day_totals)
+            self.hour_totals = self.hour_totals.copy()
+            self._owned_totals = True
+        return self.day_totals
+
+    def _prefix_sums(self, key, values):
+        # 自己持有的行之后还会原地修改，不能缓存
+        if self._owned_totals if key is None else self._owned[key]:
+            return array('d', accumulate(values, initial=0.0))
+        return UsageView._prefix_sums(self, key, values)
+
+    def _column(self, day):
+        if self.base_day is None:
+            self.base_day = day
+        elif day < self.base_day:
+            # 很少发生：出现比现有最早日期还早的数据时整体右移，生成新数组而不是原地修改
+            padding = _zeros(self.base_day - day)
+            for row, values in enumerate(self.rows):
+                if values:
+                    self.rows[row] = padding + _copy_row(values)
+                    self._owned[row] = 1
+            self.day_totals = padding + self.day_totals
+            self._owned_totals = True
+            self.base_day = day
+        return day - self.base_day
+
+    def add(self, app_name, day, seconds, timestamp=None, hour=None):
+        """记入 day 当天的秒数；给出 hour（当天的小时 0-23）时同时记入逐小时环"""
+        row = self._ensure_app(app_name, timestamp)
+        if self.rollup is not None and day < self.rollup[1]:
+            self._add_to_bucket(row, day, seconds)
+        else:
+            column = self._column(day)
+            values = self._own_row(row)
+            if len(values) <= column:
+                values.extend(_zeros(column + 1 - len(values)))
+            values[column] += seconds
+            day_totals = self._own_totals()
+            if len(day_totals) <= column:
+                day_totals.extend(_zeros(column + 1 - len(day_totals)))
+            day_totals[column] += seconds
+            if day in self._rankings:
+                self._update_ranking(day, row, values[column])
+        self.total_time[row] += seconds
+        if timestamp is not None:
+            self.last_updated[row] = timestamp
+        if hour is not None:
+            self.add_hour(row, day * 24 + hour, seconds)
+
+    def _add_to_bucket(self, row, day, seconds):
+        # 很少发生：日期已在汇总区间内（如导入早于边界的记录），记入所在的桶
+        if not self.bucket_edges or day < self.bucket_edges[0]:
+            first = min(day, self.bucket_edges[0]) if self.bucket_edges else day
+            self.compact(bucket_edges(first, *self.rollup))
+        edges = self.bucket_edges
+        i = bisect_right(edges, day) - 1
+        increment = _zeros(i) + array('d', [seconds])
+        self.bucket_rows[row] = _sum_rows(self.bucket_rows[row], increment)
+        self.bucket_totals = _sum_rows(self.bucket_totals, increment)
+        for ranked_day in [ranked_day for ranked_day in self._rankings if edges[i] <= ranked_day < edges[i + 1]]:
+            del self._rankings[ranked_day]
+
+    def add_hour(self, row, hour, seconds):
+        """只记入逐小时环，不改动逐日数据；hour 为绝对小时号"""
+        self._own_row(row)
+        self._own_totals()
+        if self.hours[row] is None:
+            self.hours[row] = HourRing()
+        self.hours[row].add(hour, seconds)
+        self.hour_totals.add(hour, seconds)
+
+    def _update_ranking(self, day, row, value):
+        if day not in self._owned_rankings:
+            entries, seconds = self._rankings[day]
+            self._rankings[day] = (list(entries), dict(seconds))
+            self._owned_rankings.add(day)
+        entries, seconds = self._rankings[day]
+        old = seconds.pop(row, None)
+        if old is not None:
+            del entries[bisect_left(entries, (-old, row))]
+        if value > 0:
+            insort(entries, (-value, row))
+            seconds[row] = value
+
+    def _ranking(self, day):
+        ranking = self._rankings.get(day)
+        if ranking is None:
+            ranking = _build_ranking(self, day)
+            self._rankings[day] = ranking
+            self._owned_rankings.add(day)
+            while len(self._rankings) > self.MAX_RANKED_DAYS:
+                del self._rankings[min(self._rankings)]
+        return ranking
+
+    def snapshot(self, version, ranked_day=None):
+        """发布不可变快照；ranked_day 指定需要维护排名的日期（通常是今天）"""
+        if ranked_day is not None:
+            self._ranking(ranked_day)
+        snapshot = UsageSnapshot(
+            version, self.names, self._index, tuple(self.rows),
+            array('d', self.total_time), array('d', self.last_updated),
+            self.day_totals, self.base_day, dict(self._rankings), self.rollup,
+            tuple(self.hours), self.hour_totals, self._prefix, self.bucket_edges, tuple(self.bucket_rows),
+            self.bucket_totals)
+        self._owned = array('b', bytes(len(self.rows)))
+        self._owned_totals = False
+        self._owned_index = False
+        self._owned_rankings = set()
+        return snapshot
+
+    def apply_retention(self, plan):
+        """应用 RetentionCompactor 生成的降采样计划，返回并入汇总行的应用数"""
+        if plan.edges is not None:
+            self._set_buckets(plan.edges, [plan.rows.get(app_name, _NO_BUCKETS) for app_name in self.names],
+                              plan.totals)
+        if plan.rollup is not None:
+            self.rollup = plan.rollup
+        return self.fold_apps(plan.folds)
+
+    def compact(self, edges):
+        """按桶边界 edges 重新汇总全部应用，edges[-1] 之前的逐日数据并入桶中"""
+        self._set_buckets(edges, [self.rebucket(row, edges) for row in range(len(self.names))],
+                          self.rebucket(None, edges))
+
+    def _set_buckets(self, edges, bucket_rows, bucket_totals):
+        # 换上新的桶，去掉已并入桶中的逐日列，base_day 前移到边界
+        self.bucket_edges = edges
+        self.bucket_rows = bucket_rows
+        self.bucket_totals = bucket_totals
+        if not edges:
+            return
+        boundary = edges[-1]
+        if self.base_day is not None and self.base_day < boundary:
+            cut = boundary - self.base_day
+            for row, values in enumerate(self.rows):
+                if values:
+                    if not self._owned[row] and self.hours[row] is not None:
+                        self.hours[row] = self.hours[row].copy()
+                    self.rows[row] = _copy_row(values[cut:])
+                    self._owned[row] = 1
+            self._own_totals()
+            self.day_totals = self.day_totals[cut:]
+            for day in [day for day in self._rankings if day < boundary]:
+                del self._rankings[day]
+        if self.base_day is None or self.base_day < boundary:
+            self.base_day = boundary
+
+    def fold_apps(self, folds, target=OTHER_APP):
+        """把 {应用名: 预期总时长} 中的应用并入 target 行；计划生成后又有新时长的应用保留"""
+        folded = set()
+        for app_name, expected in folds.items():
+            row = self._index.get(app_name)
+            if row is not None and app_name != target and self.total_time[row] == expected:
+                folded.add(row)
+        if not folded:
+            return 0
+
+        target_row = self._ensure_app(target)
+        merged = self._own_row(target_row)
+        for row in folded:
+            if self.hours[row] is not None:
+                for hour, seconds in self.hours[row].items():
+                    if self.hours[target_row] is None:
+                        self.hours[target_row] = HourRing()
+                    self.hours[target_row].add(hour, seconds)
+            values = self.rows[row]
+            if len(merged) < len(values):
+                merged.extend(_zeros(len(values) - len(merged)))
+            merged[:len(values)] = array('d', map(add, merged[:len(values)], values))
+            if self.bucket_rows[row]:
+                self.bucket_rows[target_row] = _sum_rows(self.bucket_rows[target_row], self.bucket_rows[row])
+            self.total_time[target_row] += self.total_time[row]
+            self.last_updated[target_row] = max(self.last_updated[target_row], self.last_updated[row])
+
+        # 删除行会改变行号，索引和排名整体重建为新对象，已发布的快照不受影响
+        keep = [row for row in range(len(self.names)) if row not in folded]
+        self.names = [self.names[row] for row in keep]
+        self._index = {app_name: row for row, app_name in enumerate(self.names)}
+        self.rows = [self.rows[row] for row in keep]
+        self.bucket_rows = [self.bucket_rows[row] for row in keep]
+        self.hours = [self.hours[row] for row in keep]
+        self._prefix = {}
+        self.total_time = array('d', (self.total_time[row] for row in keep))
+        self.last_updated = array('d', (self.last_updated[row] for row in keep))
+        self._owned = array('b', (self._owned[row] for row in keep))
+        self._owned_index = True
+        self._rankings = {}
+        self._owned_rankings = set()
+        return len(folded)
+
+    @classmethod
+    def from_columns(cls, names, rows, total_time, last_updated, day_totals, base_day, rollup=None,
+                     recent_columns=None, hours=None, hour_totals=None, bucket_edges=(), bucket_rows=None,
+                     bucket_totals=_NO_BUCKETS):
+        """由已解码的列直接构建；rows 中的行视为共享，写入前会先复制
+
+        recent_columns 为 {日期序数: 按行号排列的当天秒数}，用于直接建立最近几天的排名。
+        hours 为按行号排列的 HourRing（或 None），hour_totals 为全部应用的逐小时合计。
+        bucket_edges、bucket_rows、bucket_totals 为汇总桶，含义同 UsageStore 的同名属性。
+        """
+        store = cls()
+        store.names = [sys.intern(app_name) for app_name in names]
+        store._index = {app_name: row for row, app_name in enumerate(store.names)}
+        store.rows = list(rows)
+        store.total_time = total_time
+        store.last_updated = last_updated
+        store.day_totals = day_totals
+        store.base_day = base_day
+        store.rollup = rollup
+        store.bucket_edges = tuple(bucket_edges)
+        store.bucket_rows = list(bucket_rows) if bucket_rows is not None else [_NO_BUCKETS] * len(store.rows)
+        store.bucket_totals = bucket_totals
+        store.hours = list(hours) if hours is not None else [None] * len(store.rows)
+        if hour_totals is not None:
+            store.hour_totals = hour_totals
+        store._owned = array('b', bytes(len(store.rows)))
+        for day, column in (recent_columns or {}).items():
+            seconds = {row: value for row, value in enumerate(column) if value > 0}
+            store._rankings[day] = (sorted((-value, row) for row, value in seconds.items()), seconds)
+            store._owned_rankings.add(day)
+        return store
+
+    @classmethod
+    def from_usage_data(cls, usage_data):
+        store = cls()
+        store.rollup = parse_rollup(usage_data)
+        apps = {app_name: app_data for app_name, app_data in usage_data.items() if app_name != RETENTION_KEY}
+        breakdowns = {app_name: [(str_to_day(date), seconds)
+                                 for date, seconds in app_data.get("daily_breakdown", {}).items()]
+                      for app_name, app_data in apps.items()}
+        buckets = {}
+        if store.rollup:
+            # 按周、按月汇总的部分直接放入对应的桶，不再展开成逐日数值
+            for app_name, app_data in apps.items():
+                for tier, key_name in (("month", "monthly_breakdown"), ("week", "weekly_breakdown")):
+                    for key, seconds in app_data.get(key_name, {}).items():
+                        start = parse_bucket_key(key, tier)
+                        if start < store.rollup[1]:
+                            buckets.setdefault(app_name, []).append((start, seconds))
+                        else:
+                            breakdowns[app_name].append((start, seconds))
+            starts = [start for entries in buckets.values() for start, _ in entries]
+            if starts:
+                store.compact(bucket_edges(min(starts), *store.rollup))
+        days = [day for breakdown in breakdowns.values() for day, _ in breakdown
+                if store.rollup is None or day >= store.rollup[1]]
+        if days and (store.base_day is None or min(days) < store.base_day):
+            store.base_day = min(days)
+        edges = store.bucket_edges
+        totals = _zeros(len(edges) - 1) if edges else _NO_BUCKETS
+        for app_name, app_data in apps.items():
+            row = store._ensure_app(app_name, app_data.get("last_updated"))
+            if app_name in buckets:
+                values = _zeros(len(edges) - 1)
+                for start, seconds in buckets[app_name]:
+                    values[bisect_right(edges, start) - 1] += seconds
+                store.bucket_rows[row] = values
+                totals = _sum_rows(totals, values)
+        store.bucket_totals = totals
+        for app_name, breakdown in breakdowns.items():
+            app_data = apps[app_name]
+            row = store._index[app_name]
+            for day, seconds in breakdown:
+                store.add(app_name, day, seconds)
+            store.total_time[row] = app_data.get("total_time", 0)
+            for hour_str, seconds in app_data.get("hourly_breakdown", {}).items():
+                store.add_hour(row, str_to_hour(hour_str), seconds)
+        return store
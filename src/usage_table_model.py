@@ -0,0 +1,103 @@
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+
+
+def _ranges(rows: List[int]) -> List[Tuple[int, int]]:
+    """把升序行号合并为连续区间 [(first, last)]"""
+    ranges = []
+    for row in rows:
+        if ranges and ranges[-1][1] == row - 1:
+            ranges[-1] = (ranges[-1][0], row)
+        else:
+            ranges.append((row, row))
+    return ranges
+
+
+class KeyedTableModel(QAbstractTableModel):
+    """按键增量更新的只读表格模型
+
+    update() 按键与上一次的行比较，只对删除、数值变化、新增的行分别发出
+    rowsRemoved / dataChanged / rowsInserted，连续的行合并为一次通知；
+    视图不重建，滚动位置和选中项得以保留。DisplayRole 返回按列格式化后的文本，
+    SORT_ROLE 返回原始值，排序交给 QSortFilterProxyModel。
+    """
+
+    SORT_ROLE = Qt.UserRole
+
+    def __init__(self, headers: Sequence[str], formatters: Optional[Sequence[Callable]] = None,
+                 parent=None) -> None:
+        super().__init__(parent)
+        self._headers = list(headers)
+        self._formatters = list(formatters) if formatters else [str] * len(self._headers)
+        self._keys: List[Hashable] = []
+        self._values: List[tuple] = []
+        self._row_of: Dict[Hashable, int] = {}
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._keys)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self._headers[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self._values[index.row()][index.column()]
+        if role == Qt.DisplayRole:
+            return self._formatters[index.column()](value)
+        if role == self.SORT_ROLE:
+            return value
+        return None
+
+    def key(self, row: int) -> Hashable:
+        return self._keys[row]
+
+    def update(self, rows: Sequence[Tuple[Hashable, tuple]]) -> Tuple[int, int, int]:
+        """rows 为 [(键, 各列原始值)]，返回 (删除, 变化, 新增) 的行数"""
+        new_values = dict(rows)
+
+        removed = [row for row, key in enumerate(self._keys) if key not in new_values]
+        for first, last in reversed(_ranges(removed)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._keys[first:last + 1]
+            del self._values[first:last + 1]
+            self.endRemoveRows()
+        if removed:
+            self._row_of = {key: row for row, key in enumerate(self._keys)}
+
+        changed = []
+        for row, key in enumerate(self._keys):
+            values = new_values[key]
+            if values != self._values[row]:
+                self._values[row] = values
+                changed.append(row)
+        last_column = len(self._headers) - 1
+        for first, last in _ranges(changed):
+            self.dataChanged.emit(self.index(first, 0), self.index(last, last_column),
+                                  [Qt.DisplayRole, self.SORT_ROLE])
+
+        added = [key for key in new_values if key not in self._row_of]
+        if added:
+            first = len(self._keys)
+            self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+            for key in added:
+                self._row_of[key] = len(self._keys)
+                self._keys.append(key)
+                self._values.append(new_values[key])
+            self.endInsertRows()
+        return len(removed), len(changed), len(added)
+
+
+def sorted_proxy(model: KeyedTableModel, column: int, order=Qt.DescendingOrder) -> QSortFilterProxyModel:
+    """按 column 的原始值排序的代理，数据变化后自动重新排序"""
+    proxy = QSortFilterProxyModel(model)
+    proxy.setSourceModel(model)
+    proxy.setSortRole(KeyedTableModel.SORT_ROLE)
+    proxy.setDynamicSortFilter(True)
+    proxy.sort(column, order)
+    return proxy
@@ -1,23 +1,150 @@
 
 import os
+import sys
 import json
 import time
 import datetime
-import psutil
 import threading
-import winreg
 from collections import defaultdict
-from PySide6.QtCore import QStandardPaths, QTimer
-
-class UsageTracker:
-    SYSTEM_DIRS = frozenset([
-        os.path.join(os.environ.get('SystemRoot', r'C:\Windows'), 'System32'),
-        os.path.join(os.environ.get('SystemRoot', r'C:\Windows'), 'SysWOW64'),
-        os.path.join(os.environ.get('SystemRoot', r'C:\Windows'), 'System'),
-        os.path.join(os.environ.get('ProgramFiles', r'C:\Program Files'), 'Windows Defender'),
-        os.path.join(os.environ.get('ProgramFiles(x86)', r'C:\Program Files (x86)'), 'Windows Defender')
-    ])
-    
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from PySide6.QtCore import QObject, QStandardPaths, QTimer, Signal
+from .process_source import CpuTimes, default_process_source
+from .process_table import ProcessTable
+from .software_index import SoftwareIndex
+from .usage_journal import UsageJournal
+from .usage_export import export_usage
+from .usage_history import HistoryJournal
+from .usage_store import HOURS_KEPT, UsageStore, next_month, week_start
+from .usage_retention import RetentionCompactor
+from .usage_sqlite import SQLiteUsageStore
+from .tick_profiler import TickProfiler
+from .tick_scheduler import AdaptiveScheduler
+
+class UsageNotifier(QObject):
+    """快照发布后发出 snapshot_changed(版本号)；从监控线程发出时按队列投递到接收方所在线程"""
+
+    snapshot_changed = Signal(int)
+
+
+class UsageQueries:
+    """基于 self.snapshot 的统计查询，本地监控和进程外收集共用"""
+
+    def get_snapshot(self):
+        return self.snapshot
+
+    def get_snapshot_version(self):
+        return self.snapshot.version
+
+    def get_recent_usage(self, days=7):
+        result = {
+            "total_daily_usage": defaultdict(int),
+            "app_usage": {}
+        }
+
+        store = self.snapshot
+        today = datetime.date.today().toordinal()
+        start_day = today - days + 1
+        # 日期字符串只格式化 days 次，按从今天往前的顺序排列
+        dates = [datetime.date.fromordinal(today - i).isoformat() for i in range(days)]
+
+        for app_name, recent_time in store.active_apps(start_day, today):
+            window = store.app_window(app_name, start_day, today)
+            window.reverse()
+            result["app_usage"][app_name] = {
+                "total_time": recent_time,
+                "daily_breakdown": dict(zip(dates, window))
+            }
+
+        if result["app_usage"]:
+            result["total_daily_usage"] = self._daily_usage(store, days)
+        else:
+            result["total_daily_usage"] = {}
+
+        return result
+
+    def get_daily_usage(self, days=7):
+        """最近 days 天每天的总使用时间，按日期升序；没有任何使用记录时返回空字典"""
+        return self._daily_usage(self.snapshot, days)
+
+    def _daily_usage(self, store, days):
+        today = datetime.date.today().toordinal()
+        start_day = today - days + 1
+        totals = store.daily_totals(start_day, today)
+        if not any(totals):
+            return {}
+        return {datetime.date.fromordinal(start_day + i).isoformat(): seconds
+                for i, seconds in enumerate(totals)}
+
+    def get_top_apps(self, limit=None, days=1):
+        store = self.snapshot
+        today = datetime.date.today().toordinal()
+        start_day = today - days + 1
+        dates = [datetime.date.fromordinal(today - i).isoformat() for i in range(days)]
+
+        if days == 1:
+            ranked = store.top_apps_on(today, limit)
+        else:
+            ranked = store.top_apps(start_day, today, limit)
+
+        top_apps = []
+        for app_name, recent_time in ranked:
+            window = store.app_window(app_name, start_day, today)
+            window.reverse()
+            top_apps.append((app_name, {
+                "total_time": recent_time,
+                "daily_breakdown": dict(zip(dates, window))
+            }))
+        return top_apps
+
+    def get_range_usage(self, start_date, end_date, limit=None):
+        """任意日期区间 [start_date, end_date] 内各应用的使用时间，按时长降序"""
+        return self.snapshot.top_apps(start_date.toordinal(), end_date.toordinal(), limit)
+
+    def export_usage(self, f, fmt="csv", start=None, end=None, apps=None):
+        """把当前快照中的历史以 CSV 或 NDJSON 流式写到文件对象 f，返回行数"""
+        return export_usage(self.snapshot, f, fmt, start, end, apps)
+
+    def usage(self, app=None, start=None, end=None, granularity="day"):
+        """按 hour / day / week / month 粒度统计 [start, end] 内的使用时间
+
+        app 为 None 时统计全部应用；start、end 为 date 或 datetime，缺省均为今天。
+        返回 [(桶起点, 秒数)]，首尾的桶按区间截断。每个桶由前缀和直接求得，与区间长度无关。
+        小时粒度只覆盖最近 HOURS_KEPT 小时，更早的区间抛出 ValueError。
+        """
+        store = self.snapshot
+        today = datetime.date.today()
+        start = start if start is not None else today
+        end = end if end is not None else today
+
+        if granularity == "hour":
+            start_hour = start.toordinal() * 24 + getattr(start, "hour", 0)
+            end_hour = end.toordinal() * 24 + getattr(end, "hour", 23)
+            window = store.hour_window()
+            if window is not None and start_hour < window[0]:
+                raise ValueError(f"逐小时数据只保留最近 {HOURS_KEPT} 小时")
+            values = store.hour_values(app, start_hour, end_hour)
+            return [(datetime.datetime.combine(datetime.date.fromordinal(hour // 24), datetime.time(hour % 24)),
+                     seconds) for hour, seconds in enumerate(values, start_hour)]
+
+        if granularity == "day":
+            step = lambda day: day + 1
+        elif granularity == "week":
+            step = lambda day: week_start(day) + 7
+        elif granularity == "month":
+            step = next_month
+        else:
+            raise ValueError(f"不支持的统计粒度: {granularity}")
+        result = []
+        day, end_day = start.toordinal(), end.toordinal()
+        while day <= end_day:
+            bucket_end = min(step(day), end_day + 1)
+            result.append((datetime.date.fromordinal(day), store.range_total(app, day, bucket_end - 1)))
+            day = bucket_end
+        return result
+
+
+class UsageTracker(UsageQueries):
     SYSTEM_KEYWORDS = frozenset([
         'system', 'windows', 'microsoft', 'svchost', 'csrss', 'lsass',
         'wininit', 'services', 'smss', 'winlogon', 'rundll32', 'dllhost',
@@ -37,112 +164,149 @@ class UsageTracker:
         'msedge.exe', 'steam.exe', 'discord.exe',
     ])
 
-    def __init__(self):
-        self.data_dir = os.path.join(QStandardPaths.writableLocation(QStandardPaths.AppDataLocation), "DesktopPet")
+    MUST_IGNORE = frozenset([
+        'System', 'System Idle Process', 'csrss.exe', 'lsass.exe',
+        'services.exe', 'svchost.exe', 'wininit.exe', 'audiodg.exe'
+    ])
+
+    # 分类尚未完成的进程的临时应用名，这段时间的用时在分类完成后补记到实际应用
+    UNCLASSIFIED = "未分类"
+
+    def __init__(self, storage="binary", process_source=None, data_dir=None, autostart=True,
+                 metrics_file=None, log_metrics=False, retention_policy=None, sampling="scan",
+                 full_scan_interval=60, aggregate_children=False, classify_workers=4, classify_deadline=2.0,
+                 interval=5.0, min_interval=2.0, max_interval=30.0):
+        self.storage = storage
+        # scan: 每个周期扫描全部进程，按 CPU 时间计时；
+        # foreground: 每个周期只查询前台窗口所属的应用并按实际经过的时间计时，
+        # 完整扫描每 full_scan_interval 秒一次，用于后台应用的 CPU 时间统计
+        self.sampling = sampling
+        self.full_scan_interval = full_scan_interval
+        self._last_full_scan = None
+        # 为 True 时子进程的时间记到最上层的用户进程祖先所属的应用下
+        self.aggregate_children = aggregate_children
+        self._root_apps = {}
+        self.profiler = TickProfiler(metrics_file=metrics_file, log=log_metrics)
+        # 监控周期在 [min_interval, max_interval] 内随进程变化和用户空闲情况调整
+        self.scheduler = AdaptiveScheduler(interval, min_interval, max_interval)
+        self.profiler.extras["scheduler"] = self.scheduler.state
+        self.monitoring_thread = None
+        self._last_foreground_app = None
+        self.process_source = process_source if process_source else default_process_source()
+        self.data_dir = data_dir if data_dir else os.path.join(
+            QStandardPaths.writableLocation(QStandardPaths.AppDataLocation), "DesktopPet")
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
 
         self.usage_data_file = os.path.join(self.data_dir, "usage_data.json")
         self.current_process_data_file = os.path.join(self.data_dir, "current_process_data.json")
-
-        self.installed_software = self._get_installed_software()
-
-        self.current_processes = {}
+        self.usage_db_file = os.path.join(self.data_dir, "usage_data.db")
+        self.usage_history_file = os.path.join(self.data_dir, "usage_history.bin")
+        if storage == "binary":
+            self.journal = HistoryJournal(self.usage_history_file)
+        else:
+            self.journal = UsageJournal(self.usage_data_file)
+        # SQLite 后端按索引查询，历史长度不影响启动，不做降采样
+        self.retention = RetentionCompactor(retention_policy) if storage != "sqlite" else None
+        self._retention_dirty = False
+
+        # 索引在后台构建，完成前按原始进程名记录
+        self.installed_software = {}
+        self._software_version = 0
+        self.software_index = SoftwareIndex(
+            self.process_source, os.path.join(self.data_dir, "installed_software_cache.json"))
+        self.software_index.start()
+
+        self.current_processes = ProcessTable()
+        # (pid, create_time) -> (is_system, software_name, proc_name, exe_path)，进程存活期间分类结果不变
+        self._classification_cache = {}
+        self.classification_stats = {"hits": 0, "misses": 0, "evictions": 0, "timeouts": 0}
+        # 需要查询命令行、父进程、用户的新进程在线程池中分类，classify_workers 为 0 时在监控线程中同步分类
+        self.classify_workers = classify_workers
+        self._classify_pool = ThreadPoolExecutor(classify_workers, "classify") if classify_workers else None
+        self.classify_deadline = classify_deadline
+        # (pid, create_time) -> (临时分类结果, 进程树)，直到工作线程给出结果或超过期限
+        self._pending_classifications = {}
+        self._classify_queue = []
+        # 以下两项由工作线程写入，在 _classify_lock 下读写：开始处理的时刻、分类结果
+        self._classify_lock = threading.Lock()
+        self._classify_started = {}
+        self._classify_results = {}
+        # 换线程池时加一，旧线程池中的工作线程处理完手头的进程后退出
+        self._classify_generation = 0
+        # (pid, create_time) -> 分类完成前累计、尚未记入的秒数
+        self._held_time = defaultdict(int)
+        self._pending_foreground = None
         self.last_update_time = time.time()
+        self.notifier = UsageNotifier()
         self.load_usage_data()
-        self.start_monitoring()
-
-    def _get_installed_software(self):
-        software_map = {}
-
-        try:
-            roots = [
-                (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"),
-                (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall"),
-                (winreg.HKEY_CURRENT_USER, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall")
-            ]
-
-            for root, subkey_path in roots:
-                try:
-                    with winreg.OpenKey(root, subkey_path) as key:
-                        i = 0
-                        while True:
-                            try:
-                                subkey_name = winreg.EnumKey(key, i)
-                                with winreg.OpenKey(key, subkey_name) as subkey:
-                                    try:
-                                        name = winreg.QueryValueEx(subkey, "DisplayName")[0]
-
-                                        try:
-                                            install_location = winreg.QueryValueEx(subkey, "InstallLocation")[0]
-                                            if install_location:
-                                                for file in os.listdir(install_location):
-                                                    if file.lower().endswith(('.exe', '.bat', '.cmd')):
-                                                        exe_name = file.lower()
-                                                        software_map[exe_name] = name
-                                                        break
-                                        except (WindowsError, OSError):
-                                            pass
-
-                                        try:
-                                            uninstall_string = winreg.QueryValueEx(subkey, "UninstallString")[0]
-                                            if uninstall_string:
-                                                if ".exe" in uninstall_string:
-                                                    exe_path = uninstall_string.split('"')[-1].split('"')[0]
-                                                    exe_name = os.path.basename(exe_path).lower()
-                                                    if exe_name not in software_map:
-                                                        software_map[exe_name] = name
-                                        except (WindowsError, OSError):
-                                            pass
-                                    except (WindowsError, OSError):
-                                        pass
-                                i += 1
-                            except WindowsError:
-                                break
-                except WindowsError:
-                    continue
-        except Exception as e:
-            print(f"获取已安装软件时出错: {e}")
-
-        return software_map
+        if autostart:
+            self.start_monitoring()
 
     def load_usage_data(self):
-        if os.path.exists(self.usage_data_file):
-            with open(self.usage_data_file, 'r') as f:
-                loaded_data = json.load(f)
-                self.usage_data = defaultdict(lambda: {
-                    "total_time": 0,
-                    "daily_breakdown": defaultdict(int),
-                    "last_updated": time.time()
-                })
-                self.usage_data.update(loaded_data)
-                for app_name in self.usage_data:
-                    if isinstance(self.usage_data[app_name]["daily_breakdown"], dict):
-                        self.usage_data[app_name]["daily_breakdown"] = defaultdict(int, self.usage_data[app_name]["daily_breakdown"])
+        if self.storage == "sqlite":
+            self.store = SQLiteUsageStore(self.usage_db_file)
+            if not self.store.is_migrated():
+                self.store.migrate_from_usage_data(self.journal.load(), self.usage_data_file)
+        elif self.storage == "binary":
+            if not self.journal.has_snapshot() and os.path.exists(self.usage_data_file):
+                # 首次使用二进制格式时从 usage_data.json 一次性导入，原文件保留
+                self.store = UsageStore.from_usage_data(UsageJournal(self.usage_data_file).load())
+                self.journal.checkpoint(self.store)
+            else:
+                self.store = self.journal.load()
         else:
-            self.usage_data = defaultdict(lambda: {
-                "total_time": 0,
-                "daily_breakdown": defaultdict(int),
-                "last_updated": time.time()
-            })
+            self.store = UsageStore.from_usage_data(self.journal.load())
+        self.snapshot_version = 0
+        self._publish_snapshot()
+
+    def _publish_snapshot(self):
+        # 只有监控线程写 store；界面线程只读取 self.snapshot，属性赋值本身是原子的
+        self.snapshot = self.store.snapshot(self.snapshot_version, datetime.date.today().toordinal())
+        self.notifier.snapshot_changed.emit(self.snapshot_version)
 
     def save_usage_data(self):
-        with open(self.usage_data_file, 'w') as f:
-            json.dump(self.usage_data, f, indent=4)
+        if self.storage == "sqlite":
+            return
+        self.journal.checkpoint(self.journal.export(self.snapshot))
+
+    def _record_tick(self, timestamp, increments):
+        now = datetime.datetime.fromtimestamp(timestamp)
+        today = now.date()
+        if self.storage == "sqlite":
+            self.store.record_tick(timestamp, today.toordinal(), now.hour, increments)
+            return
+        day = today.toordinal()
+        for software_name, time_increment in increments.items():
+            self.store.add(software_name, day, time_increment, timestamp, now.hour)
+        self.profiler.count("bytes_written", self.journal.append(timestamp, today.isoformat(), increments))
+        if self.journal.needs_compaction():
+            self.profiler.count("bytes_written", self.save_current_process_data())
+            self.journal.compact_async()
 
     def save_current_process_data(self):
         with open(self.current_process_data_file, 'w') as f:
-            json.dump(self.current_processes, f, indent=4)
-
-    def _is_system_process(self, proc_name, exe_path, pid):
-        if not exe_path:
+            json.dump(self.current_processes.to_dict(), f, indent=4)
+            return f.tell()
+
+    def get_tick_metrics(self):
+        """最近若干周期各阶段耗时（毫秒）与计数器的分位数统计"""
+        metrics = self.profiler.summary()
+        metrics["classification"] = self.get_classification_stats()
+        return metrics
+
+    def _is_system_process(self, proc_name, exe_path, pid, tree=None):
+        """tree 为本周期枚举得到的 {pid: 进程信息}，父进程和用户名优先从中读取，不再逐个查询"""
+        return self._is_system_by_name(proc_name, exe_path) or self._is_system_by_context(pid, tree)
+
+    def _is_system_by_name(self, proc_name, exe_path):
+        """只看进程名和路径的判断，不需要查询进程来源"""
+        if proc_name in self.MUST_IGNORE or not exe_path:
             return True
 
         exe_full_path = os.path.normpath(exe_path).lower()
-        
-        for sys_dir in self.SYSTEM_DIRS:
-            if exe_full_path.startswith(sys_dir.lower()):
-                return True
+        if exe_full_path.startswith(self.process_source.system_dirs):
+            return True
 
         proc_name_lower = proc_name.lower()
 
@@ -152,175 +316,440 @@ class UsageTracker:
         for keyword in self.SYSTEM_KEYWORDS:
             if keyword in proc_name_lower:
                 return True
-                
-        try:
-            cmdline = psutil.Process(pid).cmdline()
-            if cmdline and any('system' in arg.lower() or 'windows' in arg.lower() for arg in cmdline):
-                return True
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-            pass
-                
-        try:
-            parent = psutil.Process(pid).ppid()
-            if parent:
-                parent_proc = psutil.Process(parent)
-                parent_name = parent_proc.name().lower()
+        return False
+
+    def _is_system_by_context(self, pid, tree=None):
+        """根据命令行、父进程和用户判断，可能需要多次较慢的查询"""
+        source = self.process_source
+        cmdline = source.cmdline(pid)
+        if cmdline and any('system' in arg.lower() or 'windows' in arg.lower() for arg in cmdline):
+            return True
+
+        info = tree.get(pid) if tree is not None else None
+        parent = info['ppid'] if info is not None and 'ppid' in info else source.ppid(pid)
+        if parent:
+            if info is not None and 'ppid' in info:
+                # 不在本周期枚举结果中的父进程已经退出，无需再查询
+                parent_info = tree.get(parent)
+                parent_name = parent_info['name'] if parent_info else None
+            else:
+                parent_info = None
+                parent_name = source.name(parent)
+            if parent_name:
+                parent_name = parent_name.lower()
                 if any(keyword in parent_name for keyword in self.SYSTEM_KEYWORDS):
                     return True
-                    
-                try:
-                    parent_exe = parent_proc.exe()
-                    if parent_exe:
-                        parent_exe_path = os.path.normpath(parent_exe).lower()
-                        for sys_dir in self.SYSTEM_DIRS:
-                            if parent_exe_path.startswith(sys_dir.lower()):
-                                return True
-                except (psutil.AccessDenied, psutil.NoSuchProcess, psutil.ZombieProcess):
-                    pass
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-            pass
-            
-        try:
-            proc_username = psutil.Process(pid).username()
-            if proc_username and ('SYSTEM' in proc_username or 'LOCAL SERVICE' in proc_username or 'NETWORK SERVICE' in proc_username):
-                return True
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-            pass
-            
+
+                parent_exe = parent_info.get('exe') if parent_info else source.exe(parent)
+                if parent_exe and os.path.normpath(parent_exe).lower().startswith(source.system_dirs):
+                    return True
+
+        proc_username = info['username'] if info is not None and 'username' in info else source.username(pid)
+        if proc_username and source.is_system_user(proc_username):
+            return True
+
         return False
-    
+
+    def _resolve_software_name(self, proc_name, exe_path):
+        if exe_path:
+            exe_file = os.path.basename(exe_path).lower()
+            if exe_file in self.installed_software:
+                return self.installed_software[exe_file]
+            elif exe_file.endswith('.exe'):
+                exe_name_without_ext = exe_file[:-4]
+                if exe_name_without_ext in self.installed_software:
+                    return self.installed_software[exe_name_without_ext]
+        return proc_name
+
+    def _classify_process(self, proc_name, exe_path, pid, tree=None):
+        # 名称在缓存、进程表和使用时长表之间共用，驻留后每个名称只保留一份
+        proc_name = sys.intern(proc_name)
+        if self._is_system_process(proc_name, exe_path, pid, tree):
+            return True, None, proc_name, exe_path
+        return False, sys.intern(self._resolve_software_name(proc_name, exe_path)), proc_name, exe_path
+
+    def _classify_batch(self, batch, generation):
+        """线程池中执行：逐个判断一批新进程，结果写入 _classify_results"""
+        for cache_key, tree in batch:
+            start = time.perf_counter()
+            with self._classify_lock:
+                if generation != self._classify_generation:
+                    return
+                # 期限从开始处理时算起，在队列中等待的时间不计入
+                self._classify_started[cache_key] = time.monotonic()
+            try:
+                is_system = self._is_system_by_context(cache_key[0], tree)
+            except Exception as e:
+                print(f"分类进程时出错: {e}")
+                is_system = False
+            with self._classify_lock:
+                self._classify_started.pop(cache_key, None)
+                self._classify_results[cache_key] = (is_system, time.perf_counter() - start)
+
+    def _submit_classifications(self):
+        # 一个周期的新进程分成若干批提交，避免为每个进程单独创建任务
+        queued = self._classify_queue
+        if not queued:
+            return
+        self._classify_queue = []
+        batches = self.classify_workers * 4
+        size = -(-len(queued) // batches)
+        for start in range(0, len(queued), size):
+            self._classify_pool.submit(self._classify_batch, queued[start:start + size], self._classify_generation)
+
+    def _replace_classify_pool(self):
+        """有工作线程卡在超时的查询上时换一个线程池，还没开始处理的进程重新提交
+
+        卡住的线程无法中止，查询返回后它发现线程池已更换便退出，结果被忽略。
+        """
+        with self._classify_lock:
+            self._classify_generation += 1
+            started = set(self._classify_started)
+            finished = set(self._classify_results)
+        self._classify_pool.shutdown(wait=False, cancel_futures=True)
+        self._classify_pool = ThreadPoolExecutor(self.classify_workers, "classify")
+        self._classify_queue = [(cache_key, tree) for cache_key, (_, tree) in self._pending_classifications.items()
+                                if cache_key not in started and cache_key not in finished]
+        self._submit_classifications()
+
+    def _refresh_software_names(self):
+        """软件索引更新后只重新解析缓存中用户进程的名称，不重跑系统进程过滤"""
+        self.installed_software = self.software_index.mapping
+        self._software_version = self.software_index.version
+        cache = self._classification_cache
+        for key, (is_system, _, proc_name, exe_path) in cache.items():
+            if not is_system:
+                cache[key] = (False, sys.intern(self._resolve_software_name(proc_name, exe_path)),
+                              proc_name, exe_path)
+
+    def get_classification_stats(self):
+        stats = dict(self.classification_stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["size"] = len(self._classification_cache)
+        stats["pending"] = len(self._pending_classifications)
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _lookup_classification(self, cache_key, proc_name, exe_path, tree=None):
+        """返回缓存的分类结果；需要较慢查询的新进程交给线程池，结果出来前返回“未分类”的临时结果"""
+        classification = self._classification_cache.get(cache_key)
+        if classification is not None:
+            self.classification_stats["hits"] += 1
+            return classification
+        pending = self._pending_classifications.get(cache_key)
+        if pending is not None:
+            return pending[0]
+
+        self.classification_stats["misses"] += 1
+        proc_name = sys.intern(proc_name)
+        if self._classify_pool is not None and not self._is_system_by_name(proc_name, exe_path):
+            self._classify_queue.append((cache_key, tree))
+            provisional = (False, self.UNCLASSIFIED, proc_name, exe_path)
+            self._pending_classifications[cache_key] = (provisional, tree)
+            return provisional
+
+        classify_start = time.perf_counter()
+        classification = self._classify_process(proc_name, exe_path, cache_key[0], tree)
+        self.profiler.add_time("classify", time.perf_counter() - classify_start)
+        self._classification_cache[cache_key] = classification
+        return classification
+
+    def wait_for_classifications(self, timeout=None):
+        """等待已提交的分类全部出结果，供基准测试等场景使用"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._classify_lock:
+                if all(key in self._classify_results for key in self._pending_classifications):
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def _collect_classifications(self):
+        """收取线程池中已完成的分类并处理超时，返回 {应用名: 补记的秒数}
+
+        工作线程开始处理后超过 classify_deadline 仍无结果的进程按名称和路径的判断定为用户软件，
+        之后到达的结果不再采用；暂存的时长在分类确定时补记。
+        """
+        retroactive = defaultdict(int)
+        now = time.monotonic()
+        with self._classify_lock:
+            results, self._classify_results = self._classify_results, {}
+            started = dict(self._classify_started)
+        timed_out = False
+        for cache_key, (provisional, _) in list(self._pending_classifications.items()):
+            _, _, proc_name, exe_path = provisional
+            result = results.pop(cache_key, None)
+            if result is not None:
+                is_system, elapsed = result
+                self.profiler.add_time("classify", elapsed)
+            else:
+                begun = started.get(cache_key)
+                if begun is None or now - begun <= self.classify_deadline:
+                    continue
+                # 名称和路径都不像系统进程才会交给线程池，超时后按用户软件处理
+                is_system = False
+                timed_out = True
+                self.classification_stats["timeouts"] += 1
+                with self._classify_lock:
+                    self._classify_started.pop(cache_key, None)
+
+            del self._pending_classifications[cache_key]
+            if is_system:
+                classification = (True, None, proc_name, exe_path)
+            else:
+                # 软件索引可能在分类期间更新过，名称在这里再解析
+                classification = (False, sys.intern(self._resolve_software_name(proc_name, exe_path)),
+                                  proc_name, exe_path)
+            self._classification_cache[cache_key] = classification
+            held = self._held_time.pop(cache_key, 0)
+            if is_system:
+                continue
+            if held:
+                retroactive[classification[1]] += held
+            pid, create_time = cache_key
+            table = self.current_processes
+            if pid in table and table.create_time(pid) == create_time:
+                table.add(pid, proc_name, classification[1], create_time, CpuTimes(*table.cpu_time(pid)))
+        if timed_out and self._classify_pool is not None:
+            self._replace_classify_pool()
+        return retroactive
+
+    def get_foreground_app(self):
+        """返回 (是否取得前台窗口, 前台应用名)；前台为系统进程时应用名为 None
+
+        只查询前台进程这一个 PID，分类结果与完整扫描共用同一个缓存。
+        前台进程仍在分类时应用名为 None，并记下它的键，由调用方暂存这段时间。
+        """
+        self._pending_foreground = None
+        pid = self.process_source.foreground_pid()
+        if pid is None:
+            return False, None
+        if self.software_index.version != self._software_version:
+            self._refresh_software_names()
+        proc_info = self.process_source.process_info(pid)
+        if proc_info is None:
+            return True, None
+        cache_key = (pid, proc_info['create_time'])
+        try:
+            is_system, software_name = self._lookup_classification(
+                cache_key, proc_info['name'], proc_info.get('exe', ''))[:2]
+        except Exception as e:
+            print(f"获取前台进程信息时出错: {e}")
+            return True, None
+        if cache_key in self._pending_classifications:
+            self._submit_classifications()
+            self._pending_foreground = cache_key
+            return True, None
+        if is_system:
+            return True, None
+        # 归并子进程时沿用最近一次完整扫描得到的根应用
+        return True, self._root_apps.get((pid, proc_info['create_time']), software_name)
+
     def get_active_processes(self):
+        if self.software_index.version != self._software_version:
+            self._refresh_software_names()
+
         processes = {}
-        must_ignore = {
-            'System', 'System Idle Process', 'csrss.exe', 'lsass.exe', 
-            'services.exe', 'svchost.exe', 'wininit.exe', 'audiodg.exe'
-        }
-        
-        for proc in psutil.process_iter(['pid', 'name', 'create_time', 'cpu_times', 'exe']):
+        seen_keys = set()
+        misses_before = self.classification_stats["misses"]
+        # 一次枚举得到本周期的进程树，父进程过滤和子进程归并都在内存中完成
+        tree = {proc_info['pid']: proc_info for proc_info in self.process_source.iter_processes()}
+
+        for pid, proc_info in tree.items():
             try:
-                proc_info = proc.info
-                pid = proc_info['pid']
                 proc_name = proc_info['name']
-                exe_path = proc_info.get('exe', '')
-                
-                software_name = proc_name
-                
-                if exe_path:
-                    exe_file = os.path.basename(exe_path).lower()
-                    if exe_file in self.installed_software:
-                        software_name = self.installed_software[exe_file]
-                    elif exe_file.endswith('.exe'):
-                        exe_name_without_ext = exe_file[:-4]
-                        if exe_name_without_ext in self.installed_software:
-                            software_name = self.installed_software[exe_name_without_ext]
-
-                if proc_name in must_ignore or self._is_system_process(proc_name, exe_path, pid):
+                cache_key = (pid, proc_info['create_time'])
+                seen_keys.add(cache_key)
+
+                classification = self._lookup_classification(cache_key, proc_name, proc_info.get('exe', ''), tree)
+                is_system, software_name, proc_name = classification[:3]
+                if is_system or proc_info['cpu_times'] is None:
                     continue
-                    
+
                 processes[pid] = {
                     'name': proc_name,
                     'software_name': software_name,
                     'create_time': proc_info['create_time'],
                     'cpu_time': proc_info['cpu_times']
                 }
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
+                if cache_key in self._pending_classifications:
+                    processes[pid]['pending'] = True
             except Exception as e:
                 print(f"获取进程信息时出错: {e}")
                 continue
+
+        self._submit_classifications()
+        self.profiler.count("processes", len(seen_keys))
+        self.profiler.count("new_processes", self.classification_stats["misses"] - misses_before)
+        cache = self._classification_cache
+        stale_keys = [key for key in cache if key not in seen_keys]
+        for key in stale_keys:
+            del cache[key]
+        self.classification_stats["evictions"] += len(stale_keys)
+        if self.aggregate_children:
+            self._aggregate_children(processes, tree)
         return processes
 
+    def _aggregate_children(self, processes, tree):
+        """把每个用户进程改记到最上层的用户进程祖先所属的应用下，例如浏览器的各个子进程"""
+        # 仍在分类的进程不参与归并，分类完成后按自身的应用补记
+        candidates = {pid: proc_data for pid, proc_data in processes.items() if not proc_data.get('pending')}
+        roots = {}
+        for pid in candidates:
+            chain = []
+            current = pid
+            while current not in roots:
+                chain.append(current)
+                parent = tree[current].get('ppid')
+                if parent not in candidates or parent in chain:
+                    roots[current] = processes[current]['software_name']
+                    break
+                current = parent
+            root_name = roots[current]
+            for member in chain:
+                roots[member] = root_name
+        for pid, root_name in roots.items():
+            processes[pid]['software_name'] = root_name
+        self._root_apps = {(pid, processes[pid]['create_time']): root_name for pid, root_name in roots.items()}
+
     def update_process_data(self):
+        profiler = self.profiler
+        profiler.begin_tick()
+        queries_before = self.process_source.query_count
         current_time = time.time()
         time_diff = current_time - self.last_update_time
 
         if time_diff < 0.1:
             time_diff = 0.1
-        active_processes = self.get_active_processes()
-        for pid, proc_data in active_processes.items():
-            if pid in self.current_processes:
-                time_increment = (
-                    proc_data['cpu_time'].user - self.current_processes[pid]['cpu_time'].user +
-                    proc_data['cpu_time'].system - self.current_processes[pid]['cpu_time'].system
-                )
-
-                software_name = proc_data.get('software_name', proc_data['name'])
-                self.usage_data[software_name]['total_time'] += time_increment
-
-                today = datetime.datetime.now().strftime("%Y-%m-%d")
-                self.usage_data[software_name]['daily_breakdown'][today] += time_increment
-                self.usage_data[software_name]['last_updated'] = current_time
-            else:
-                self.current_processes[pid] = {
-                    'name': proc_data['name'],
-                    'software_name': proc_data.get('software_name', proc_data['name']),
-                    'create_time': proc_data['create_time'],
-                    'cpu_time': proc_data['cpu_time']
-                }
-        pids_to_remove = [pid for pid in self.current_processes if pid not in active_processes]
-        for pid in pids_to_remove:
-            del self.current_processes[pid]
-
-        self.save_usage_data()
-        self.save_current_process_data()
+        increments = self._collect_classifications()
+        foreground_app = None
+        full_scan = True
+        churn = 0
+        if self.sampling == "foreground":
+            with profiler.phase("foreground"):
+                available, foreground_app = self.get_foreground_app()
+            if foreground_app != self._last_foreground_app:
+                churn += 1
+                self._last_foreground_app = foreground_app
+            if foreground_app is not None:
+                increments[foreground_app] += time_diff
+            elif self._pending_foreground is not None:
+                self._held_time[self._pending_foreground] += time_diff
+            # 平台取不到前台窗口时退回每个周期完整扫描
+            full_scan = not available or self._last_full_scan is None or \
+                current_time - self._last_full_scan >= self.full_scan_interval
+
+        if full_scan:
+            with profiler.phase("scan"):
+                active_processes = self.get_active_processes()
+            self._last_full_scan = current_time
+
+            with profiler.phase("credit"):
+                current_processes = self.current_processes
+                for pid, proc_data in active_processes.items():
+                    # PID 被新进程复用时按新进程处理，不和旧进程的 CPU 时间相减
+                    if pid in current_processes and \
+                            current_processes.create_time(pid) == proc_data['create_time']:
+                        # 只记入上个周期以来的增量，基准每个周期都更新，记入的时长与周期长短无关
+                        user, system = current_processes.cpu_time(pid)
+                        current_processes.set_cpu_time(pid, proc_data['cpu_time'])
+                        software_name = proc_data.get('software_name', proc_data['name'])
+                        # 前台应用已按实际经过的时间计时，不再叠加 CPU 时间
+                        if software_name == foreground_app:
+                            continue
+                        cache_key = (pid, proc_data['create_time'])
+                        if proc_data.get('pending') and cache_key == self._pending_foreground:
+                            continue
+                        time_increment = (
+                            proc_data['cpu_time'].user - user +
+                            proc_data['cpu_time'].system - system
+                        )
+                        if proc_data.get('pending'):
+                            self._held_time[cache_key] += time_increment
+                        else:
+                            increments[software_name] += time_increment
+                    else:
+                        churn += 1
+                        current_processes.add(pid, proc_data['name'],
+                                              proc_data.get('software_name', proc_data['name']),
+                                              proc_data['create_time'], proc_data['cpu_time'])
+                churn += current_processes.retain(active_processes)
+            profiler.count("active_processes", len(active_processes))
+        profiler.count("full_scans", int(full_scan))
+
+        with profiler.phase("persist"):
+            self._record_tick(current_time, increments)
+        if any(increments.values()):
+            with profiler.phase("publish"):
+                self.snapshot_version += 1
+                self._publish_snapshot()
         self.last_update_time = current_time
 
+        self._maintain_retention()
+
+        profiler.count("apps_credited", len(increments))
+        profiler.count("source_queries", self.process_source.query_count - queries_before)
+        profiler.count("classify_pending", len(self._pending_classifications))
+        interval = self.scheduler.observe(churn, sum(increments.values()) / time_diff,
+                                          self.process_source.idle_seconds())
+        profiler.count("interval", interval)
+        profiler.end_tick()
+
+    def _maintain_retention(self):
+        """每天启动一次后台整理，生成的计划在之后的某个周期中应用"""
+        if self.retention is None:
+            return
+        plan = self.retention.take()
+        if plan is not None:
+            with self.profiler.phase("retention"):
+                folded = self.store.apply_retention(plan)
+                self.snapshot_version += 1
+                self._publish_snapshot()
+            self.profiler.count("apps_folded", folded)
+            if plan.edges is not None or folded:
+                self._retention_dirty = True
+        elif self.retention.due(datetime.date.today().toordinal()):
+            self.retention.start(self.snapshot, datetime.date.today().toordinal(), time.time())
+
+        # 整理结果通过快照在后台写盘，此时快照已包含日志中的全部记录
+        if self._retention_dirty and self.journal.compact_async(partial(self.journal.export, self.snapshot)):
+            self._retention_dirty = False
+
     def start_monitoring(self):
-        self.update_process_data()
+        # 第一次扫描也放到监控线程中，不阻塞窗口显示
+        if self.monitoring_thread is not None and self.monitoring_thread.is_alive():
+            return
+        self.scheduler.start()
         self.monitoring_thread = threading.Thread(target=self._monitoring_loop, daemon=True)
         self.monitoring_thread.start()
-    
+
+    def stop_monitoring(self, timeout=5):
+        """打断等待并等监控线程结束当前周期，之后可再次 start_monitoring()"""
+        self.scheduler.stop()
+        if self.monitoring_thread is not None:
+            self.monitoring_thread.join(timeout)
+            if self.monitoring_thread.is_alive():
+                return False
+            self.monitoring_thread = None
+        return True
+
+    def stop(self, timeout=5):
+        """退出前停止监控并保存数据"""
+        if self.stop_monitoring(timeout):
+            self.save_usage_data()
+        if self._classify_pool is not None:
+            self._classify_pool.shutdown(wait=False, cancel_futures=True)
+            self._classify_pool = None
+
+    def get_scheduler_state(self):
+        return self.scheduler.state()
+
     def _monitoring_loop(self):
-        while True:
+        while not self.scheduler.stopped():
             try:
                 self.update_process_data()
-                time.sleep(5)
             except Exception as e:
                 print(f"监控过程中发生错误: {e}")
-                time.sleep(10)
-
-    def get_recent_usage(self, days=7):
-        result = {
-            "total_daily_usage": defaultdict(int),
-            "app_usage": {}
-        }
-
-        today = datetime.datetime.now()
-        date_format = "%Y-%m-%d"
-
-        all_apps = set()
-        for app_name, app_data in self.usage_data.items():
-            all_apps.add(app_name)
-
-            recent_time = 0
-            actual_days = days
-            
-            for i in range(actual_days):
-                date = (today - datetime.timedelta(days=i)).strftime(date_format)
-                if date in app_data['daily_breakdown']:
-                    recent_time += app_data['daily_breakdown'][date]
-
-            if recent_time > 0:
-                result["app_usage"][app_name] = {
-                    "total_time": recent_time,
-                    "daily_breakdown": {}
-                }
-                for i in range(actual_days):
-                    date = (today - datetime.timedelta(days=i)).strftime(date_format)
-                    result["app_usage"][app_name]["daily_breakdown"][date] = app_data['daily_breakdown'].get(date, 0)
-                    result["total_daily_usage"][date] += app_data['daily_breakdown'].get(date, 0)
-
-        result["total_daily_usage"] = dict(sorted(result["total_daily_usage"].items()))
-
-        return result
-
-    def get_top_apps(self, limit=None, days=1):
-        recent_usage = self.get_recent_usage(days)
-        sorted_apps = sorted(
-            recent_usage["app_usage"].items(), 
-            key=lambda x: x[1]["total_time"], 
-            reverse=True
-        )
-        if limit is None or limit >= len(sorted_apps):
-            return sorted_apps
-        return sorted_apps[:limit]
+                self.scheduler.error()
+            self.scheduler.wait()
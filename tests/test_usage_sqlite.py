@@ -0,0 +1,48 @@
+"""SQLiteUsageSnapshot 的读事务：发布后的写入对已发布的快照不可见"""
+import os
+import gc
+import shutil
+import datetime
+import tempfile
+import threading
+import unittest
+from src.usage_sqlite import SQLiteUsageStore
+
+
+class SQLiteSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = SQLiteUsageStore(os.path.join(self.directory, "usage_data.db"))
+        self.today = datetime.date.today().toordinal()
+
+    def tearDown(self):
+        self.store.close()
+        gc.collect()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_writes_after_snapshot_invisible(self):
+        self.store.record_tick(1.0, self.today, 10, {"a.exe": 5.0})
+        snapshot = self.store.snapshot(1)
+        # 发布之后、第一次查询之前的写入也不可见
+        self.store.record_tick(2.0, self.today, 10, {"a.exe": 5.0, "b.exe": 3.0})
+        result = []
+        reader = threading.Thread(target=lambda: result.append(
+            (snapshot.top_apps(self.today, self.today), len(snapshot), "b.exe" in snapshot)))
+        reader.start()
+        reader.join()
+        self.assertEqual(result, [([("a.exe", 5.0)], 1, False)])
+        self.assertEqual(self.store.snapshot(2).top_apps(self.today, self.today), [("a.exe", 10.0), ("b.exe", 3.0)])
+
+    def test_reader_reused(self):
+        self.store.record_tick(1.0, self.today, 10, {"a.exe": 5.0})
+        conn = self.store.snapshot(1)._conn
+        gc.collect()
+        snapshot = self.store.snapshot(2)
+        self.assertIs(snapshot._conn, conn)
+        self.store.record_tick(2.0, self.today, 10, {"a.exe": 1.0})
+        self.assertEqual(snapshot.range_total("a.exe", self.today, self.today), 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,235 @@
+"""UsageStore 增量维护的每日合计、排名与原先按字典逐日扫描的实现的随机等价性测试
+
+基准实现照搬改为列式存储之前 UsageTracker 的 get_recent_usage / get_top_apps，
+直接读写 usage_data 字典。秒数取 1/4 的整数倍，浮点加法与求和顺序无关，可以逐项精确比较。
+"""
+import os
+import copy
+import random
+import tempfile
+import datetime
+import unittest
+from collections import defaultdict
+from src.usage_store import HOURS_KEPT, UsageStore, hour_to_str, iter_buckets, month_start
+from src.usage_journal import UsageJournal
+from src.usage_retention import RetentionCompactor
+from src.usage_tracker import UsageQueries
+
+QUERY_DAYS = (1, 2, 7, 30)
+QUERY_LIMITS = (None, 1, 3, 100)
+
+
+class BaselineQueries:
+    """原先基于 usage_data 字典的查询"""
+
+    def __init__(self, usage_data):
+        self.usage_data = usage_data
+
+    def get_recent_usage(self, days=7):
+        result = {
+            "total_daily_usage": defaultdict(int),
+            "app_usage": {}
+        }
+
+        today = datetime.datetime.now()
+        date_format = "%Y-%m-%d"
+
+        for app_name, app_data in self.usage_data.items():
+            recent_time = 0
+            for i in range(days):
+                date = (today - datetime.timedelta(days=i)).strftime(date_format)
+                if date in app_data['daily_breakdown']:
+                    recent_time += app_data['daily_breakdown'][date]
+
+            if recent_time > 0:
+                result["app_usage"][app_name] = {
+                    "total_time": recent_time,
+                    "daily_breakdown": {}
+                }
+                for i in range(days):
+                    date = (today - datetime.timedelta(days=i)).strftime(date_format)
+                    result["app_usage"][app_name]["daily_breakdown"][date] = app_data['daily_breakdown'].get(date, 0)
+                    result["total_daily_usage"][date] += app_data['daily_breakdown'].get(date, 0)
+
+        result["total_daily_usage"] = dict(sorted(result["total_daily_usage"].items()))
+
+        return result
+
+    def get_top_apps(self, limit=None, days=1):
+        recent_usage = self.get_recent_usage(days)
+        sorted_apps = sorted(
+            recent_usage["app_usage"].items(),
+            key=lambda x: x[1]["total_time"],
+            reverse=True
+        )
+        if limit is None or limit >= len(sorted_apps):
+            return sorted_apps
+        return sorted_apps[:limit]
+
+
+class SnapshotQueries(UsageQueries):
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+
+class RandomHistory:
+    """同时写入 usage_data 字典和 UsageStore 的随机使用记录"""
+
+    def __init__(self, seed, apps=12, span=40):
+        self.rng = random.Random(seed)
+        self.apps = [f"app_{i}.exe" for i in range(apps)]
+        self.today = datetime.date.today().toordinal()
+        self.span = span
+        self.usage_data = {}
+        self.store = UsageStore()
+        self.version = 0
+
+    def add(self, count):
+        rng = self.rng
+        for _ in range(count):
+            app_name = rng.choice(self.apps)
+            # 多数记录落在最近几天，少数落在更早的日期
+            back = rng.randrange(3) if rng.random() < 0.7 else rng.randrange(self.span)
+            day = self.today - back
+            seconds = rng.randint(1, 4 * 3600) / 4
+            app_data = self.usage_data.setdefault(
+                app_name, {"total_time": 0, "daily_breakdown": {}, "last_updated": 0.0})
+            date = datetime.date.fromordinal(day).isoformat()
+            app_data["daily_breakdown"][date] = app_data["daily_breakdown"].get(date, 0) + seconds
+            app_data["total_time"] += seconds
+            self.store.add(app_name, day, seconds, float(self.version))
+
+    def publish(self):
+        self.version += 1
+        return SnapshotQueries(self.store.snapshot(self.version, self.today))
+
+
+class UsageStoreEquivalenceTest(unittest.TestCase):
+
+    def assert_equivalent(self, queries, baseline):
+        for days in QUERY_DAYS:
+            expected = baseline.get_recent_usage(days)
+            actual = queries.get_recent_usage(days)
+            # 比较 items() 列表，键的顺序也必须一致
+            self.assertEqual(list(actual["total_daily_usage"].items()),
+                             list(expected["total_daily_usage"].items()), days)
+            self.assertEqual(list(actual["app_usage"].items()), list(expected["app_usage"].items()), days)
+            self.assertEqual(list(queries.get_daily_usage(days).items()),
+                             list(expected["total_daily_usage"].items()), days)
+            for limit in QUERY_LIMITS:
+                self.assertEqual(queries.get_top_apps(limit, days), baseline.get_top_apps(limit, days),
+                                 (days, limit))
+
+    def test_interleaved_updates(self):
+        """逐批写入，每批之后发布快照并查询，覆盖排名的增量维护和写时复制"""
+        for seed in range(10):
+            history = RandomHistory(seed)
+            for _ in range(10):
+                history.add(history.rng.randrange(1, 40))
+                self.assert_equivalent(history.publish(), BaselineQueries(history.usage_data))
+
+    def test_old_snapshot_unchanged(self):
+        """快照发布后继续写入，旧快照的查询结果保持发布时的值"""
+        history = RandomHistory(100)
+        history.add(200)
+        queries = history.publish()
+        frozen = BaselineQueries(copy.deepcopy(history.usage_data))
+        history.add(200)
+        self.assert_equivalent(queries, frozen)
+        self.assert_equivalent(history.publish(), BaselineQueries(history.usage_data))
+
+    def test_loaded_from_usage_data(self):
+        """由 usage_data 加载后继续写入，排名由加载的数据重新建立"""
+        for seed in range(10):
+            history = RandomHistory(seed + 200)
+            history.add(300)
+            history.store = UsageStore.from_usage_data(copy.deepcopy(history.usage_data))
+            self.assert_equivalent(history.publish(), BaselineQueries(history.usage_data))
+            history.add(100)
+            self.assert_equivalent(history.publish(), BaselineQueries(history.usage_data))
+
+
+class RetentionTest(unittest.TestCase):
+    """降采样后按桶存放的历史与原始逐日数据的对照"""
+
+    def assert_rolled(self, view, history):
+        months_before, weeks_before = view.rollup
+        daily = {app_name: {datetime.date.fromisoformat(date).toordinal(): seconds
+                            for date, seconds in app_data["daily_breakdown"].items()}
+                 for app_name, app_data in history.usage_data.items()}
+        first = month_start(min(day for days in daily.values() for day in days))
+        # 与桶对齐的区间合计精确相等，逐日保留的部分逐日相等
+        ranges = [(lo, hi - 1) for lo, hi in iter_buckets(first, months_before, "month")]
+        ranges += [(lo, hi - 1) for lo, hi in iter_buckets(months_before, weeks_before, "week")]
+        ranges += [(first, history.today), (months_before, history.today)]
+        for app_name, days in daily.items():
+            for start_day, end_day in ranges:
+                expected = sum(seconds for day, seconds in days.items() if start_day <= day <= end_day)
+                self.assertEqual(view.range_total(app_name, start_day, end_day), expected)
+            self.assertEqual(list(view.app_window(app_name, weeks_before, history.today)),
+                             [days.get(day, 0) for day in range(weeks_before, history.today + 1)])
+        self.assertEqual(view.range_total(None, first, history.today),
+                         sum(sum(days.values()) for days in daily.values()))
+
+    def test_rolled_buckets(self):
+        history = RandomHistory(300, span=1200)
+        history.add(3000)
+        compactor = RetentionCompactor()
+        history.store.apply_retention(compactor.plan(history.store.snapshot(1), history.today, 0.0))
+        store = history.store
+        self.assertEqual(store.base_day, store.rollup[1])
+        self.assertLessEqual(max(len(values) for values in store.rows), history.today - store.base_day + 1)
+        self.assert_rolled(store, history)
+        self.assert_rolled(UsageStore.from_usage_data(store.to_usage_data()), history)
+        # 边界前移一周后再次整理
+        history.add(500)
+        store.apply_retention(compactor.plan(store.snapshot(2), history.today + 7, 0.0))
+        self.assert_rolled(store.snapshot(3), history)
+
+    def test_short_history(self):
+        """历史短于逐日保留天数时不汇总，只把长期未用的小应用并入“其他”"""
+        history = RandomHistory(400, span=60)
+        history.add(500)
+        history.store.add("tiny.exe", history.today - 50, 5, 0.0)
+        store = history.store
+        plan = RetentionCompactor().plan(store.snapshot(1), history.today, 50 * 86400.0)
+        self.assertIsNone(plan.edges)
+        self.assertIsNone(plan.rollup)
+        self.assertEqual(plan.folds, {"tiny.exe": 5})
+        self.assertEqual(store.apply_retention(plan), 1)
+        self.assertNotIn("tiny.exe", store)
+        self.assertEqual(store.range_total("其他", history.today - 50, history.today - 50), 5)
+        self.assertEqual(store.bucket_edges, ())
+        self.assertEqual(UsageStore.from_usage_data(store.to_usage_data()).range_total(
+            None, history.today - 60, history.today), store.range_total(None, history.today - 60, history.today))
+
+
+class UsageJournalTest(unittest.TestCase):
+
+    def test_compaction_trims_hours(self):
+        """日志压缩后快照中的 hourly_breakdown 与 HourRing 一样只保留最近 HOURS_KEPT 小时"""
+        start = datetime.datetime(2024, 3, 1).timestamp()
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = UsageJournal(os.path.join(tmp, "usage_data.json"))
+            for _ in range(3):
+                for hour in range(HOURS_KEPT):
+                    timestamp = start + hour * 3600
+                    day = datetime.date.fromtimestamp(timestamp).isoformat()
+                    journal.append(timestamp, day, {"a.exe": 60, "b.exe": 30} if hour < 24 else {"a.exe": 60})
+                start += HOURS_KEPT * 3600
+                self.assertTrue(journal.compact_async())
+                journal.wait_for_compaction()
+            usage_data = journal.load()
+            journal.close()
+        store = UsageStore.from_usage_data(usage_data)
+        for app_name in ("a.exe", "b.exe"):
+            ring = store.hours[store._index[app_name]]
+            self.assertEqual(usage_data[app_name]["hourly_breakdown"],
+                             {hour_to_str(hour): seconds for hour, seconds in ring.items()})
+        self.assertEqual(len(usage_data["a.exe"]["hourly_breakdown"]), HOURS_KEPT)
+        self.assertEqual(len(usage_data["b.exe"]["hourly_breakdown"]), 24)
+        self.assertEqual(usage_data["a.exe"]["total_time"], 3 * HOURS_KEPT * 60)
+
+
+if __name__ == "__main__":
+    unittest.main()